@@ -1,4 +1,6 @@
 """AI модуль - интеграция с GPT"""
-from .gpt_client import GPTClient
+from .gpt_client import GPTClient, RetryPolicy, CircuitBreaker
 from .design_generator import DesignGenerator
-from .prompts import PromptBuilder
\ No newline at end of file
+from .offline_designer import OfflineDesigner
+from .prompts import PromptBuilder
+from .response_cache import ResponseCache
\ No newline at end of file
@@ -0,0 +1,355 @@
+"""
+Асинхронный клиент GPT на базе AsyncOpenAI
+
+Все асинхронные запросы выполняются в одном фоновом цикле событий
+(AsyncRuntime), которому принадлежит общий пул HTTP-соединений:
+соединения переиспользуются между запросами и панелями, а GUI-поток
+получает результаты через concurrent.futures.Future.
+
+Повторы, автомат защиты и метрики - те же, что у GPTClient
+(AsyncGPTClient.from_client делит их с синхронным клиентом). Кэша
+ответов, хеджирования и response_format нет: асинхронно идут чат
+панели AI и проверка подключения в настройках, им это не нужно.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, TypeVar
+
+import openai
+from openai import AsyncOpenAI
+
+from .gpt_client import (
+    GPTClient, GPTClientBase, GPTResponse, ConnectionSettings, RetryPolicy, CircuitBreaker,
+    error_response
+)
+from .metrics import MetricsRecorder
+
+T = TypeVar("T")
+
+
+class AsyncRuntime:
+    """Фоновый поток с долгоживущим циклом событий asyncio"""
+
+    _instance: Optional['AsyncRuntime'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="dizainai-asyncio", daemon=True
+        )
+        self._thread.start()
+        # Ждём запуска цикла: иначе следующий get() увидит is_running() == False
+        # и создаст второй цикл, бросив первый вместе с его пулом соединений
+        self._started.wait()
+
+    @classmethod
+    def get(cls) -> 'AsyncRuntime':
+        """Общий на процесс цикл событий (создаётся при первом обращении)"""
+        with cls._instance_lock:
+            if cls._instance is None or not cls._instance.loop.is_running():
+                cls._instance = cls()
+            return cls._instance
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[T]) -> 'Future[T]':
+        """Запустить корутину в фоновом цикле; результат - потокобезопасный Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Запустить корутину и дождаться результата (для вызова из рабочих потоков)"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """Остановить цикл (при завершении приложения)"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+_shared_http_lock = threading.Lock()
+_shared_http_client: Optional[openai.DefaultAsyncHttpxClient] = None
+
+
+def shared_async_http_client(settings: Optional[ConnectionSettings] = None):
+    """Общий асинхронный пул соединений (используется только в цикле AsyncRuntime)"""
+    global _shared_http_client
+    with _shared_http_lock:
+        if _shared_http_client is None or _shared_http_client.is_closed:
+            settings = settings or ConnectionSettings()
+            _shared_http_client = openai.DefaultAsyncHttpxClient(
+                timeout=settings.httpx_timeout(),
+                limits=settings.httpx_limits()
+            )
+        return _shared_http_client
+
+
+class AsyncGPTClient(GPTClientBase):
+    """
+    Асинхронный клиент GPT API
+
+    Пул соединений (keep-alive, лимиты) общий для всех экземпляров и
+    живёт до конца процесса; смена ключа или модели его не пересоздаёт.
+    Число одновременных запросов клиента ограничено семафором.
+
+    Клиент привязан к циклу событий AsyncRuntime - корутины следует
+    запускать через AsyncRuntime.get().submit(...).
+    """
+
+    def __init__(self, api_key: str, model: str = "gpt-4o",
+                 connection: Optional[ConnectionSettings] = None,
+                 metrics: Optional[MetricsRecorder] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.api_key = api_key
+        self.model = model
+        self.connection = connection or ConnectionSettings()
+        self.metrics = metrics  # Сбор метрик (None - без метрик)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(self.retry.breaker_threshold, self.retry.breaker_reset)
+        self.project_id = ""  # Проект, к которому относятся запросы (для метрик)
+
+        self._http_client = shared_async_http_client(self.connection)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.client: Optional[AsyncOpenAI] = None
+        self._init_client()
+
+    @classmethod
+    def from_client(cls, client: GPTClient) -> 'AsyncGPTClient':
+        """Асинхронный клиент с ключом, метриками, повторами и автоматом защиты client"""
+        async_client = cls(
+            client.api_key, client.model, client.connection,
+            client.metrics, client.retry, client.breaker
+        )
+        async_client.project_id = client.project_id
+        return async_client
+
+    def _init_client(self):
+        """Обёртка AsyncOpenAI поверх общего пула соединений"""
+        if self.api_key:
+            self.client = AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=self._http_client,
+                timeout=self.connection.httpx_timeout(),
+                # Повторы выполняет RetryPolicy (с автоматом защиты)
+                max_retries=0
+            )
+        else:
+            self.client = None
+
+    def set_api_key(self, api_key: str):
+        """Установить API ключ (пул соединений сохраняется)"""
+        if api_key == self.api_key and self.client:
+            return
+        self.api_key = api_key
+        self._init_client()
+
+    def is_configured(self) -> bool:
+        """Проверка настройки API"""
+        return bool(self.api_key and self.client)
+
+    def _limiter(self) -> asyncio.Semaphore:
+        # Семафор создаётся внутри цикла, которому он принадлежит
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.connection.max_concurrent_requests)
+        return self._semaphore
+
+    async def send_message(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4000
+    ) -> GPTResponse:
+        """Асинхронный аналог GPTClient.send_message"""
+        if not self.is_configured():
+            return GPTResponse(
+                success=False,
+                error="API ключ не настроен. Укажите ключ в настройках."
+            )
+
+        started = time.monotonic()
+        retries = 0
+        while True:
+            if not self.breaker.allow():
+                response = self._circuit_open_response()
+                break
+
+            response = None
+            try:
+                response = await self._request(messages, temperature, max_tokens)
+            finally:
+                # Отмена корутины - пробный запрос всё равно освобождает автомат
+                if response is None:
+                    self.breaker.release()
+            self._update_breaker(response)
+            if response.success or not response.retryable or retries >= self.retry.max_retries:
+                break
+
+            await asyncio.sleep(self.retry.backoff(retries, response.retry_after))
+            retries += 1
+
+        response.retries = retries
+        response.latency = time.monotonic() - started
+        self._record(response, "message")
+        return response
+
+    async def _request(self, messages: List[Dict[str, str]], temperature: float,
+                       max_tokens: int) -> GPTResponse:
+        """Одна попытка запроса"""
+        async with self._limiter():
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+
+                usage = response.usage
+                return GPTResponse(
+                    success=True,
+                    content=response.choices[0].message.content,
+                    tokens_used=usage.total_tokens if usage else 0,
+                    prompt_tokens=usage.prompt_tokens if usage else 0,
+                    completion_tokens=usage.completion_tokens if usage else 0
+                )
+
+            except Exception as e:
+                return error_response(e)
+
+    def stream_message(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4000
+    ) -> 'AsyncGPTStream':
+        """
+        Потоковая выдача: async for delta in client.stream_message(...)
+
+        Итоговый GPTResponse - в атрибуте response после окончания итерации.
+        Выдачу прерывает отмена задачи, в которой идёт итерация.
+        """
+        return AsyncGPTStream(self, messages, temperature, max_tokens)
+
+    async def send_simple(self, prompt: str, system_prompt: str = "") -> GPTResponse:
+        """Упрощённая отправка одного запроса"""
+        messages = []
+
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+
+        messages.append({"role": "user", "content": prompt})
+
+        return await self.send_message(messages)
+
+
+class AsyncGPTStream:
+    """Асинхронный аналог GPTStream"""
+
+    def __init__(self, client: AsyncGPTClient, messages: List[Dict[str, str]],
+                 temperature: float, max_tokens: int):
+        self.client = client
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.response: Optional[GPTResponse] = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if not self.client.is_configured():
+            self.response = GPTResponse(
+                success=False,
+                error="API ключ не настроен. Укажите ключ в настройках."
+            )
+            return
+
+        started = time.monotonic()
+        try:
+            async for delta in self._iterate(started):
+                yield delta
+        finally:
+            # Отменённая итерация ответа не оставляет - метрик нет
+            if self.response is not None:
+                self.response.latency = time.monotonic() - started
+                self.client._record(self.response, "stream")
+
+    async def _iterate(self, started: float) -> AsyncIterator[str]:
+        policy = self.client.retry
+        breaker = self.client.breaker
+        retries = 0
+        while True:
+            if not breaker.allow():
+                self.response = self.client._circuit_open_response()
+                break
+
+            settled = False
+            try:
+                async for delta in self._stream_once(started):
+                    yield delta
+                response = self.response
+                self.client._update_breaker(response)
+                settled = True
+            finally:
+                if not settled:
+                    breaker.release()
+
+            # Повтор возможен, только пока текст не начал выдаваться
+            if (response.success or response.content or not response.retryable
+                    or retries >= policy.max_retries):
+                break
+
+            await asyncio.sleep(policy.backoff(retries, response.retry_after))
+            retries += 1
+
+        self.response.retries = retries
+
+    async def _stream_once(self, started: float) -> AsyncIterator[str]:
+        """Одна попытка потокового запроса; итог - в self.response"""
+        first_token = 0.0
+        usage = None
+        parts: List[str] = []
+
+        async with self.client._limiter():
+            try:
+                stream = await self.client.client.chat.completions.create(
+                    model=self.client.model,
+                    messages=self.messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if not parts:
+                                first_token = time.monotonic() - started
+                            parts.append(delta)
+                            yield delta
+
+                self.response = GPTResponse(
+                    success=True,
+                    content="".join(parts),
+                    tokens_used=usage.total_tokens if usage else 0,
+                    prompt_tokens=usage.prompt_tokens if usage else 0,
+                    completion_tokens=usage.completion_tokens if usage else 0,
+                    first_token_latency=first_token
+                )
+
+            except Exception as e:
+                self.response = error_response(e)
+                self.response.content = "".join(parts)
+                self.response.first_token_latency = first_token
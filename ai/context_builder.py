@@ -0,0 +1,236 @@
+"""
+Компактный контекст проекта для чата
+
+Вместо полного описания всех комнат и стен на каждое сообщение строится
+иерархическая сводка: общая статистика проекта, затем комнаты, к которым
+относится вопрос (упомянутые по названию или выбранная), и детализация
+стен только когда вопрос касается геометрии. Результат укладывается
+в бюджет токенов, а отрисованные части кэшируются по версии проекта.
+"""
+
+import re
+from collections import OrderedDict
+from statistics import median
+from typing import List, Optional, Tuple
+
+from core.project import Project
+from core.room import Room
+from .prompts import PromptBuilder
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (для русского текста ~3 символа на токен)"""
+    return len(text) // 3 + 1
+
+
+def room_fingerprint(room: Room) -> tuple:
+    """Отпечаток геометрии комнаты: меняется при любом изменении стен, проёмов и отверстий"""
+    return (
+        room.id, room.name, room.ceiling_height,
+        tuple(
+            (
+                w.start.x, w.start.y, w.end.x, w.end.y, w.thickness,
+                tuple((o.position, o.width, o.height, o.sill_height) for o in w.windows),
+                tuple((o.position, o.width, o.height) for o in w.doors)
+            )
+            for w in room.walls
+        ),
+        # Колонны и шахты вычитаются из площади пола
+        tuple(tuple((p.x, p.y) for p in hole) for hole in room.holes)
+    )
+
+
+def project_version(project: Project) -> int:
+    """Версия проекта - хеш отпечатков комнат (дешевле, чем отрисовка описания)"""
+    return hash((
+        project.id, project.name, project.active_level_id, len(project.furniture),
+        tuple(room_fingerprint(r) for r in project.rooms)
+    ))
+
+
+class ProjectContextBuilder:
+    """
+    Построитель контекста проекта для DesignGenerator.chat
+
+    Приоритет частей при нехватке бюджета:
+    сводка проекта > комнаты из вопроса > список остальных комнат.
+    """
+
+    # Вопрос касается геометрии - нужны стены, окна и двери
+    GEOMETRY_PATTERN = re.compile(
+        r"стен|окн|двер|про[её]м|периметр|размер|длин|ширин|высот|потол|план",
+        re.IGNORECASE
+    )
+
+    MAX_CACHED_ROOMS = 1000
+
+    def __init__(self, token_budget: int = 1500, max_relevant_rooms: int = 3):
+        """
+        Args:
+            token_budget: Максимум токенов на контекст проекта
+            max_relevant_rooms: Сколько комнат из вопроса описывать подробно
+        """
+        self.token_budget = token_budget
+        self.max_relevant_rooms = max_relevant_rooms
+
+        self._overview: Optional[Tuple[int, str, List[str]]] = None
+        # (отпечаток комнаты, с деталями стен) -> описание
+        self._room_cache: 'OrderedDict[tuple, str]' = OrderedDict()
+
+    # === Публичный API ===
+
+    def build(
+        self,
+        project: Project,
+        message: str = "",
+        selected_room_id: Optional[str] = None
+    ) -> str:
+        """Контекст проекта для сообщения пользователя"""
+        header, room_lines = self._project_overview(project)
+        budget = self.token_budget - estimate_tokens(header)
+        parts = [header]
+
+        relevant = self.relevant_rooms(project, message, selected_room_id)
+        detailed = bool(self.GEOMETRY_PATTERN.search(message))
+        relevant_ids = set()
+
+        for room in relevant:
+            text = self._room_text(room, detailed)
+            cost = estimate_tokens(text)
+            if cost > budget and detailed:
+                # Детали стен не помещаются - хотя бы краткая сводка
+                text = self._room_text(room, False)
+                cost = estimate_tokens(text)
+            if cost > budget:
+                break
+            parts.append(text)
+            relevant_ids.add(room.id)
+            budget -= cost
+
+        # Остальные комнаты - по строке, пока хватает бюджета
+        rest = [line for room, line in zip(project.rooms, room_lines)
+                if room.id not in relevant_ids]
+        if rest:
+            listed = []
+            for line in rest:
+                cost = estimate_tokens(line)
+                if cost > budget:
+                    break
+                listed.append(line)
+                budget -= cost
+
+            title = "Комнаты:" if not relevant_ids else "Другие комнаты:"
+            skipped = len(rest) - len(listed)
+            if skipped:
+                listed.append(f"... и ещё {skipped}")
+            parts.append("\n".join([title] + listed))
+
+        return "\n\n".join(parts)
+
+    def relevant_rooms(
+        self,
+        project: Project,
+        message: str,
+        selected_room_id: Optional[str] = None
+    ) -> List[Room]:
+        """Комнаты, упомянутые в сообщении, затем выбранная (не больше max_relevant_rooms)"""
+        words = self._words(message)
+        # Длинные названия первыми: «Детская 2» важнее, чем «Детская»
+        mentioned = [
+            room for room in sorted(project.rooms, key=lambda r: -len(r.name))
+            if room.name and self._name_mentioned(room.name, words)
+        ]
+
+        result = []
+        seen = set()
+        for room in mentioned:
+            if room.id not in seen:
+                seen.add(room.id)
+                result.append(room)
+
+        if selected_room_id and selected_room_id not in seen:
+            room = project.get_room_by_id(selected_room_id)
+            if room:
+                result.append(room)
+
+        return result[:self.max_relevant_rooms]
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        return re.findall(r"\w+", text.lower())
+
+    @classmethod
+    def _name_mentioned(cls, name: str, words: List[str]) -> bool:
+        """
+        Все слова названия есть в сообщении; окончания слов не учитываются
+        («на кухне» находит «Кухня»), числа сравниваются целиком
+        """
+        name_words = cls._words(name)
+        if not name_words:
+            return False
+        for part in name_words:
+            if part.isdigit() or len(part) < 4:
+                found = part in words
+            else:
+                stem = part[:-1]
+                found = any(word.startswith(stem) for word in words)
+            if not found:
+                return False
+        return True
+
+    # === Кэшируемые части ===
+
+    def _project_overview(self, project: Project) -> Tuple[str, List[str]]:
+        """Сводка проекта и строки списка комнат (пересчёт только при смене версии)"""
+        version = project_version(project)
+        if self._overview and self._overview[0] == version:
+            return self._overview[1], self._overview[2]
+
+        areas = [room.floor_area for room in project.rooms]
+        windows = sum(len(w.windows) for room in project.rooms for w in room.walls)
+        doors = sum(len(w.doors) for room in project.rooms for w in room.walls)
+
+        lines = [f"Проект: {project.name}"]
+        if sum(len(b.levels) for b in project.buildings) > 1:
+            # Контекст - только активный этаж
+            level = project.active_level
+            lines.append(f"Этаж: {level.name} (отметка {level.elevation / 1000:+.3f} м)")
+        lines += [
+            f"Общая площадь: {sum(areas):.1f} м²",
+            f"Количество комнат: {len(project.rooms)}"
+        ]
+        if areas:
+            lines.append(
+                f"Площадь комнат: от {min(areas):.1f} до {max(areas):.1f} м², "
+                f"медиана {median(areas):.1f} м²"
+            )
+        lines.append(f"Окон: {windows}, дверей: {doors}, мебели: {len(project.furniture)}")
+
+        room_lines = [f"- {room.name}: {area:.1f} м²" for room, area in zip(project.rooms, areas)]
+
+        header = "\n".join(lines)
+        self._overview = (version, header, room_lines)
+        return header, room_lines
+
+    def _room_text(self, room: Room, detailed: bool) -> str:
+        key = (room_fingerprint(room), detailed)
+        text = self._room_cache.get(key)
+        if text is not None:
+            self._room_cache.move_to_end(key)
+            return text
+
+        if detailed:
+            text = PromptBuilder.room_description(room)
+        else:
+            windows = sum(len(w.windows) for w in room.walls)
+            doors = sum(len(w.doors) for w in room.walls)
+            text = (
+                f"Комната: {room.name}\n"
+                f"Площадь пола: {room.floor_area:.1f} м², высота потолка {room.ceiling_height:.0f} мм\n"
+                f"Стен: {len(room.walls)}, окон: {windows}, дверей: {doors}"
+            )
+
+        self._room_cache[key] = text
+        if len(self._room_cache) > self.MAX_CACHED_ROOMS:
+            self._room_cache.popitem(last=False)
+        return text
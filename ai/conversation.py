@@ -0,0 +1,157 @@
+"""
+Память диалога с AI: последние реплики дословно, ранние - сжатой сводкой
+
+Память хранится в проекте (Project.ai_conversation), поэтому при повторном
+открытии .dizain разговор продолжается без повторной отправки всей истории.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from .context_builder import estimate_tokens
+
+
+class ConversationMemory:
+    """
+    Память чата (потокобезопасная)
+
+    Недавние реплики хранятся дословно. Когда их становится больше
+    max_recent_messages или они превышают recent_token_budget, самые старые
+    забираются take_overflow() и после сжатия (DesignGenerator.summarize_conversation)
+    входят в сводку через set_summary().
+    """
+
+    def __init__(
+        self,
+        max_recent_messages: int = 8,
+        recent_token_budget: int = 1500,
+        summary_token_budget: int = 400
+    ):
+        """
+        Args:
+            max_recent_messages: Сколько последних реплик хранить дословно
+            recent_token_budget: Бюджет токенов на дословные реплики в запросе
+            summary_token_budget: Предельный размер сводки (токенов)
+        """
+        self.max_recent_messages = max_recent_messages
+        self.recent_token_budget = recent_token_budget
+        self.summary_token_budget = summary_token_budget
+
+        self.summary = ""
+        self.recent: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+
+    # === Изменение ===
+
+    def add(self, role: str, content: str):
+        """Добавить реплику ("user" / "assistant"); пустые ответы не сохраняются"""
+        if not content:
+            return
+        with self._lock:
+            self.recent.append({"role": role, "content": content})
+
+    def needs_compaction(self) -> bool:
+        with self._lock:
+            return self._overflow_count() > 0
+
+    def take_overflow(self) -> List[Dict[str, str]]:
+        """Забрать старые реплики, не помещающиеся в лимиты, для сжатия"""
+        with self._lock:
+            count = self._overflow_count()
+            overflow = self.recent[:count]
+            del self.recent[:count]
+            return overflow
+
+    def set_summary(self, summary: str):
+        """Новая сводка (уже включает реплики из take_overflow)"""
+        with self._lock:
+            self.summary = self._truncate(summary.strip(), self.summary_token_budget)
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.recent = []
+
+    def _overflow_count(self) -> int:
+        count = max(0, len(self.recent) - self.max_recent_messages)
+        tokens = sum(estimate_tokens(m["content"]) for m in self.recent[count:])
+
+        # Последняя реплика остаётся дословной в любом случае
+        while tokens > self.recent_token_budget and count < len(self.recent) - 1:
+            tokens -= estimate_tokens(self.recent[count]["content"])
+            count += 1
+
+        # Вопрос и ответ уходят в сводку вместе
+        if 0 < count < len(self.recent) and self.recent[count]["role"] == "assistant":
+            count += 1
+        return count
+
+    # === Чтение ===
+
+    def context_messages(self) -> List[Dict[str, str]]:
+        """Сводка и недавние реплики для передачи в DesignGenerator.chat"""
+        with self._lock:
+            messages = []
+            if self.summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"Краткое содержание предыдущего разговора:\n{self.summary}"
+                })
+
+            # С конца, пока хватает бюджета
+            recent = []
+            budget = self.recent_token_budget
+            for message in reversed(self.recent):
+                cost = estimate_tokens(message["content"])
+                if cost > budget and recent:
+                    break
+                recent.append(dict(message))
+                budget -= cost
+
+            messages.extend(reversed(recent))
+            return messages
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self.summary and not self.recent
+
+    @staticmethod
+    def fallback_summary(summary: str, messages: List[Dict[str, str]],
+                         max_chars: int = 200) -> str:
+        """Сводка без GPT: начало каждой реплики (если сжатие запросом не удалось)"""
+        lines = [summary] if summary else []
+        for message in messages:
+            who = "Пользователь" if message["role"] == "user" else "AI"
+            text = " ".join(message["content"].split())
+            if len(text) > max_chars:
+                text = text[:max_chars].rstrip() + "…"
+            lines.append(f"{who}: {text}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _truncate(text: str, token_budget: int) -> str:
+        """Обрезать сводку с начала: свежие сведения важнее"""
+        max_chars = token_budget * 3
+        if len(text) <= max_chars:
+            return text
+        return "…" + text[-max_chars:]
+
+    # === Сериализация ===
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "recent": [dict(m) for m in self.recent]
+            }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], **options) -> 'ConversationMemory':
+        memory = cls(**options)
+        if data:
+            memory.summary = data.get("summary", "")
+            memory.recent = [
+                {"role": m["role"], "content": m["content"]}
+                for m in data.get("recent", [])
+            ]
+        return memory
@@ -2,16 +2,33 @@
 Генератор дизайна с использованием GPT
 """
 
-import json
-import re
-from typing import Optional, Dict, List, Callable
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Dict, List, Callable, Iterator
 from dataclasses import dataclass
 
 from .gpt_client import GPTClient, GPTResponse
+from .async_client import AsyncGPTClient
 from .prompts import PromptBuilder
+from .context_builder import ProjectContextBuilder
+from .conversation import ConversationMemory
+from .json_stream import StreamingJSONParser, parse_json_object
+from .offline_designer import OfflineDesigner
+from .layout_solver import LayoutProcess, LayoutResult, resolve_furniture_keys
 from core.room import Room
 from core.project import Project
-from core.furniture import FurnitureItem, FurnitureCategory
+from core.furniture import (
+    FurnitureItem, FurnitureCategory, FURNITURE_LIBRARY, create_furniture_from_library
+)
+
+# Ответ API - один JSON-объект (JSON mode)
+JSON_FORMAT = {"type": "json_object"}
+
+# Ошибки, при которых вместо ответа GPT выдаётся локальный вариант
+OFFLINE_FALLBACK_ERRORS = ("rate_limit", "connection", "server", "circuit_open")
 
 
 @dataclass
@@ -24,6 +41,113 @@ class DesignSuggestion:
     raw_response: str
 
 
+def normalize_placement(raw: Dict, room: Room) -> Optional[Dict]:
+    """
+    Позиция мебели из ответа GPT в координатах плана
+
+    GPT указывает угол предмета от левого нижнего угла комнаты; результат -
+    {"key", "name", "x", "y", "rotation", "width", "depth", "height"} в мм
+    плана. None - если предмет не распознан и размеры не указаны.
+    """
+    if not isinstance(raw, dict):
+        return None
+
+    keys, _ = resolve_furniture_keys([str(raw.get("key") or raw.get("name") or "")])
+    key = keys[0] if keys else None
+    library = FURNITURE_LIBRARY.get(key, {})
+
+    try:
+        width = float(raw.get("width") or library.get("width", 0))
+        depth = float(raw.get("depth") or library.get("depth", 0))
+        height = float(raw.get("height") or library.get("height", 0))
+        x = float(raw.get("x", 0))
+        y = float(raw.get("y", 0))
+        rotation = float(raw.get("rotation", 0)) % 360
+    except (TypeError, ValueError):
+        return None
+
+    if width <= 0 or depth <= 0:
+        return None
+
+    origin_x = min((w.start.x for w in room.walls), default=0)
+    origin_y = min((w.start.y for w in room.walls), default=0)
+
+    return {
+        "key": key,
+        "name": raw.get("name") or library.get("name", "Предмет"),
+        "x": origin_x + x,
+        "y": origin_y + y,
+        "rotation": rotation,
+        "width": width,
+        "depth": depth,
+        "height": height
+    }
+
+
+def placement_to_furniture(placement: Dict) -> FurnitureItem:
+    """Предмет мебели по позиции из normalize_placement"""
+    if placement["key"]:
+        item = create_furniture_from_library(placement["key"], placement["x"], placement["y"])
+    else:
+        item = FurnitureItem(
+            name=placement["name"],
+            category=FurnitureCategory.DECOR,
+            x=placement["x"],
+            y=placement["y"]
+        )
+    item.name = placement["name"]
+    item.width = placement["width"]
+    item.depth = placement["depth"]
+    item.height = placement["height"] or item.height
+    item.rotation = placement["rotation"]
+    return item
+
+
+@dataclass
+class RoomDesignResult:
+    """Результат генерации для одной комнаты в пакетном режиме"""
+    room_id: str
+    room_name: str
+    suggestion: Optional[DesignSuggestion] = None
+    error: str = ""
+    attempts: int = 0
+    offline: bool = False  # suggestion от OfflineDesigner (GPT недоступен)
+
+    @property
+    def success(self) -> bool:
+        return self.suggestion is not None
+
+
+class _SharedBackoff:
+    """Общая для всех потоков пауза после ответа «превышен лимит запросов»"""
+
+    BASE_DELAY = 1.0  # с
+    MAX_DELAY = 60.0  # с
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def fail(self, attempt: int, retry_after: float = 0):
+        """Назначить паузу: Retry-After сервера или экспонента с полным джиттером"""
+        if retry_after:
+            delay = retry_after
+        else:
+            delay = random.uniform(0, min(self.MAX_DELAY, self.BASE_DELAY * 2 ** attempt))
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def wait(self, cancel_event: threading.Event) -> bool:
+        """Дождаться окончания паузы. False - если запрошена отмена"""
+        while True:
+            with self._lock:
+                remaining = self._resume_at - time.monotonic()
+            if remaining <= 0:
+                return not cancel_event.is_set()
+            if cancel_event.wait(remaining):
+                return False
+
+
 class DesignGenerator:
     """Генератор дизайн-предложений"""
 
@@ -50,16 +174,29 @@ class DesignGenerator:
         "hallway": "Прихожая"
     }
 
-    def __init__(self, gpt_client: GPTClient):
+    def __init__(self, gpt_client: GPTClient, async_client: Optional[AsyncGPTClient] = None):
         self.gpt = gpt_client
+        # Асинхронный клиент для чата (по умолчанию - с настройками gpt_client)
+        self.async_gpt = async_client or AsyncGPTClient.from_client(gpt_client)
         self.prompt_builder = PromptBuilder()
+        self.context_builder = ProjectContextBuilder()
+        self.offline = OfflineDesigner(self.STYLES, self.ROOM_TYPES)
+
+    def _offline_fallback(self, response: Optional[GPTResponse] = None) -> bool:
+        """Отвечать локально: API не настроен или недоступен, а текста ещё нет"""
+        if not self.gpt.is_configured():
+            return True
+        return (response is not None and response.error_type in OFFLINE_FALLBACK_ERRORS
+                and not response.content)
 
     def generate_design(
         self,
         room: Room,
         style: str,
         preferences: str = "",
-        callback: Optional[Callable[[str], None]] = None
+        callback: Optional[Callable[[str], None]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_placement: Optional[Callable[[Dict], None]] = None
     ) -> Optional[DesignSuggestion]:
         """
         Сгенерировать дизайн для комнаты
@@ -69,21 +206,31 @@ class DesignGenerator:
             style: Стиль дизайна
             preferences: Дополнительные пожелания
             callback: Функция для отображения прогресса
+            on_token: Если задана - ответ запрашивается потоком и каждый
+                фрагмент текста описания передаётся сюда по мере генерации
+            on_placement: Получает позиции мебели (normalize_placement)
+                по мере поступления, до окончания ответа
 
         Returns:
-            DesignSuggestion или None при ошибке
+            DesignSuggestion или None при ошибке. Если API не настроен
+            или недоступен - локальный вариант OfflineDesigner
         """
-        if callback:
-            callback("Генерация дизайн-концепции...")
-
-        prompt = PromptBuilder.design_style_prompt(room, style, preferences)
-
-        response = self.gpt.send_message([
-            {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER},
-            {"role": "user", "content": prompt}
-        ])
+        response = None
+        if not self._offline_fallback():
+            if callback:
+                callback("Генерация дизайн-концепции...")
+            response = self._request_design(room, style, preferences, on_token, on_placement)
+
+        if response is None or not response.success:
+            if self._offline_fallback(response):
+                if callback:
+                    callback("AI недоступен - локальный вариант дизайна")
+                suggestion = self.offline.design(room, style, preferences)
+                if on_placement:
+                    for placement in suggestion.furniture_placements:
+                        on_placement(placement)
+                return suggestion
 
-        if not response.success:
             if callback:
                 callback(f"Ошибка: {response.error}")
             return None
@@ -91,72 +238,279 @@ class DesignGenerator:
         if callback:
             callback("Анализ ответа...")
 
-        # Парсим ответ
+        return self._parse_design(response, room)
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        on_token: Optional[Callable[[str], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        **kwargs
+    ) -> GPTResponse:
+        """Запрос к GPT: обычный или потоковый (если задан on_token)"""
+        if on_token is None:
+            return self.gpt.send_message(messages, **kwargs)
+
+        stream = self.gpt.stream_message(messages, cancel_event=cancel_event, **kwargs)
+        for delta in stream:
+            on_token(delta)
+        return stream.response
+
+    def _request_design(
+        self,
+        room: Room,
+        style: str,
+        preferences: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        on_placement: Optional[Callable[[Dict], None]] = None,
+        max_retries: Optional[int] = None
+    ) -> GPTResponse:
+        """Запрос дизайн-концепции для комнаты (ответ - JSON)"""
+        prompt = PromptBuilder.design_json_prompt(room, style, preferences)
+        messages = [
+            {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER},
+            {"role": "user", "content": prompt}
+        ]
+
+        # Поток разбирается на лету: текст описания и готовые позиции мебели
+        parser = None
+        if on_token or on_placement:
+            parser = StreamingJSONParser()
+            if on_token:
+                parser.on_string(("description",), on_token)
+            if on_placement:
+                def placement_ready(raw):
+                    placement = normalize_placement(raw, room)
+                    if placement:
+                        on_placement(placement)
+                parser.on_value(("furniture_placements", "*"), placement_ready)
+
+        options = {} if max_retries is None else {"max_retries": max_retries}
+        # Творческий запрос: при повторе ожидается новый вариант, кэш не нужен
+        return self._complete(
+            messages, parser.feed if parser else None,
+            use_cache=False, response_format=JSON_FORMAT, **options
+        )
+
+    def _parse_design(self, response: GPTResponse, room: Room) -> DesignSuggestion:
+        """
+        Разбор JSON-ответа в DesignSuggestion
+
+        Оборванный или некорректный JSON не запрашивается повторно: берутся
+        полностью полученные позиции мебели и текст описания, а если ответ
+        вовсе не JSON - весь текст как описание.
+        """
+        content = response.content or ""
+        parser = StreamingJSONParser()
+        placements_raw: List[Dict] = []
+        description_parts: List[str] = []
+        parser.on_value(("furniture_placements", "*"), placements_raw.append)
+        parser.on_string(("description",), description_parts.append)
+        parser.feed(content)
+
+        data = parser.result()
+        if not isinstance(data, dict):
+            data = {}
+
+        description = data.get("description")
+        if not isinstance(description, str):
+            description = "".join(description_parts) or content
+
+        color_scheme = data.get("color_scheme")
+        materials = data.get("materials")
+        if isinstance(materials, str):
+            materials = {"text": materials}
+
+        placements = [normalize_placement(raw, room) for raw in placements_raw]
+
         return DesignSuggestion(
-            description=response.content,
-            furniture_placements=[],  # TODO: парсинг JSON из ответа
-            color_scheme={},
-            materials={},
-            raw_response=response.content
+            description=description,
+            furniture_placements=[p for p in placements if p],
+            color_scheme=color_scheme if isinstance(color_scheme, dict) else {},
+            materials=materials if isinstance(materials, dict) else {},
+            raw_response=content
         )
 
-    def suggest_furniture_layout(
+    def generate_designs(
         self,
-        room: Room,
-        furniture_names: List[str]
-    ) -> Optional[List[Dict]]:
-        """Получить рекомендации по расстановке мебели"""
-        prompt = PromptBuilder.furniture_arrangement_prompt(room, furniture_names)
+        rooms: List[Room],
+        style: str,
+        preferences: str = "",
+        max_concurrency: int = 3,
+        max_retries: int = 4,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Iterator[RoomDesignResult]:
+        """
+        Сгенерировать дизайн для нескольких комнат параллельно
+
+        Результаты выдаются по мере готовности (не в порядке комнат).
+        При превышении лимита запросов все потоки делают общую паузу
+        (Retry-After сервера или экспоненциальная с джиттером).
+
+        Args:
+            rooms: Комнаты (например, project.rooms)
+            style: Стиль дизайна
+            preferences: Дополнительные пожелания
+            max_concurrency: Максимум одновременных запросов
+            max_retries: Повторы при лимите запросов/ошибке сети
+            cancel_event: Установка события отменяет оставшиеся комнаты
+
+        Yields:
+            RoomDesignResult для каждой обработанной комнаты
+        """
+        cancel_event = cancel_event or threading.Event()
+        backoff = _SharedBackoff()
+
+        def offline(result: RoomDesignResult, room: Room) -> RoomDesignResult:
+            result.suggestion = self.offline.design(room, style, preferences)
+            result.offline = True
+            return result
+
+        def run(room: Room) -> RoomDesignResult:
+            result = RoomDesignResult(room_id=room.id, room_name=room.name)
+            if self._offline_fallback():
+                return offline(result, room)
+
+            response = None
+            for attempt in range(max_retries + 1):
+                if not backoff.wait(cancel_event):
+                    result.error = "Отменено"
+                    return result
+
+                result.attempts = attempt + 1
+                # Повторы только здесь, с общей для всех потоков паузой:
+                # собственные повторы клиента ждали бы каждый сам по себе
+                response = self._request_design(room, style, preferences, max_retries=0)
+
+                if response.success:
+                    result.suggestion = self._parse_design(response, room)
+                    return result
+
+                result.error = response.error
+                if not response.retryable:
+                    break
+
+                backoff.fail(attempt, response.retry_after)
+
+            if self._offline_fallback(response):
+                return offline(result, room)
+            return result
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency),
+            thread_name_prefix="design"
+        )
+        pending = {executor.submit(run, room) for room in rooms}
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if not future.cancelled():
+                        yield future.result()
+
+                if cancel_event.is_set():
+                    for future in pending:
+                        future.cancel()
+        finally:
+            # Генератор закрыт досрочно - отменяем оставшиеся комнаты
+            if pending:
+                cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def suggest_furniture_items(self, room: Room, style: str) -> Optional[List[str]]:
+        """Получить от GPT только список мебели (ключи FURNITURE_LIBRARY)"""
+        prompt = PromptBuilder.furniture_list_prompt(room, self.STYLES.get(style, style))
 
         response = self.gpt.send_message([
             {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER},
             {"role": "user", "content": prompt}
-        ])
+        ], temperature=0.3, max_tokens=500, response_format=JSON_FORMAT)
 
         if not response.success:
             return None
 
-        # Пытаемся извлечь JSON из ответа
-        try:
-            json_match = re.search(r'\{[\s\S]*\}', response.content)
-            if json_match:
-                data = json.loads(json_match.group())
-                return data.get("furniture", [])
-        except json.JSONDecodeError:
-            pass
+        data = parse_json_object(response.content)
+        if data is None or not isinstance(data.get("furniture"), list):
+            return None
 
-        return None
+        keys, _ = resolve_furniture_keys([str(name) for name in data["furniture"]])
+        return keys
+
+    def suggest_furniture_layout(
+        self,
+        room: Room,
+        furniture_names: List[str],
+        time_budget: float = 2.0,
+        callback: Optional[Callable[[str], None]] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Расставить мебель в комнате
+
+        Координаты считает локальный решатель (LayoutSolver) в отдельном
+        процессе - без запроса к GPT.
+
+        Args:
+            room: Комната
+            furniture_names: Ключи или названия из FURNITURE_LIBRARY
+            time_budget: Лимит времени на поиск (с)
+            callback: Функция для отображения прогресса
+
+        Returns:
+            [{"name", "x", "y", "rotation", ...}] или None, если мебель не распознана
+        """
+        keys, unknown = resolve_furniture_keys(furniture_names)
+        if not keys:
+            return None
+
+        if callback and unknown:
+            callback(f"Пропущено (нет в библиотеке): {', '.join(unknown)}")
+
+        def report(fraction: float, best: LayoutResult):
+            if callback:
+                callback(f"Расстановка мебели: {fraction:.0%}")
+
+        job = LayoutProcess(room, keys, time_budget=time_budget)
+        job.start()
+        result = job.wait(progress=report, timeout=time_budget + 30)
+
+        if result is None:
+            job.cancel()
+            return None
+
+        return result.placements
 
     def get_color_scheme(self, style: str, room_type: str) -> Optional[Dict]:
-        """Получить цветовую схему"""
+        """Получить цветовую схему (локальную палитру, если GPT недоступен)"""
+        if self._offline_fallback():
+            return self.offline.color_scheme(style, room_type)
+
         prompt = PromptBuilder.color_scheme_prompt(
             self.STYLES.get(style, style),
             self.ROOM_TYPES.get(room_type, room_type)
         )
 
-        response = self.gpt.send_simple(
-            prompt,
-            PromptBuilder.SYSTEM_INTERIOR_DESIGNER
-        )
+        response = self.gpt.send_message([
+            {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER},
+            {"role": "user", "content": prompt}
+        ], response_format=JSON_FORMAT)
 
         if not response.success:
+            if self._offline_fallback(response):
+                return self.offline.color_scheme(style, room_type)
             return None
 
-        try:
-            json_match = re.search(r'\{[\s\S]*\}', response.content)
-            if json_match:
-                return json.loads(json_match.group())
-        except json.JSONDecodeError:
-            pass
-
-        return None
+        return parse_json_object(response.content)
 
     def get_materials_advice(
         self,
         room: Room,
         budget: str = "средний"
     ) -> Optional[str]:
-        """Получить рекомендации по материалам"""
+        """Получить рекомендации по материалам (расчёт по правилам, если GPT недоступен)"""
+        if self._offline_fallback():
+            return self.offline.materials_advice(room)
+
         prompt = PromptBuilder.materials_advice_prompt(room, budget)
 
         response = self.gpt.send_message([
@@ -166,24 +520,113 @@ class DesignGenerator:
 
         if response.success:
             return response.content
+        if self._offline_fallback(response):
+            return self.offline.materials_advice(room)
         return None
 
-    def chat(self, message: str, context: Optional[Project] = None) -> str:
-        """Чат с AI-ассистентом"""
+    @staticmethod
+    def _summary_messages(summary: str, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER},
+            {"role": "user", "content": PromptBuilder.conversation_summary_prompt(summary, messages)}
+        ]
+
+    def summarize_conversation(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        """Сжать ранние реплики чата в сводку через GPT (если он недоступен - по началу реплик)"""
+        response = self.gpt.send_message(
+            self._summary_messages(summary, messages), temperature=0.3, max_tokens=400
+        )
+
+        if response.success and response.content:
+            return response.content
+        return ConversationMemory.fallback_summary(summary, messages)
+
+    async def summarize_conversation_async(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        """Асинхронный аналог summarize_conversation (через async_gpt)"""
+        response = await self.async_gpt.send_message(
+            self._summary_messages(summary, messages), temperature=0.3, max_tokens=400
+        )
+
+        if response.success and response.content:
+            return response.content
+        return ConversationMemory.fallback_summary(summary, messages)
+
+    def _chat_messages(
+        self,
+        message: str,
+        context: Optional[Project],
+        history: Optional[List[Dict[str, str]]],
+        selected_room_id: Optional[str]
+    ) -> List[Dict[str, str]]:
         messages = [
             {"role": "system", "content": PromptBuilder.SYSTEM_INTERIOR_DESIGNER}
         ]
 
         if context:
-            project_desc = PromptBuilder.project_description(context)
+            # Сводка с бюджетом токенов вместо описания всех стен проекта
+            project_desc = self.context_builder.build(context, message, selected_room_id)
             messages.append({
                 "role": "system",
                 "content": f"Контекст проекта:\n{project_desc}"
             })
 
+        if history:
+            messages.extend(history)
         messages.append({"role": "user", "content": message})
+        return messages
+
+    def chat(
+        self,
+        message: str,
+        context: Optional[Project] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        selected_room_id: Optional[str] = None
+    ) -> str:
+        """
+        Чат с AI-ассистентом
+
+        Args:
+            message: Сообщение пользователя
+            context: Проект для контекста
+            on_token: Потоковая выдача ответа по фрагментам
+            history: Предыдущие реплики ({"role", "content"}) в хронологическом порядке,
+                например ConversationMemory.context_messages()
+            cancel_event: Прерывание потоковой выдачи
+            selected_room_id: Выбранная комната - описывается в контексте подробнее
+        """
+        messages = self._chat_messages(message, context, history, selected_room_id)
+        response = self._complete(messages, on_token, cancel_event, use_cache=False)
+
+        if response.success:
+            return response.content
+        return f"Ошибка: {response.error}"
+
+    async def chat_async(
+        self,
+        message: str,
+        context: Optional[Project] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        selected_room_id: Optional[str] = None
+    ) -> str:
+        """
+        Асинхронный аналог chat (через async_gpt, ответ всегда потоковый)
+
+        Выдачу прерывает отмена задачи: CancelledError уходит вызывающему,
+        уже выданный текст он собирает сам из on_token.
+        """
+        # Сборка контекста обходит проект - не в потоке цикла событий
+        messages = await asyncio.to_thread(
+            self._chat_messages, message, context, history, selected_room_id
+        )
 
-        response = self.gpt.send_message(messages)
+        stream = self.async_gpt.stream_message(messages)
+        async for delta in stream:
+            if on_token:
+                on_token(delta)
+        response = stream.response
 
         if response.success:
             return response.content
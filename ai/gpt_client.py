@@ -1,13 +1,27 @@
 """
 Клиент для работы с OpenAI GPT API
+
+Временные сбои (лимит запросов, сеть, 5xx) повторяются с экспоненциальной
+задержкой и джиттером с учётом Retry-After; медленные запросы можно
+хеджировать дубликатом, а автомат защиты прекращает запросы к
+недоступному API, чтобы рабочие потоки не зависали на таймаутах.
 """
 
 import json
-from typing import Optional, Dict, List, Callable
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, List, Callable, Iterator
 from dataclasses import dataclass
+import httpx
 import openai
 from openai import OpenAI
 
+from .response_cache import ResponseCache
+from .metrics import MetricsRecorder, RequestMetrics, estimate_cost
+
 
 @dataclass
 class GPTResponse:
@@ -16,24 +30,302 @@ class GPTResponse:
     content: str = ""
     error: str = ""
     tokens_used: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0  # Полное время запроса (с)
+    retries: int = 0  # Сколько раз запрос повторялся
+    error_type: str = ""  # auth / rate_limit / connection / server / circuit_open / cancelled / other
+    retry_after: float = 0  # Рекомендованная пауза (с), если сервер её передал
+    first_token_latency: float = 0  # Время до первого токена при потоковой выдаче (с)
+    cached: bool = False  # Ответ взят из ResponseCache
+
+    @property
+    def retryable(self) -> bool:
+        """Имеет ли смысл повторить запрос"""
+        return self.error_type in ("rate_limit", "connection", "server")
+
+
+@dataclass
+class ConnectionSettings:
+    """Параметры HTTP-соединений с API"""
+    timeout: float = 60.0  # Общий таймаут запроса (с)
+    connect_timeout: float = 10.0  # Таймаут установки соединения (с)
+    max_connections: int = 10  # Размер пула соединений
+    max_keepalive: int = 5  # Сколько соединений держать открытыми
+    keepalive_expiry: float = 60.0  # Время жизни простаивающего соединения (с)
+    max_concurrent_requests: int = 4  # Одновременных запросов (асинхронный клиент)
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def httpx_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+
+@dataclass
+class RetryPolicy:
+    """Повторы, хеджирование и автомат защиты для GPTClient"""
+    max_retries: int = 3  # Повторов при лимите запросов, сбое сети или 5xx
+    base_delay: float = 0.5  # Базовая пауза экспоненциальной задержки (с)
+    max_delay: float = 30.0  # Предельная пауза (с)
+    # Хеджирование: если ответа нет дольше этого перцентиля задержки (например,
+    # 0.95), параллельно отправляется дубликат и берётся первый ответ. None - выкл.
+    hedge_percentile: Optional[float] = None
+    hedge_min_delay: float = 2.0  # Раньше этого срока дубликат не отправляется (с)
+    hedge_min_samples: int = 20  # Сколько запросов нужно для оценки перцентиля
+    breaker_threshold: int = 5  # Подряд неудач (сеть/5xx) до размыкания
+    breaker_reset: float = 30.0  # Через сколько секунд пробовать снова (с)
+
+    def backoff(self, attempt: int, retry_after: float = 0) -> float:
+        """Пауза перед повтором: Retry-After сервера или экспонента с полным джиттером"""
+        if retry_after:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Автомат защиты: после серии сбоев API запросы сразу завершаются ошибкой
+
+    closed - запросы идут; open - отклоняются до истечения reset_timeout;
+    half_open - пропускается один пробный запрос, его результат замыкает
+    или снова размыкает автомат. Так при деградации API рабочие потоки
+    не копятся в ожидании таймаутов.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Пробный запрос уже выполняется или время ещё не вышло
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Запрос завершился без результата (отменён, прерван потребителем)
+
+        Пробный запрос в half_open не решает ничего: автомат возвращается
+        в open с истёкшим таймаутом, и следующий запрос станет пробным.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def retry_in(self) -> float:
+        """Сколько секунд до пробного запроса"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+# Потоки для дублирующих (хеджированных) запросов
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gpt-hedge")
+
+_shared_http_lock = threading.Lock()
+_shared_http_client: Optional[httpx.Client] = None
+
+
+def shared_http_client(settings: Optional[ConnectionSettings] = None) -> httpx.Client:
+    """
+    Общий для всех GPTClient пул HTTP-соединений
+
+    Создаётся один раз на процесс, поэтому смена ключа или новый
+    GPTClient не открывают новых TLS-соединений.
+    """
+    global _shared_http_client
+    with _shared_http_lock:
+        if _shared_http_client is None or _shared_http_client.is_closed:
+            settings = settings or ConnectionSettings()
+            _shared_http_client = openai.DefaultHttpxClient(
+                timeout=settings.httpx_timeout(),
+                limits=settings.httpx_limits()
+            )
+        return _shared_http_client
 
 
-class GPTClient:
+def error_response(error: Exception) -> 'GPTResponse':
+    """Преобразовать исключение OpenAI в GPTResponse с понятным текстом"""
+    if isinstance(error, openai.AuthenticationError):
+        return GPTResponse(
+            success=False,
+            error="Неверный API ключ. Проверьте настройки.",
+            error_type="auth"
+        )
+    if isinstance(error, openai.RateLimitError):
+        return GPTResponse(
+            success=False,
+            error="Превышен лимит запросов. Подождите немного.",
+            error_type="rate_limit",
+            retry_after=retry_after_seconds(error)
+        )
+    if isinstance(error, openai.APIConnectionError):
+        return GPTResponse(
+            success=False,
+            error="Ошибка подключения. Проверьте интернет.",
+            error_type="connection"
+        )
+    if isinstance(error, openai.InternalServerError):
+        return GPTResponse(
+            success=False,
+            error="Сервис AI временно недоступен. Повторите позже.",
+            error_type="server",
+            retry_after=retry_after_seconds(error)
+        )
+    return GPTResponse(
+        success=False,
+        error=f"Ошибка: {str(error)}",
+        error_type="other"
+    )
+
+
+def retry_after_seconds(error: Exception) -> float:
+    """Пауза из заголовков retry-after-ms / Retry-After (в секундах), 0 если их нет"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Retry-After может быть датой HTTP
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0
+
+
+class GPTClientBase:
+    """
+    Общее для GPTClient и AsyncGPTClient: метрики и автомат защиты
+
+    Наследник задаёт model, metrics, breaker и project_id.
+    """
+
+    def _record(self, response: GPTResponse, kind: str):
+        """Записать метрики запроса"""
+        if self.metrics is None:
+            return
+        cost = 0.0 if response.cached else estimate_cost(
+            self.model, response.prompt_tokens, response.completion_tokens
+        )
+        self.metrics.record(RequestMetrics(
+            model=self.model,
+            kind=kind,
+            success=response.success,
+            latency=response.latency,
+            first_token_latency=response.first_token_latency,
+            prompt_tokens=response.prompt_tokens,
+            completion_tokens=response.completion_tokens,
+            retries=response.retries,
+            cached=response.cached,
+            error_type=response.error_type,
+            cost=cost,
+            project_id=self.project_id
+        ))
+
+    def _circuit_open_response(self) -> GPTResponse:
+        return GPTResponse(
+            success=False,
+            error="Сервис AI временно недоступен. Повторите попытку позже.",
+            error_type="circuit_open",
+            retry_after=self.breaker.retry_in()
+        )
+
+    def _update_breaker(self, response: GPTResponse):
+        """
+        Сбои сети и 5xx размыкают автомат; любой ответ сервера его замыкает
+
+        Отмена ничего не говорит о доступности API и автомат не меняет.
+        """
+        if response.error_type == "cancelled":
+            self.breaker.release()
+        elif response.error_type in ("connection", "server"):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+
+class GPTClient(GPTClientBase):
     """Клиент для GPT API"""
 
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(self, api_key: str, model: str = "gpt-4o",
+                 connection: Optional[ConnectionSettings] = None,
+                 cache: Optional[ResponseCache] = None,
+                 metrics: Optional[MetricsRecorder] = None,
+                 retry: Optional[RetryPolicy] = None):
         self.api_key = api_key
         self.model = model
+        self.connection = connection or ConnectionSettings()
+        self.cache = cache  # Кэш ответов (None - без кэша)
+        self.metrics = metrics  # Сбор метрик (None - без метрик)
+        self.retry = retry or RetryPolicy()
+        self.breaker = CircuitBreaker(self.retry.breaker_threshold, self.retry.breaker_reset)
+        self.project_id = ""  # Проект, к которому относятся запросы (для метрик)
         self.client: Optional[OpenAI] = None
         self._init_client()
 
     def _init_client(self):
-        """Инициализация клиента OpenAI"""
+        """Инициализация клиента OpenAI (поверх общего пула соединений)"""
         if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = OpenAI(
+                api_key=self.api_key,
+                http_client=shared_http_client(self.connection),
+                timeout=self.connection.httpx_timeout(),
+                # Повторы выполняет RetryPolicy (с автоматом защиты и хеджированием)
+                max_retries=0
+            )
+        else:
+            self.client = None
 
     def set_api_key(self, api_key: str):
-        """Установить API ключ"""
+        """Установить API ключ (пул соединений сохраняется)"""
+        if api_key == self.api_key and self.client:
+            return
         self.api_key = api_key
         self._init_client()
 
@@ -41,11 +333,49 @@ class GPTClient:
         """Проверка настройки API"""
         return bool(self.api_key and self.client)
 
+    def _cache_key(self, messages: List[Dict[str, str]], temperature: float,
+                   max_tokens: int, use_cache: bool,
+                   response_format: Optional[Dict] = None) -> Optional[str]:
+        """Ключ кэша, если запрос можно кэшировать"""
+        if not use_cache or self.cache is None or not self.cache.accepts(temperature):
+            return None
+        return ResponseCache.make_key(
+            self.model, messages, temperature, max_tokens, response_format
+        )
+
+    @staticmethod
+    def _format_kwargs(response_format: Optional[Dict]) -> Dict:
+        """Параметр response_format передаётся, только если задан"""
+        return {"response_format": response_format} if response_format else {}
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Через сколько секунд отправлять дубликат (None - без хеджирования)"""
+        if self.retry.hedge_percentile is None or self.metrics is None:
+            return None
+        latency = self.metrics.latency_percentile(
+            self.retry.hedge_percentile, self.retry.hedge_min_samples
+        )
+        if not latency:
+            return None
+        return max(self.retry.hedge_min_delay, latency)
+
+    def _cached_response(self, key: Optional[str]) -> Optional[GPTResponse]:
+        if key is None:
+            return None
+        hit = self.cache.get(key)
+        if hit is None:
+            return None
+        content, tokens = hit
+        return GPTResponse(success=True, content=content, tokens_used=tokens, cached=True)
+
     def send_message(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: int = 4000
+        max_tokens: int = 4000,
+        use_cache: bool = True,
+        response_format: Optional[Dict] = None,
+        max_retries: Optional[int] = None
     ) -> GPTResponse:
         """
         Отправить сообщение в GPT
@@ -54,6 +384,10 @@ class GPTClient:
             messages: Список сообщений [{"role": "user/system/assistant", "content": "..."}]
             temperature: Креативность (0-1)
             max_tokens: Максимум токенов в ответе
+            use_cache: Брать ответ из кэша и сохранять в него (False - всегда новый ответ)
+            response_format: Формат ответа API, например {"type": "json_object"}
+            max_retries: Предел повторов вместо RetryPolicy.max_retries
+                (0 - без повторов, если повторяет вызывающий код)
 
         Returns:
             GPTResponse с результатом
@@ -64,43 +398,127 @@ class GPTClient:
                 error="API ключ не настроен. Укажите ключ в настройках."
             )
 
+        cache_key = self._cache_key(messages, temperature, max_tokens, use_cache, response_format)
+        cached = self._cached_response(cache_key)
+        if cached:
+            self._record(cached, "message")
+            return cached
+
+        if max_retries is None:
+            max_retries = self.retry.max_retries
+        started = time.monotonic()
+        retries = 0
+        while True:
+            if not self.breaker.allow():
+                response = self._circuit_open_response()
+                break
+
+            response = None
+            try:
+                response = self._request_hedged(messages, temperature, max_tokens, response_format)
+            finally:
+                if response is None:
+                    self.breaker.release()
+            self._update_breaker(response)
+            if response.success or not response.retryable or retries >= max_retries:
+                break
+
+            time.sleep(self.retry.backoff(retries, response.retry_after))
+            retries += 1
+
+        response.retries = retries
+        response.latency = time.monotonic() - started
+
+        if cache_key and response.success and response.content:
+            self.cache.put(cache_key, response.content, response.tokens_used)
+
+        self._record(response, "message")
+        return response
+
+    def _request_hedged(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict]
+    ) -> GPTResponse:
+        """
+        Запрос с хеджированием: если ответа нет дольше перцентиля задержки,
+        отправляется дубликат и берётся первый успешный ответ
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._request(messages, temperature, max_tokens, response_format)
+
+        args = (messages, temperature, max_tokens, response_format)
+        primary = _hedge_executor.submit(self._request, *args)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        pending = {primary, _hedge_executor.submit(self._request, *args)}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                response = future.result()
+                if response.success or not pending:
+                    # Опоздавший дубликат завершится сам, его результат не нужен
+                    return response
+
+    def _request(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict]
+    ) -> GPTResponse:
+        """Один запрос к API без кэша и метрик"""
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._format_kwargs(response_format)
             )
 
-            content = response.choices[0].message.content
-            tokens = response.usage.total_tokens if response.usage else 0
-
+            usage = response.usage
             return GPTResponse(
                 success=True,
-                content=content,
-                tokens_used=tokens
+                content=response.choices[0].message.content,
+                tokens_used=usage.total_tokens if usage else 0,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0
             )
 
-        except openai.AuthenticationError:
-            return GPTResponse(
-                success=False,
-                error="Неверный API ключ. Проверьте настройки."
-            )
-        except openai.RateLimitError:
-            return GPTResponse(
-                success=False,
-                error="Превышен лимит запросов. Подождите немного."
-            )
-        except openai.APIConnectionError:
-            return GPTResponse(
-                success=False,
-                error="Ошибка подключения. Проверьте интернет."
-            )
         except Exception as e:
-            return GPTResponse(
-                success=False,
-                error=f"Ошибка: {str(e)}"
-            )
+            return error_response(e)
+
+    def stream_message(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        cancel_event: Optional[threading.Event] = None,
+        use_cache: bool = True,
+        response_format: Optional[Dict] = None
+    ) -> 'GPTStream':
+        """
+        Отправить сообщение с потоковой выдачей (stream=True)
+
+        Пример:
+            stream = client.stream_message(messages)
+            for delta in stream:
+                ...  # фрагменты текста по мере генерации
+            response = stream.response  # итоговый GPTResponse
+
+        Установка cancel_event прерывает выдачу на ближайшем фрагменте.
+        Ответ из кэша выдаётся одним фрагментом.
+        """
+        return GPTStream(
+            self, messages, temperature, max_tokens, cancel_event, use_cache, response_format
+        )
 
     def send_simple(self, prompt: str, system_prompt: str = "") -> GPTResponse:
         """Упрощённая отправка одного запроса"""
@@ -111,4 +529,155 @@ class GPTClient:
 
         messages.append({"role": "user", "content": prompt})
 
-        return self.send_message(messages)
\ No newline at end of file
+        return self.send_message(messages)
+
+
+class GPTStream:
+    """
+    Потоковый ответ GPT: итерация выдаёт фрагменты текста
+
+    После окончания итерации в response лежит итоговый GPTResponse
+    (при ошибке или отмене - с уже полученной частью текста в content).
+    """
+
+    def __init__(self, client: GPTClient, messages: List[Dict[str, str]],
+                 temperature: float, max_tokens: int,
+                 cancel_event: Optional[threading.Event] = None,
+                 use_cache: bool = True,
+                 response_format: Optional[Dict] = None):
+        self.client = client
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cancel_event = cancel_event
+        self.use_cache = use_cache
+        self.response_format = response_format
+        self.response: Optional[GPTResponse] = None
+
+    def _cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def __iter__(self) -> Iterator[str]:
+        if not self.client.is_configured():
+            self.response = GPTResponse(
+                success=False,
+                error="API ключ не настроен. Укажите ключ в настройках."
+            )
+            return
+
+        started = time.monotonic()
+        try:
+            yield from self._iterate(started)
+        finally:
+            # Итерация, прерванная потребителем, ответа не оставляет - метрик нет
+            if self.response is not None:
+                if not self.response.cached:
+                    self.response.latency = time.monotonic() - started
+                self.client._record(self.response, "stream")
+
+    def _iterate(self, started: float) -> Iterator[str]:
+        cache_key = self.client._cache_key(
+            self.messages, self.temperature, self.max_tokens, self.use_cache,
+            self.response_format
+        )
+        cached = self.client._cached_response(cache_key)
+        if cached:
+            self.response = cached
+            yield cached.content
+            return
+
+        policy = self.client.retry
+        breaker = self.client.breaker
+        retries = 0
+        while True:
+            if not breaker.allow():
+                self.response = self.client._circuit_open_response()
+                break
+
+            # Потребитель может бросить итерацию (или on_token - упасть) посреди
+            # попытки: пробный запрос всё равно должен освободить автомат
+            settled = False
+            try:
+                yield from self._stream_once(cache_key, started)
+                response = self.response
+                self.client._update_breaker(response)
+                settled = True
+            finally:
+                if not settled:
+                    breaker.release()
+
+            # Повтор возможен, только пока текст не начал выдаваться
+            if (response.success or response.content or not response.retryable
+                    or retries >= policy.max_retries):
+                break
+
+            pause = policy.backoff(retries, response.retry_after)
+            if self.cancel_event is not None:
+                if self.cancel_event.wait(pause):
+                    break
+            else:
+                time.sleep(pause)
+            retries += 1
+
+        self.response.retries = retries
+
+    def _stream_once(self, cache_key: Optional[str], started: float) -> Iterator[str]:
+        """Одна попытка потокового запроса; итог - в self.response"""
+        first_token = 0.0
+        usage = None
+        parts: List[str] = []
+
+        try:
+            stream = self.client.client.chat.completions.create(
+                model=self.client.model,
+                messages=self.messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.client._format_kwargs(self.response_format)
+            )
+
+            with stream:
+                for chunk in stream:
+                    if self._cancelled():
+                        # Закрытие потока обрывает соединение - сервер прекращает генерацию
+                        self.response = GPTResponse(
+                            success=False,
+                            content="".join(parts),
+                            error="Запрос отменён",
+                            error_type="cancelled",
+                            first_token_latency=first_token
+                        )
+                        return
+
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            first_token = time.monotonic() - started
+                        parts.append(delta)
+                        yield delta
+
+            content = "".join(parts)
+            tokens = usage.total_tokens if usage else 0
+            if cache_key and content:
+                self.client.cache.put(cache_key, content, tokens)
+
+            self.response = GPTResponse(
+                success=True,
+                content=content,
+                tokens_used=tokens,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                first_token_latency=first_token
+            )
+
+        except Exception as e:
+            self.response = error_response(e)
+            self.response.content = "".join(parts)
+            self.response.first_token_latency = first_token
@@ -0,0 +1,262 @@
+"""
+Разбор JSON-ответа GPT по мере поступления
+
+StreamingJSONParser получает фрагменты потоковой выдачи и сообщает о
+готовых значениях по путям (например, каждый элемент массива
+furniture_placements сразу после закрывающей скобки) и о новых символах
+строковых полей - без ожидания конца ответа и повторного разбора.
+"""
+
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+# Путь к значению: ключи объектов и индексы массивов; "*" в шаблоне - любой индекс
+JSONPath = Tuple[Any, ...]
+
+
+def parse_json_object(text: str) -> Optional[dict]:
+    """
+    Первый JSON-объект в тексте
+
+    Ответ целиком, затем первый корректный объект с начала текста
+    (например, внутри ```json ... ```). В отличие от жадного
+    re.search(r'\\{[\\s\\S]*\\}') не захватывает текст между двумя объектами.
+    """
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    decoder = json.JSONDecoder()
+    start = text.find("{") if text else -1
+    while start != -1:
+        try:
+            data, _ = decoder.raw_decode(text, start)
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+
+    return None
+
+
+def _is_high_surrogate(digits: str) -> bool:
+    """Первая половина суррогатной пары (\\uD800-\\uDBFF)"""
+    try:
+        return len(digits) == 4 and 0xD800 <= int(digits, 16) <= 0xDBFF
+    except ValueError:
+        return False
+
+
+def _path_matches(pattern: JSONPath, path: JSONPath) -> bool:
+    if len(pattern) != len(path):
+        return False
+    return all(p == "*" and isinstance(k, int) or p == k for p, k in zip(pattern, path))
+
+
+class _Frame:
+    """Открытый объект или массив"""
+    __slots__ = ("is_object", "path", "start", "key", "expect_key")
+
+    def __init__(self, is_object: bool, path: JSONPath, start: int):
+        self.is_object = is_object
+        self.path = path
+        self.start = start
+        self.key: Any = None if is_object else 0
+        self.expect_key = is_object
+
+
+class StreamingJSONParser:
+    """
+    Потоковый разбор одного JSON-документа
+
+    Пример:
+        parser = StreamingJSONParser()
+        parser.on_value(("furniture_placements", "*"), apply_placement)
+        parser.on_string(("description",), show_text)
+        for delta in stream:
+            parser.feed(delta)
+        data = parser.result()
+
+    on_value срабатывает для объектов, массивов и строк; числа и литералы
+    доступны в составе родительского значения. Текст до первой «{» или «[»
+    (например, ```json) пропускается.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._finished = False
+        self._root_start = 0
+
+        # Текущая строка
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._string_path: JSONPath = ()
+        self._string_sink: Optional[Callable[[str], None]] = None
+        self._string_emitted = 0
+
+        self._value_handlers: List[Tuple[JSONPath, Callable[[Any], None]]] = []
+        self._string_handlers: List[Tuple[JSONPath, Callable[[str], None]]] = []
+
+    # === Подписки ===
+
+    def on_value(self, pattern: JSONPath, callback: Callable[[Any], None]):
+        """Вызывать callback с готовым значением по пути pattern"""
+        self._value_handlers.append((tuple(pattern), callback))
+
+    def on_string(self, pattern: JSONPath, callback: Callable[[str], None]):
+        """Вызывать callback с новыми символами строкового значения по пути pattern"""
+        self._string_handlers.append((tuple(pattern), callback))
+
+    # === Разбор ===
+
+    def feed(self, chunk: str):
+        """Добавить фрагмент ответа"""
+        self.text += chunk
+        text = self.text
+        pos = self._pos
+        end = len(text)
+
+        while pos < end and not self._finished:
+            ch = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._close_string(pos)
+                pos += 1
+                continue
+
+            if not self._started:
+                if ch in "{[":
+                    self._started = True
+                    self._root_start = pos
+                    self._open(ch == "{", (), pos)
+                pos += 1
+                continue
+
+            frame = self._stack[-1] if self._stack else None
+
+            if ch == '"':
+                self._open_string(frame, pos)
+            elif ch in "{[":
+                self._open(ch == "{", frame.path + (frame.key,), pos)
+            elif ch in "}]":
+                self._close(pos)
+            elif ch == ":" and frame is not None:
+                frame.expect_key = False
+            elif ch == "," and frame is not None:
+                if frame.is_object:
+                    frame.expect_key = True
+                else:
+                    frame.key += 1
+
+            pos += 1
+
+        self._pos = pos
+        if self._in_string and self._string_sink:
+            self._emit_string(pos)
+
+    def _open(self, is_object: bool, path: JSONPath, pos: int):
+        self._stack.append(_Frame(is_object, path, pos))
+
+    def _close(self, pos: int):
+        frame = self._stack.pop()
+        if not self._stack:
+            self._finished = True
+        self._value_done(frame.path, frame.start, pos)
+
+    def _open_string(self, frame: _Frame, pos: int):
+        self._in_string = True
+        self._escape = False
+        self._string_start = pos
+        self._string_is_key = frame.is_object and frame.expect_key
+        self._string_path = () if self._string_is_key else frame.path + (frame.key,)
+        self._string_sink = None
+
+        if not self._string_is_key:
+            for pattern, callback in self._string_handlers:
+                if _path_matches(pattern, self._string_path):
+                    self._string_sink = callback
+                    self._string_emitted = pos + 1
+                    break
+
+    def _close_string(self, pos: int):
+        self._in_string = False
+        if self._string_sink:
+            self._emit_string(pos, final=True)
+            self._string_sink = None
+
+        if self._string_is_key:
+            self._stack[-1].key = json.loads(self.text[self._string_start:pos + 1])
+        else:
+            self._value_done(self._string_path, self._string_start, pos)
+
+    def _emit_string(self, end: int, final: bool = False):
+        """
+        Передать декодированную часть строки (без незавершённой escape-последовательности)
+
+        Суррогатная пара (\\ud83d\\ude00) передаётся только целиком: её половинки
+        могут прийти в разных фрагментах, а одиночный суррогат не кодируется
+        в UTF-8. final - строка закрыта, придерживать больше нечего.
+        """
+        raw = self.text[self._string_emitted:end]
+        safe = 0
+        while safe < len(raw):
+            if raw[safe] != "\\":
+                safe += 1
+                continue
+            step = 6 if raw[safe + 1:safe + 2] == "u" else 2
+            if step == 6 and _is_high_surrogate(raw[safe + 2:safe + 6]):
+                following = raw[safe + 6:safe + 12]
+                if len(following) == 6 and following.startswith("\\u"):
+                    step = 12
+                elif not final and "\\u".startswith(following[:2]) and len(following) < 6:
+                    break  # Вторая половина пары ещё не пришла
+            if safe + step > len(raw):
+                break
+            safe += step
+        raw = raw[:safe]
+        if not raw:
+            return
+        self._string_emitted += len(raw)
+        try:
+            self._string_sink(json.loads(f'"{raw}"'))
+        except json.JSONDecodeError:
+            self._string_sink(raw)
+
+    def _value_done(self, path: JSONPath, start: int, end: int):
+        for pattern, callback in self._value_handlers:
+            if _path_matches(pattern, path):
+                try:
+                    value = json.loads(self.text[start:end + 1])
+                except json.JSONDecodeError:
+                    continue
+                callback(value)
+
+    # === Итог ===
+
+    @property
+    def finished(self) -> bool:
+        """Корневое значение закрыто"""
+        return self._finished
+
+    def result(self) -> Optional[Any]:
+        """Разобранный документ (None, если ответ не является JSON)"""
+        if self._finished:
+            try:
+                return json.loads(self.text[self._root_start:self._pos])
+            except json.JSONDecodeError:
+                pass
+        return parse_json_object(self.text)
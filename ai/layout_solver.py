@@ -0,0 +1,514 @@
+"""
+Локальная расстановка мебели (имитация отжига на сетке)
+
+Координаты рассчитываются без обращения к GPT: модель может подсказать
+только список предметов, а их размещение с учётом проходов, окон и
+зон открывания дверей выполняет этот модуль.
+"""
+
+import math
+import multiprocessing
+import queue
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.furniture import FurnitureItem, FURNITURE_LIBRARY, create_furniture_from_library
+from core.room import Room, Wall, Window
+from utils.collision import CollisionDetector, ObstacleKind, furniture_rectangle
+from utils.geometry import GeometryUtils, Rectangle
+
+
+@dataclass
+class LayoutResult:
+    """Результат расстановки"""
+    placements: List[Dict]  # [{"key", "name", "x", "y", "rotation", "width", "depth"}]
+    score: float  # Штраф (0 - все ограничения и пожелания выполнены)
+    violations: int  # Число предметов с нарушенными ограничениями
+    iterations: int = 0
+    elapsed: float = 0.0  # секунды
+    skipped: List[str] = field(default_factory=list)  # Неизвестные названия
+
+    def to_dict(self) -> dict:
+        return {
+            "placements": self.placements,
+            "score": self.score,
+            "violations": self.violations,
+            "iterations": self.iterations,
+            "elapsed": self.elapsed,
+            "skipped": self.skipped
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LayoutResult':
+        return cls(**data)
+
+    def to_furniture_items(self) -> List[FurnitureItem]:
+        """Создать предметы мебели по найденным позициям"""
+        items = []
+        for p in self.placements:
+            item = create_furniture_from_library(p["key"], p["x"], p["y"])
+            item.rotation = p["rotation"]
+            items.append(item)
+        return items
+
+
+def resolve_furniture_keys(names: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Сопоставить названия мебели с ключами FURNITURE_LIBRARY
+
+    Принимает как ключи ("sofa_3seat"), так и названия ("Диван 3-местный").
+
+    Returns:
+        (ключи, нераспознанные названия)
+    """
+    by_name = {data["name"].lower(): key for key, data in FURNITURE_LIBRARY.items()}
+    keys, unknown = [], []
+    for name in names:
+        normalized = name.strip()
+        if normalized in FURNITURE_LIBRARY:
+            keys.append(normalized)
+        elif normalized.lower() in by_name:
+            keys.append(by_name[normalized.lower()])
+        else:
+            unknown.append(name)
+    return keys, unknown
+
+
+def _window_zone(wall: Wall, window: Window, inward_sign: float, depth: float):
+    """Зона перед окном, которую не должна закрывать высокая мебель"""
+    length = wall.length
+    ux = (wall.end.x - wall.start.x) / length
+    uy = (wall.end.y - wall.start.y) / length
+    nx, ny = -uy * inward_sign * depth, ux * inward_sign * depth
+
+    x1 = wall.start.x + ux * window.position
+    y1 = wall.start.y + uy * window.position
+    x2 = wall.start.x + ux * (window.position + window.width)
+    y2 = wall.start.y + uy * (window.position + window.width)
+
+    return [(x1, y1), (x2, y2), (x2 + nx, y2 + ny), (x1 + nx, y1 + ny)]
+
+
+class LayoutSolver:
+    """
+    Расстановка мебели имитацией отжига
+
+    Жёсткие ограничения (большой штраф): предмет внутри комнаты, не
+    пересекает стены, другую мебель и зоны открывания дверей, высокая
+    мебель не закрывает окна. Мягкие: проход CLEARANCE перед лицевой
+    стороной предмета, предметы стоят спиной к стене.
+    """
+
+    CLEARANCE = 600  # мм - минимальный проход
+    ROTATIONS = (0, 90, 180, 270)
+
+    # Веса штрафов
+    W_OVERLAP = 10.0  # за мм перекрытия
+    W_OUTSIDE = 5000.0  # за угол вне комнаты
+    W_WINDOW = 5.0  # за мм перекрытия зоны окна
+    W_CLEARANCE = 1.0  # за мм перекрытия прохода
+    W_WALL = 0.05  # за мм от спинки до стены
+
+    def __init__(
+        self,
+        room: Room,
+        furniture_keys: List[str],
+        clearance: float = CLEARANCE,
+        grid_step: float = 100,
+        time_budget: float = 2.0,
+        seed: Optional[int] = None,
+        max_iterations: Optional[int] = None
+    ):
+        """
+        Args:
+            room: Комната
+            furniture_keys: Ключи FURNITURE_LIBRARY (повторы допустимы)
+            clearance: Ширина прохода перед мебелью (мм)
+            grid_step: Шаг сетки позиций (мм)
+            time_budget: Лимит времени (с)
+            seed: Зерно генератора случайных чисел
+            max_iterations: Лимит шагов отжига вместо лимита времени
+                (с тем же seed результат не зависит от скорости машины)
+        """
+        self.room = room
+        self.keys = list(furniture_keys)
+        self.clearance = clearance
+        self.grid_step = grid_step
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.rng = random.Random(seed)
+
+        self.polygon = [(w.start.x, w.start.y) for w in room.walls]
+        xs = [p[0] for p in self.polygon] or [0]
+        ys = [p[1] for p in self.polygon] or [0]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+        self.items = [create_furniture_from_library(k) for k in self.keys]
+        self.detector = CollisionDetector(rooms=[room])
+        self.window_zones = self._build_window_zones()
+
+        self._zones: Dict[str, List[Tuple[float, float]]] = {}
+
+    # === Подготовка ===
+
+    def _inward_sign(self) -> float:
+        signed = 0.0
+        n = len(self.polygon)
+        for i in range(n):
+            x1, y1 = self.polygon[i]
+            x2, y2 = self.polygon[(i + 1) % n]
+            signed += x1 * y2 - x2 * y1
+        return 1.0 if signed >= 0 else -1.0
+
+    def _build_window_zones(self) -> List[Tuple[float, List[Tuple[float, float]]]]:
+        inward = self._inward_sign()
+        zones = []
+        for wall in self.room.walls:
+            if wall.length == 0:
+                continue
+            for window in wall.windows:
+                zones.append((window.sill_height,
+                              _window_zone(wall, window, inward, self.clearance)))
+        return zones
+
+    # === Геометрия предмета ===
+
+    def _clearance_zone(self, item: FurnitureItem) -> List[Tuple[float, float]]:
+        """Проход перед лицевой стороной (локальная ось +depth)"""
+        zone = Rectangle(item.x, item.y + item.depth, item.width, self.clearance)
+        center = (item.x + item.width / 2, item.y + item.depth / 2)
+        return [GeometryUtils.rotate_point(p, center, item.rotation) for p in zone.corners()]
+
+    def _back_midpoint(self, item: FurnitureItem) -> Tuple[float, float]:
+        center = (item.x + item.width / 2, item.y + item.depth / 2)
+        return GeometryUtils.rotate_point((center[0], item.y), center, item.rotation)
+
+    def _distance_to_walls(self, point: Tuple[float, float]) -> float:
+        px, py = point
+        best = float('inf')
+        n = len(self.polygon)
+        for i in range(n):
+            x1, y1 = self.polygon[i]
+            x2, y2 = self.polygon[(i + 1) % n]
+            dx, dy = x2 - x1, y2 - y1
+            length_sq = dx * dx + dy * dy
+            t = 0 if length_sq == 0 else max(0, min(1, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+            best = min(best, math.hypot(px - (x1 + t * dx), py - (y1 + t * dy)))
+        return best
+
+    # === Энергия ===
+
+    def _local_energy(self, item: FurnitureItem) -> Tuple[float, float, bool]:
+        """
+        Вклад предмета в штраф
+
+        Returns:
+            (собственный штраф, штраф пар с другими предметами, нарушены ли жёсткие ограничения)
+        """
+        corners = furniture_rectangle(item).corners()
+        unary = pair = 0.0
+
+        inside = GeometryUtils.points_in_polygon(corners, self.polygon)
+        outside = int((~inside).sum())
+        unary += self.W_OUTSIDE * outside
+
+        furniture_overlap = False
+        for collision in self.detector.collisions_for(item):
+            if collision.kind == ObstacleKind.FURNITURE:
+                pair += self.W_OVERLAP * collision.depth
+                furniture_overlap = True
+            else:
+                unary += self.W_OVERLAP * collision.depth
+
+        for sill_height, zone in self.window_zones:
+            if item.height > sill_height:
+                depth = GeometryUtils.convex_overlap(corners, zone)
+                if depth > 0:
+                    unary += self.W_WINDOW * depth
+
+        violated = unary > 0 or furniture_overlap
+
+        # Проход перед предметом: стены - собственный штраф, мебель - парный
+        for collision in self.detector.query_polygon(
+                self._zones[item.id],
+                (ObstacleKind.FURNITURE, ObstacleKind.WALL),
+                exclude_id=item.id):
+            if collision.kind == ObstacleKind.FURNITURE:
+                pair += self.W_CLEARANCE * collision.depth
+            else:
+                unary += self.W_CLEARANCE * collision.depth
+
+        # Проходы других предметов, перекрытые этим
+        for other in self.items:
+            if other.id == item.id:
+                continue
+            depth = GeometryUtils.convex_overlap(self._zones[other.id], corners)
+            if depth > self.detector.tolerance:
+                pair += self.W_CLEARANCE * depth
+
+        unary += self.W_WALL * self._distance_to_walls(self._back_midpoint(item))
+
+        return unary, pair, violated
+
+    def _moved_energy(self, items: List[FurnitureItem]) -> float:
+        """Штраф, который меняется при перемещении items (парные слагаемые - один раз)"""
+        energy = 0.0
+        for item in items:
+            unary, pair, _ = self._local_energy(item)
+            energy += unary + pair
+        if len(items) == 2:
+            # Пара между двумя сдвинутыми предметами учтена дважды
+            a, b = items
+            energy -= self._pair_energy(a, b)
+        return energy
+
+    def _pair_energy(self, a: FurnitureItem, b: FurnitureItem) -> float:
+        corners_a = furniture_rectangle(a).corners()
+        corners_b = furniture_rectangle(b).corners()
+        tolerance = self.detector.tolerance
+        energy = 0.0
+
+        depth = GeometryUtils.convex_overlap(corners_a, corners_b)
+        if depth > tolerance:
+            energy += self.W_OVERLAP * depth
+        for zone, corners in ((self._zones[a.id], corners_b), (self._zones[b.id], corners_a)):
+            depth = GeometryUtils.convex_overlap(zone, corners)
+            if depth > tolerance:
+                energy += self.W_CLEARANCE * depth
+        return energy
+
+    def _total_energy(self) -> Tuple[float, int]:
+        total = 0.0
+        violations = 0
+        for item in self.items:
+            unary, pair, violated = self._local_energy(item)
+            total += unary + pair / 2
+            violations += int(violated)
+        return total, violations
+
+    # === Ходы ===
+
+    def _snap(self, value: float) -> float:
+        return GeometryUtils.snap_to_grid(value, self.grid_step)
+
+    def _place(self, item: FurnitureItem, x: float, y: float, rotation: float):
+        item.x, item.y, item.rotation = x, y, rotation
+        self.detector.update_item(item)
+        self._zones[item.id] = self._clearance_zone(item)
+
+    def _random_position(self, item: FurnitureItem) -> Tuple[float, float]:
+        min_x, min_y, max_x, max_y = self.bounds
+        x = self._snap(self.rng.uniform(min_x, max(min_x, max_x - item.width)))
+        y = self._snap(self.rng.uniform(min_y, max(min_y, max_y - item.depth)))
+        return x, y
+
+    def _propose(self, temperature_ratio: float) -> List[Tuple[FurnitureItem, tuple]]:
+        """Случайный ход: список (предмет, новое состояние x, y, rotation)"""
+        item = self.rng.choice(self.items)
+        move = self.rng.random()
+
+        if move < 0.15:
+            x, y = self._random_position(item)
+            return [(item, (x, y, item.rotation))]
+        if move < 0.35:
+            return [(item, (item.x, item.y, self.rng.choice(self.ROTATIONS)))]
+        if move < 0.45 and len(self.items) > 1:
+            other = self.rng.choice(self.items)
+            if other is not item:
+                return [
+                    (item, (other.x, other.y, item.rotation)),
+                    (other, (item.x, item.y, other.rotation))
+                ]
+
+        # Сдвиг: широкий при высокой температуре, на шаг сетки в конце
+        span = max(1, int(20 * temperature_ratio))
+        dx = self.rng.randint(-span, span) * self.grid_step
+        dy = self.rng.randint(-span, span) * self.grid_step
+        return [(item, (item.x + dx, item.y + dy, item.rotation))]
+
+    def _apply(self, changes: List[Tuple[FurnitureItem, tuple]]):
+        for item, state in changes:
+            self._place(item, *state)
+
+    def _snapshot(self) -> List[Dict]:
+        return [
+            {
+                "key": key,
+                "name": item.name,
+                "x": item.x,
+                "y": item.y,
+                "rotation": item.rotation,
+                "width": item.width,
+                "depth": item.depth
+            }
+            for key, item in zip(self.keys, self.items)
+        ]
+
+    # === Решение ===
+
+    def solve(
+        self,
+        progress: Optional[Callable[[float, LayoutResult], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        progress_interval: float = 0.2
+    ) -> LayoutResult:
+        """
+        Запустить отжиг
+
+        Args:
+            progress: Вызывается с (доля бюджета, лучший результат) не чаще progress_interval
+            should_stop: Возвращает True для досрочной остановки
+
+        Returns:
+            Лучшая найденная расстановка
+        """
+        started = time.monotonic()
+
+        if len(self.polygon) < 3 or not self.items:
+            return LayoutResult(self._snapshot(), 0.0, 0, 0, 0.0)
+
+        for item in self.items:
+            x, y = self._random_position(item)
+            self._place(item, x, y, self.rng.choice(self.ROTATIONS))
+
+        energy, violations = self._total_energy()
+        best = LayoutResult(self._snapshot(), energy, violations)
+
+        t_start, t_end = 500.0, 0.5
+        iterations = 0
+        last_report = started
+
+        while True:
+            now = time.monotonic()
+            if self.max_iterations is not None:
+                fraction = iterations / self.max_iterations if self.max_iterations > 0 else 1.0
+            else:
+                fraction = (now - started) / self.time_budget if self.time_budget > 0 else 1.0
+            if fraction >= 1.0 or (should_stop and should_stop()):
+                break
+
+            temperature = t_start * (t_end / t_start) ** fraction
+            changes = self._propose(1.0 - fraction)
+            moved = [item for item, _ in changes]
+            previous = [(item, (item.x, item.y, item.rotation)) for item in moved]
+
+            before = self._moved_energy(moved)
+            self._apply(changes)
+            delta = self._moved_energy(moved) - before
+
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                energy += delta
+                if energy < best.score - 1e-6:
+                    # Пересчёт целиком убирает накопленную погрешность
+                    energy, violations = self._total_energy()
+                    if energy < best.score:
+                        best = LayoutResult(self._snapshot(), energy, violations)
+            else:
+                self._apply(previous)
+
+            iterations += 1
+
+            if progress and now - last_report >= progress_interval:
+                last_report = now
+                progress(min(fraction, 1.0), best)
+
+            if best.score == 0:
+                break
+
+        best.iterations = iterations
+        best.elapsed = time.monotonic() - started
+        if progress:
+            progress(1.0, best)
+        return best
+
+
+def _solve_worker(room_data: dict, keys: List[str], options: dict, messages, stop_event):
+    """Точка входа процесса расстановки"""
+    room = Room.from_dict(room_data)
+    solver = LayoutSolver(room, keys, **options)
+
+    def report(fraction: float, best: LayoutResult):
+        messages.put(("progress", fraction, best.to_dict()))
+
+    result = solver.solve(progress=report, should_stop=stop_event.is_set)
+    messages.put(("done", 1.0, result.to_dict()))
+
+
+class LayoutProcess:
+    """
+    Расстановка в отдельном процессе (не блокирует GUI и не держит GIL)
+
+    Пример:
+        job = LayoutProcess(room, ["sofa_3seat", "coffee_table"], time_budget=3)
+        job.start()
+        ...
+        for fraction, partial in job.poll():
+            ...  # промежуточные лучшие расстановки
+        result = job.result
+    """
+
+    def __init__(self, room: Room, furniture_keys: List[str], **options):
+        context = multiprocessing.get_context("spawn")
+        self._messages = context.Queue()
+        self._stop = context.Event()
+        self._process = context.Process(
+            target=_solve_worker,
+            args=(room.to_dict(), list(furniture_keys), options, self._messages, self._stop),
+            daemon=True
+        )
+        self.result: Optional[LayoutResult] = None
+
+    def start(self):
+        self._process.start()
+
+    def cancel(self):
+        """Остановить досрочно - процесс вернёт лучший найденный результат"""
+        self._stop.set()
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def poll(self) -> List[Tuple[float, LayoutResult]]:
+        """Забрать накопившиеся промежуточные результаты (не блокирует)"""
+        updates = []
+        while True:
+            try:
+                kind, fraction, data = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            result = LayoutResult.from_dict(data)
+            if kind == "done":
+                self.result = result
+                self._process.join()
+            updates.append((fraction, result))
+        return updates
+
+    def wait(
+        self,
+        progress: Optional[Callable[[float, LayoutResult], None]] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[LayoutResult]:
+        """Дождаться результата, передавая промежуточные в progress"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.result is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                kind, fraction, data = self._messages.get(
+                    timeout=0.5 if remaining is None else min(0.5, remaining)
+                )
+            except queue.Empty:
+                if not self._process.is_alive() and self._messages.empty():
+                    break
+                continue
+            result = LayoutResult.from_dict(data)
+            if kind == "done":
+                self.result = result
+                self._process.join()
+            elif progress:
+                progress(fraction, result)
+        return self.result
@@ -0,0 +1,184 @@
+"""
+Метрики запросов к GPT: задержка, токены, повторы, попадания в кэш, стоимость
+
+MetricsRecorder собирает запись на каждый запрос GPTClient, держит скользящее
+окно для строки состояния, накапливает итоги по проектам и при необходимости
+дописывает записи в файл JSON Lines для внешних дашбордов.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Цена за 1M токенов в USD: (входные, выходные). Ключ - префикс имени модели
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Стоимость запроса в USD (0 для неизвестной модели)"""
+    # Самый длинный подходящий префикс: gpt-4o-mini раньше gpt-4o и gpt-4
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            price_in, price_out = MODEL_PRICES[prefix]
+            return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+    return 0.0
+
+
+@dataclass
+class RequestMetrics:
+    """Метрики одного запроса"""
+    model: str
+    kind: str  # message / stream
+    success: bool
+    latency: float  # Полное время запроса (с)
+    first_token_latency: float = 0  # Для потоковой выдачи (с)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    cached: bool = False
+    error_type: str = ""
+    cost: float = 0  # USD
+    project_id: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["total_tokens"] = self.total_tokens
+        return data
+
+
+@dataclass
+class ProjectTotals:
+    """Накопленные итоги по проекту"""
+    requests: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class MetricsRecorder:
+    """
+    Сборщик метрик (потокобезопасный)
+
+    Подписчики add_listener() вызываются из потока, выполнившего запрос,
+    со сводкой summary() - в GUI их следует передавать через сигнал.
+    """
+
+    def __init__(self, window: int = 200, export_path: Optional[Path] = None):
+        """
+        Args:
+            window: Размер скользящего окна для сводки (запросов)
+            export_path: Файл JSON Lines - каждая запись дописывается сразу
+        """
+        self.export_path = Path(export_path) if export_path else None
+        self._recent: deque = deque(maxlen=window)
+        self._projects: Dict[str, ProjectTotals] = {}
+        self._listeners: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        self._listeners.append(callback)
+
+    def record(self, metrics: RequestMetrics):
+        """Добавить запись о запросе"""
+        with self._lock:
+            self._recent.append(metrics)
+
+            totals = self._projects.setdefault(metrics.project_id, ProjectTotals())
+            totals.requests += 1
+            totals.errors += 0 if metrics.success else 1
+            totals.cache_hits += 1 if metrics.cached else 0
+            totals.prompt_tokens += metrics.prompt_tokens
+            totals.completion_tokens += metrics.completion_tokens
+            totals.cost += metrics.cost
+
+            if self.export_path:
+                self._append_line(self.export_path, metrics)
+
+            summary = self._summary()
+
+        for callback in self._listeners:
+            callback(summary)
+
+    def summary(self) -> dict:
+        """Сводка по скользящему окну"""
+        with self._lock:
+            return self._summary()
+
+    def _summary(self) -> dict:
+        recent = list(self._recent)
+        # Задержку считаем по реальным запросам: попадания в кэш её занижают
+        latencies = [m.latency for m in recent if not m.cached and m.success]
+        first_tokens = [m.first_token_latency for m in recent
+                        if m.kind == "stream" and m.first_token_latency and not m.cached]
+        return {
+            "requests": len(recent),
+            "errors": sum(1 for m in recent if not m.success),
+            "cache_hits": sum(1 for m in recent if m.cached),
+            "retries": sum(m.retries for m in recent),
+            "prompt_tokens": sum(m.prompt_tokens for m in recent),
+            "completion_tokens": sum(m.completion_tokens for m in recent),
+            "cost": sum(m.cost for m in recent),
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "first_token_p50": _percentile(first_tokens, 0.5),
+        }
+
+    def latency_percentile(self, q: float, min_samples: int = 1) -> float:
+        """Перцентиль задержки успешных запросов без кэша (0, если их меньше min_samples)"""
+        with self._lock:
+            latencies = [m.latency for m in self._recent if not m.cached and m.success]
+        if len(latencies) < min_samples:
+            return 0.0
+        return _percentile(latencies, q)
+
+    def project_totals(self, project_id: str) -> ProjectTotals:
+        """Итоги по проекту за всё время работы приложения"""
+        with self._lock:
+            totals = self._projects.get(project_id, ProjectTotals())
+            return ProjectTotals(**asdict(totals))
+
+    def export_jsonl(self, path: Path) -> int:
+        """Выгрузить записи скользящего окна в JSON Lines; возвращает число строк"""
+        with self._lock:
+            records = list(self._recent)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for metrics in records:
+                f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
+        return len(records)
+
+    @staticmethod
+    def _append_line(path: Path, metrics: RequestMetrics):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
+        except OSError:
+            # Метрики не должны ломать запросы
+            pass
@@ -0,0 +1,453 @@
+"""
+Локальный генератор дизайна без обращения к GPT
+
+Правила и шаблоны: цветовая схема из палитры стиля с поправкой на тип
+комнаты, набор мебели из FURNITURE_LIBRARY под площадь пола, отделка
+по стилю с количествами от MaterialsCalculator. Результат - тот же
+DesignSuggestion, что и от GPT, за доли секунды: используется, когда
+API не настроен или недоступен, и как черновик, пока GPT отвечает.
+"""
+
+import json
+import zlib
+from typing import Dict, List, Tuple
+
+from .layout_solver import LayoutSolver
+from core.room import Room
+from core.project import Project
+from core.furniture import FURNITURE_LIBRARY
+from core.materials_calc import MaterialsCalculator, MaterialResult
+
+
+def _color(hex_code: str, name: str) -> Dict[str, str]:
+    return {"hex": hex_code, "name": name}
+
+
+# Палитры стилей: основной и спокойный цвет стен, акцентная стена,
+# пол (дерево/покрытие и плитка), потолок, акценты мебели и декора
+PALETTES: Dict[str, Dict] = {
+    "scandinavian": {
+        "walls_main": _color("#F4F1EC", "Тёплый белый"),
+        "walls_calm": _color("#E6E2DA", "Светло-серый лён"),
+        "walls_accent": _color("#9DB0A3", "Шалфей"),
+        "floor": _color("#D8C3A0", "Светлый дуб"),
+        "floor_tile": _color("#D9D6D0", "Светлый бетон"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#3E4A59", "Графитовый синий"), _color("#C9A27E", "Карамель"),
+                    _color("#E3B5A4", "Пыльная роза")]
+    },
+    "minimalist": {
+        "walls_main": _color("#FAFAFA", "Чистый белый"),
+        "walls_calm": _color("#EDEDED", "Светло-серый"),
+        "walls_accent": _color("#BFBFBF", "Серый камень"),
+        "floor": _color("#C8B49A", "Натуральный ясень"),
+        "floor_tile": _color("#E0E0E0", "Светло-серый керамогранит"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#1E1E1E", "Чёрный"), _color("#8C8C8C", "Серый"),
+                    _color("#D4C4A8", "Бежевый")]
+    },
+    "modern": {
+        "walls_main": _color("#EFEDEA", "Светло-серый тёплый"),
+        "walls_calm": _color("#DCD9D4", "Грейж"),
+        "walls_accent": _color("#2F4858", "Глубокий петроль"),
+        "floor": _color("#A88B6A", "Дуб натуральный"),
+        "floor_tile": _color("#B5B2AD", "Серый керамогранит"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#D4A373", "Охра"), _color("#33658A", "Синий"),
+                    _color("#86BBD8", "Небесный")]
+    },
+    "classic": {
+        "walls_main": _color("#EFE6D8", "Слоновая кость"),
+        "walls_calm": _color("#E3D5C0", "Сливочный"),
+        "walls_accent": _color("#7A8B6F", "Оливковый"),
+        "floor": _color("#8B5A2B", "Орех"),
+        "floor_tile": _color("#E8E0D0", "Мрамор бежевый"),
+        "ceiling": _color("#FBF8F2", "Молочный"),
+        "accents": [_color("#B08D57", "Старое золото"), _color("#6D2E46", "Бордо"),
+                    _color("#2C3E50", "Тёмно-синий")]
+    },
+    "loft": {
+        "walls_main": _color("#B7B2AC", "Бетон"),
+        "walls_calm": _color("#D0CCC6", "Светлый бетон"),
+        "walls_accent": _color("#8E4B32", "Кирпич"),
+        "floor": _color("#6F5843", "Дуб тёмный"),
+        "floor_tile": _color("#7D7A76", "Графитовый керамогранит"),
+        "ceiling": _color("#E8E6E3", "Светло-серый"),
+        "accents": [_color("#2B2B2B", "Чёрный металл"), _color("#A0522D", "Кожа коньяк"),
+                    _color("#C9A227", "Латунь")]
+    },
+    "japandi": {
+        "walls_main": _color("#EDE6DA", "Рисовая бумага"),
+        "walls_calm": _color("#E2D8C8", "Песок"),
+        "walls_accent": _color("#8A8F7A", "Мох"),
+        "floor": _color("#C2A57E", "Светлый орех"),
+        "floor_tile": _color("#CFC6B8", "Известняк"),
+        "ceiling": _color("#F7F3EC", "Тёплый белый"),
+        "accents": [_color("#3B3A36", "Уголь"), _color("#A67B5B", "Терракота"),
+                    _color("#D9CBB0", "Лён")]
+    },
+    "mid_century": {
+        "walls_main": _color("#F2EBDD", "Кремовый"),
+        "walls_calm": _color("#E4DCCB", "Овсяный"),
+        "walls_accent": _color("#2E5E4E", "Изумрудно-зелёный"),
+        "floor": _color("#9C6B3F", "Тик"),
+        "floor_tile": _color("#D8CFC0", "Терраццо светлое"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#E1A23B", "Горчичный"), _color("#C8553D", "Жжёный оранжевый"),
+                    _color("#264653", "Петроль")]
+    },
+    "industrial": {
+        "walls_main": _color("#A9A9A4", "Серый цемент"),
+        "walls_calm": _color("#C7C5C0", "Светлый цемент"),
+        "walls_accent": _color("#4A4A48", "Антрацит"),
+        "floor": _color("#5E4B3C", "Морёный дуб"),
+        "floor_tile": _color("#6E6E6A", "Тёмный бетон"),
+        "ceiling": _color("#D6D4D0", "Серый"),
+        "accents": [_color("#1C1C1C", "Чёрная сталь"), _color("#B87333", "Медь"),
+                    _color("#7B3F00", "Ржавчина")]
+    },
+    "provence": {
+        "walls_main": _color("#F5EFE3", "Молочный"),
+        "walls_calm": _color("#E9E2D3", "Светлый лён"),
+        "walls_accent": _color("#B7C4CF", "Голубая лаванда"),
+        "floor": _color("#D2B48C", "Беленый дуб"),
+        "floor_tile": _color("#D9B99B", "Терракотовая плитка"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#9A8FBF", "Лаванда"), _color("#A3B18A", "Оливка"),
+                    _color("#E8C3B9", "Пудровый розовый")]
+    },
+    "contemporary": {
+        "walls_main": _color("#F0EEEB", "Светлый грейж"),
+        "walls_calm": _color("#E0DDD8", "Тёплый серый"),
+        "walls_accent": _color("#5B6770", "Сланец"),
+        "floor": _color("#B39B80", "Дуб беленый"),
+        "floor_tile": _color("#C9C5BF", "Керамогранит под камень"),
+        "ceiling": _color("#FFFFFF", "Белый"),
+        "accents": [_color("#1F2A36", "Полночный синий"), _color("#C08B5C", "Карамель"),
+                    _color("#9CAFAA", "Эвкалипт")]
+    },
+}
+
+DEFAULT_STYLE = "modern"
+DEFAULT_ROOM_TYPE = "living"
+
+# Поправки на тип комнаты: цвет стен, покрытие пола, акцентная стена
+# ("walls_accent", "bright" - последний акцент, None - без неё), число акцентов
+ROOM_RULES: Dict[str, Dict] = {
+    "living": {"walls": "walls_main", "floor": "floor", "accent_wall": "walls_accent", "accents": 3},
+    "bedroom": {"walls": "walls_calm", "floor": "floor", "accent_wall": "walls_accent", "accents": 2},
+    "kitchen": {"walls": "walls_main", "floor": "floor_tile", "accent_wall": None, "accents": 2},
+    "bathroom": {"walls": "walls_calm", "floor": "floor_tile", "accent_wall": None, "accents": 1},
+    "office": {"walls": "walls_main", "floor": "floor", "accent_wall": "walls_accent", "accents": 2},
+    "kids": {"walls": "walls_calm", "floor": "floor", "accent_wall": "bright", "accents": 3},
+    "hallway": {"walls": "walls_main", "floor": "floor_tile", "accent_wall": None, "accents": 1},
+}
+
+# Начала слов в названии комнаты -> тип комнаты
+ROOM_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "living": ("гостин", "зал", "living"),
+    "bedroom": ("спальн", "bedroom"),
+    "kitchen": ("кухн", "столов", "kitchen"),
+    "bathroom": ("ванн", "санузел", "с/у", "туалет", "душ", "bath"),
+    "office": ("кабинет", "офис", "office"),
+    "kids": ("детск", "kids"),
+    "hallway": ("прихож", "коридор", "холл", "hall"),
+}
+
+# Наборы мебели: слоты по приоритету, в слоте - варианты от большого к малому
+FURNITURE_SETS: Dict[str, List[Tuple[str, ...]]] = {
+    "living": [("sofa_3seat", "sofa_2seat", "armchair"), ("coffee_table",), ("tv_stand",),
+               ("armchair",), ("wardrobe",), ("armchair",), ("dining_table",)],
+    "bedroom": [("bed_double", "bed_single"), ("wardrobe",), ("desk",), ("chair",), ("armchair",)],
+    "kitchen": [("fridge",), ("dining_table",), ("chair",), ("chair",), ("chair",), ("chair",)],
+    "bathroom": [("bathtub",), ("sink",), ("toilet",), ("washing_machine",)],
+    "office": [("desk",), ("chair",), ("wardrobe",), ("armchair",), ("sofa_2seat",)],
+    "kids": [("bed_single",), ("desk",), ("chair",), ("wardrobe",), ("armchair",)],
+    "hallway": [("wardrobe",), ("chair",)],
+}
+
+# Доля площади пола под мебелью (остальное - проходы)
+FILL_RATIO = {"bathroom": 0.5, "bedroom": 0.45, "hallway": 0.3}
+DEFAULT_FILL_RATIO = 0.35
+
+# Отделка по стилю: (вид покрытия, описание)
+FINISHES: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "scandinavian": {"floor": ("laminate", "ламинат или инженерная доска «светлый дуб»"),
+                     "walls": ("paint", "матовая моющаяся краска"),
+                     "ceiling": ("paint", "окрашенный гладкий потолок")},
+    "minimalist": {"floor": ("laminate", "кварцвинил без фаски, однотонный"),
+                   "walls": ("paint", "глубокоматовая краска без рисунка"),
+                   "ceiling": ("stretch", "матовый натяжной потолок с теневым профилем")},
+    "modern": {"floor": ("laminate", "ламинат 33 класса под натуральный дуб"),
+               "walls": ("paint", "моющаяся краска, акцентная стена - декоративная штукатурка"),
+               "ceiling": ("stretch", "матовый натяжной потолок")},
+    "classic": {"floor": ("laminate", "паркетная доска «ёлочка»"),
+                "walls": ("wallpaper", "флизелиновые обои с неброским орнаментом"),
+                "ceiling": ("paint", "окрашенный потолок с лепным карнизом")},
+    "loft": {"floor": ("laminate", "массивная доска или кварцвинил под состаренное дерево"),
+             "walls": ("paint", "краска с эффектом бетона, акцентная стена - кирпичная плитка"),
+             "ceiling": ("paint", "открытый окрашенный потолок")},
+    "japandi": {"floor": ("laminate", "инженерная доска светлого ореха"),
+                "walls": ("paint", "минеральная краска тёплых оттенков"),
+                "ceiling": ("paint", "окрашенный потолок, деревянные рейки в зоне отдыха")},
+    "mid_century": {"floor": ("laminate", "паркетная доска тик или орех"),
+                    "walls": ("paint", "матовая краска, акцентная стена - геометрические обои"),
+                    "ceiling": ("paint", "окрашенный гладкий потолок")},
+    "industrial": {"floor": ("laminate", "кварцвинил под бетон или тёмное дерево"),
+                   "walls": ("paint", "микроцемент или краска с эффектом бетона"),
+                   "ceiling": ("paint", "открытый потолок с чёрными коммуникациями")},
+    "provence": {"floor": ("laminate", "беленая доска с фаской"),
+                 "walls": ("wallpaper", "обои в мелкий цветочный рисунок или фактурная краска"),
+                 "ceiling": ("paint", "окрашенный потолок с декоративными балками")},
+    "contemporary": {"floor": ("laminate", "крупноформатный ламинат под беленый дуб"),
+                     "walls": ("paint", "моющаяся краска, акцентная стена - стеновые панели"),
+                     "ceiling": ("stretch", "матовый натяжной потолок со встроенным светом")},
+}
+
+# Влажные помещения: плитка вместо ламината и краски
+WET_ROOMS = ("bathroom",)
+TILE_FLOOR_ROOMS = ("bathroom", "kitchen", "hallway")
+
+
+def _resolve_key(value: str, names: Dict[str, str], default: str) -> str:
+    """Ключ по ключу или отображаемому названию ("loft", "Лофт", "🏭  Лофт")"""
+    if value in names:
+        return value
+    lowered = (value or "").strip().lower()
+    if not lowered:
+        return default
+    for key, name in names.items():
+        # Название в интерфейсе может начинаться со значка
+        if lowered.endswith(name.lower()):
+            return key
+    return default
+
+
+class OfflineDesigner:
+    """
+    Генератор дизайн-предложений по правилам (без сети)
+
+    Результат детерминирован: одна и та же комната и стиль дают один
+    и тот же вариант. Поэтому отжиг расстановки ограничен числом шагов,
+    а не временем.
+    """
+
+    LAYOUT_ITERATIONS = 250  # шагов отжига в текущем потоке (~0.15 с)
+
+    def __init__(self, styles: Dict[str, str], room_types: Dict[str, str]):
+        """
+        Args:
+            styles: Ключ стиля -> название (DesignGenerator.STYLES)
+            room_types: Ключ типа комнаты -> название (DesignGenerator.ROOM_TYPES)
+        """
+        self.styles = styles
+        self.room_types = room_types
+
+    # === Публичный API ===
+
+    def design(self, room: Room, style: str, preferences: str = "",
+               layout: bool = True) -> 'DesignSuggestion':
+        """
+        Дизайн-предложение для комнаты
+
+        Args:
+            layout: Расставить мебель (LAYOUT_ITERATIONS); False - только
+                описание и набор мебели, без позиций (мгновенный черновик)
+        """
+        from .design_generator import DesignSuggestion
+
+        style_key = self.style_key(style)
+        room_type = self.detect_room_type(room)
+        color_scheme = self.color_scheme(style_key, room_type)
+        keys = self.furniture_set(room, room_type)
+        placements = self.furniture_placements(room, keys) if layout else []
+        materials = self.materials(room, style_key, room_type)
+        description = self._description(
+            room, style_key, room_type, color_scheme, keys, materials, preferences
+        )
+
+        return DesignSuggestion(
+            description=description,
+            furniture_placements=placements,
+            color_scheme=color_scheme,
+            materials=materials,
+            raw_response=json.dumps({
+                "furniture_placements": placements,
+                "color_scheme": color_scheme,
+                "materials": materials,
+                "description": description
+            }, ensure_ascii=False)
+        )
+
+    def style_key(self, style: str) -> str:
+        key = _resolve_key(style, self.styles, DEFAULT_STYLE)
+        return key if key in PALETTES else DEFAULT_STYLE
+
+    def room_type_key(self, room_type: str) -> str:
+        key = _resolve_key(room_type, self.room_types, DEFAULT_ROOM_TYPE)
+        return key if key in ROOM_RULES else DEFAULT_ROOM_TYPE
+
+    def detect_room_type(self, room: Room) -> str:
+        """Тип комнаты по названию; если не распознан - по площади"""
+        name = room.name.lower()
+        for room_type, stems in ROOM_KEYWORDS.items():
+            if any(stem in name for stem in stems):
+                return room_type
+
+        key = _resolve_key(room.name, self.room_types, "")
+        if key in ROOM_RULES:
+            return key
+        return "bathroom" if room.floor_area < 5 else DEFAULT_ROOM_TYPE
+
+    def color_scheme(self, style: str, room_type: str) -> Dict:
+        """Цветовая схема в формате PromptBuilder.color_scheme_prompt"""
+        palette = PALETTES[self.style_key(style)]
+        rules = ROOM_RULES[self.room_type_key(room_type)]
+
+        scheme = {
+            "walls_main": dict(palette[rules["walls"]]),
+            "floor": dict(palette[rules["floor"]]),
+            "ceiling": dict(palette["ceiling"]),
+            "accents": [dict(c) for c in palette["accents"][:rules["accents"]]]
+        }
+        if rules["accent_wall"] == "bright":
+            scheme["walls_accent"] = dict(palette["accents"][-1])
+        elif rules["accent_wall"]:
+            scheme["walls_accent"] = dict(palette[rules["accent_wall"]])
+        return scheme
+
+    def furniture_set(self, room: Room, room_type: str) -> List[str]:
+        """Ключи FURNITURE_LIBRARY под площадь и габариты комнаты"""
+        xs = [w.start.x for w in room.walls] or [0]
+        ys = [w.start.y for w in room.walls] or [0]
+        span = sorted((max(xs) - min(xs), max(ys) - min(ys)))
+
+        room_type = self.room_type_key(room_type)
+        budget = room.floor_area * 1e6 * FILL_RATIO.get(room_type, DEFAULT_FILL_RATIO)
+        keys = []
+        for slot in FURNITURE_SETS[room_type]:
+            for key in slot:
+                data = FURNITURE_LIBRARY[key]
+                footprint = data["width"] * data["depth"]
+                size = sorted((data["width"], data["depth"]))
+                if footprint <= budget and size[0] <= span[0] and size[1] <= span[1]:
+                    keys.append(key)
+                    budget -= footprint
+                    break
+        return keys
+
+    def furniture_placements(self, room: Room, keys: List[str]) -> List[Dict]:
+        """Расстановка (формат normalize_placement) быстрым отжигом"""
+        if not keys or len(room.walls) < 3:
+            return []
+
+        solver = LayoutSolver(
+            room, keys, max_iterations=self.LAYOUT_ITERATIONS,
+            seed=zlib.crc32(room.id.encode("utf-8"))
+        )
+        placements = solver.solve().placements
+        for placement in placements:
+            placement["height"] = FURNITURE_LIBRARY[placement["key"]]["height"]
+        return placements
+
+    def materials(self, room: Room, style: str, room_type: str) -> Dict[str, str]:
+        """Отделка по стилю с количествами MaterialsCalculator"""
+        style = self.style_key(style)
+        room_type = self.room_type_key(room_type)
+        finishes = FINISHES[style]
+        calc = MaterialsCalculator(Project(rooms=[room]))
+        results = calc.calculate_all()
+
+        tile_area = MaterialsCalculator.NORMS["tile_area"]
+
+        if room_type in TILE_FLOOR_ROOMS:
+            tiles = room.floor_area / tile_area
+            floor = (f"керамогранит - около {room.floor_area * 1.1:.1f} м² "
+                     f"(~{round(tiles * 1.1)} плиток 30x30 с запасом)")
+        else:
+            floor = self._with_quantity(finishes["floor"][1], results["floor"], "Ламинат")
+
+        if room_type in WET_ROOMS:
+            tiles = room.net_wall_area / tile_area
+            walls = (f"влагостойкая плитка - около {room.net_wall_area * 1.1:.1f} м² "
+                     f"(~{round(tiles * 1.1)} плиток 30x30 с запасом)")
+        else:
+            prefix = "Обои" if finishes["walls"][0] == "wallpaper" else "Краска для стен"
+            walls = self._with_quantity(finishes["walls"][1], results["walls"], prefix)
+
+        if room_type in WET_ROOMS:
+            ceiling = self._with_quantity(
+                "влагостойкий натяжной потолок", results["ceiling"], "Натяжной"
+            )
+        else:
+            prefix = "Натяжной" if finishes["ceiling"][0] == "stretch" else "Краска для потолка"
+            ceiling = self._with_quantity(finishes["ceiling"][1], results["ceiling"], prefix)
+
+        return {"floor": floor, "walls": walls, "ceiling": ceiling}
+
+    def materials_advice(self, room: Room, style: str = DEFAULT_STYLE) -> str:
+        """Рекомендации по материалам текстом (замена ответа GPT)"""
+        materials = self.materials(room, style, self.detect_room_type(room))
+        return "\n".join([
+            f"Рекомендации по отделке: {room.name} (расчёт без AI)",
+            f"• Пол: {materials['floor']}",
+            f"• Стены: {materials['walls']}",
+            f"• Потолок: {materials['ceiling']}",
+        ])
+
+    # === Вспомогательное ===
+
+    @staticmethod
+    def _with_quantity(text: str, results: List[MaterialResult], prefix: str) -> str:
+        for result in results:
+            if result.name.startswith(prefix):
+                return f"{text} - {result.with_reserve:g} {result.unit} с запасом"
+        return text
+
+    def _description(
+        self,
+        room: Room,
+        style: str,
+        room_type: str,
+        color_scheme: Dict,
+        furniture_keys: List[str],
+        materials: Dict[str, str],
+        preferences: str
+    ) -> str:
+        style_name = self.styles.get(style, style)
+        type_name = self.room_types.get(room_type, room_type)
+
+        lines = [
+            f"{room.name}: {type_name.lower()} в стиле «{style_name}», "
+            f"{room.floor_area:.1f} м²",
+            "",
+            "Цвета:",
+            f"• Стены - {color_scheme['walls_main']['name']} ({color_scheme['walls_main']['hex']})",
+        ]
+        if "walls_accent" in color_scheme:
+            accent = color_scheme["walls_accent"]
+            lines.append(f"• Акцентная стена - {accent['name']} ({accent['hex']})")
+        lines.append(f"• Пол - {color_scheme['floor']['name']} ({color_scheme['floor']['hex']})")
+        lines.append(f"• Потолок - {color_scheme['ceiling']['name']}")
+        accents = ", ".join(c["name"].lower() for c in color_scheme["accents"])
+        if accents:
+            lines.append(f"• Акценты в мебели и текстиле: {accents}")
+
+        if furniture_keys:
+            lines += ["", "Мебель:"]
+            for key in furniture_keys:
+                data = FURNITURE_LIBRARY[key]
+                lines.append(f"• {data['name']} ({data['width']}x{data['depth']} мм)")
+
+        lines += [
+            "",
+            "Отделка:",
+            f"• Пол: {materials['floor']}",
+            f"• Стены: {materials['walls']}",
+            f"• Потолок: {materials['ceiling']}",
+        ]
+
+        if preferences:
+            lines += ["", f"Пожелания ({preferences}) в локальном режиме не учитываются."]
+
+        return "\n".join(lines)
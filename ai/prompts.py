@@ -5,6 +5,7 @@
 from typing import Dict, List
 from core.room import Room
 from core.project import Project
+from core.furniture import FURNITURE_LIBRARY
 
 
 class PromptBuilder:
@@ -84,6 +85,44 @@ class PromptBuilder:
 
         return prompt
 
+    @staticmethod
+    def design_json_prompt(room: Room, style: str, preferences: str = "") -> str:
+        """Промпт дизайн-концепции со структурированным ответом (JSON)"""
+        room_desc = PromptBuilder.room_description(room)
+        library = "\n".join(
+            f"- {key}: {data['name']} ({data['width']}x{data['depth']} мм)"
+            for key, data in FURNITURE_LIBRARY.items()
+        )
+
+        return f"""Создай дизайн-проект для следующей комнаты:
+
+{room_desc}
+
+Стиль: {style}
+{f'Дополнительные пожелания: {preferences}' if preferences else ''}
+
+Мебель из каталога (ключ: название):
+{library}
+
+Ответ - один JSON-объект с полями строго в этом порядке:
+{{
+    "furniture_placements": [
+        {{"key": "ключ из каталога или null", "name": "название", "x": 0, "y": 0,
+          "rotation": 0, "width": 0, "depth": 0, "height": 0}}
+    ],
+    "color_scheme": {{
+        "walls_main": {{"hex": "#XXXXXX", "name": "..."}},
+        "floor": {{"hex": "#XXXXXX", "name": "..."}},
+        "ceiling": {{"hex": "#XXXXXX", "name": "..."}},
+        "accents": [{{"hex": "#XXXXXX", "name": "..."}}]
+    }},
+    "materials": {{"floor": "...", "walls": "...", "ceiling": "..."}},
+    "description": "дизайн-концепция по разделам: расстановка, цвета, освещение, декор"
+}}
+
+x, y - угол предмета в мм от левого нижнего угла комнаты, rotation - 0, 90, 180 или 270.
+Размеры (мм) обязательны для предметов не из каталога. Оставляй проходы минимум 600 мм."""
+
     @staticmethod
     def furniture_arrangement_prompt(room: Room, furniture_list: List[str]) -> str:
         """Промпт для оптимальной расстановки мебели"""
@@ -108,6 +147,28 @@ class PromptBuilder:
 Ответ в формате JSON:
 {{"furniture": [{{"name": "...", "x": 0, "y": 0, "rotation": 0}}]}}"""
 
+    @staticmethod
+    def furniture_list_prompt(room: Room, style: str) -> str:
+        """Промпт для подбора состава мебели (без координат)"""
+        room_desc = PromptBuilder.room_description(room)
+        library = "\n".join(
+            f"- {key}: {data['name']} ({data['width']}x{data['depth']} мм)"
+            for key, data in FURNITURE_LIBRARY.items()
+        )
+
+        return f"""Подбери мебель для комнаты в стиле "{style}".
+
+{room_desc}
+
+Доступная мебель (ключ: название):
+{library}
+
+Выбери только предметы из списка, которые поместятся с проходами 600 мм.
+Координаты не нужны - расстановка выполняется отдельно.
+
+Ответ в формате JSON:
+{{"furniture": ["key1", "key2"]}}"""
+
     @staticmethod
     def color_scheme_prompt(style: str, room_type: str) -> str:
         """Промпт для подбора цветовой схемы"""
@@ -146,4 +207,23 @@ class PromptBuilder:
 3. Производителя/бренд
 4. Плюсы и минусы выбора
 
-Поверхности: пол, стены, потолок."""
\ No newline at end of file
+Поверхности: пол, стены, потолок."""
+
+    @staticmethod
+    def conversation_summary_prompt(summary: str, messages: List[Dict[str, str]]) -> str:
+        """Промпт для сжатия ранних реплик чата в сводку"""
+        dialog = "\n\n".join(
+            f"{'Пользователь' if m['role'] == 'user' else 'AI'}: {m['content']}"
+            for m in messages
+        )
+
+        return f"""Обнови краткое содержание разговора с дизайнером интерьера.
+
+Текущее содержание:
+{summary or '(пока пусто)'}
+
+Новые реплики:
+{dialog}
+
+Сохрани принятые решения, пожелания пользователя, размеры, цвета и
+материалы, которые обсуждались. Пиши кратко, списком, не более 150 слов."""
@@ -0,0 +1,155 @@
+"""
+Постоянный кэш ответов GPT на диске
+
+Ключ - хеш содержимого запроса (модель, сообщения, temperature, max_tokens),
+поэтому одинаковые промпты (цветовая схема для того же стиля и типа комнаты,
+материалы для одинаковых комнат) не отправляются в API повторно. Записи
+хранятся в SQLite в ~/.dizainai, устаревают по TTL и вытесняются по размеру
+в порядке последнего обращения (LRU).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Кэш ответов GPT (потокобезопасный)
+
+    Запросы с temperature выше max_temperature не кэшируются: для творческих
+    запросов ожидается каждый раз новый ответ.
+    """
+
+    DEFAULT_PATH = Path.home() / ".dizainai" / "response_cache.sqlite3"
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_temperature: float = 0.7
+    ):
+        """
+        Args:
+            path: Файл кэша (по умолчанию ~/.dizainai/response_cache.sqlite3)
+            ttl: Время жизни записи (с)
+            max_bytes: Предельный суммарный размер ответов (байт)
+            max_temperature: Запросы с большей temperature не кэшируются
+        """
+        self.path = Path(path) if path else self.DEFAULT_PATH
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_temperature = max_temperature
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]],
+                 temperature: float, max_tokens: int,
+                 response_format: Optional[Dict] = None) -> str:
+        """Ключ записи - SHA-256 канонического JSON запроса"""
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if response_format:
+            request["response_format"] = response_format
+        payload = json.dumps(
+            request, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def accepts(self, temperature: float) -> bool:
+        """Можно ли кэшировать запрос с такой temperature"""
+        return temperature <= self.max_temperature
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """Ответ и число токенов, если запись есть и не устарела"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content, tokens, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            content, tokens, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return content, tokens
+
+    def put(self, key: str, content: str, tokens: int = 0):
+        """Сохранить ответ и при необходимости вытеснить старые записи"""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content, tokens, size, now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        """Удалить устаревшие записи, затем самые давние по обращению сверх лимита"""
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        """Удалить все записи"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Число записей и их суммарный размер"""
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
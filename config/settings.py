@@ -13,6 +13,14 @@ class Settings:
     DEFAULT_SETTINGS = {
         "openai_api_key": "",
         "gpt_model": "gpt-4o",
+        "gpt_timeout": 60,  # с
+        "gpt_max_concurrent_requests": 4,
+        "gpt_max_retries": 3,
+        "gpt_hedge_percentile": 0,  # Например 0.95 - дублировать запросы медленнее p95; 0 - выкл.
+        "response_cache_enabled": True,
+        "response_cache_ttl_days": 7,
+        "response_cache_max_mb": 50,
+        "ai_metrics_log": True,  # Дописывать метрики запросов в ~/.dizainai/ai_metrics.jsonl
         "language": "ru",
         "default_wall_height": 2700,  # мм
         "default_wall_thickness": 100,  # мм
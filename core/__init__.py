@@ -1,5 +1,9 @@
 """Основные модели данных"""
 from .room import Room, Wall, Door, Window
 from .furniture import Furniture, FurnitureItem
+from .level import Building, Level
 from .project import Project
 from .materials_calc import MaterialsCalculator
+from .history import History, Command
+from .diff import ProjectPatch, MergeResult, diff_projects, apply_patch, merge_projects
+from .topology import PlanTopology
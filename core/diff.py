@@ -0,0 +1,607 @@
+"""
+Сравнение и слияние проектов
+
+Проект раскладывается в плоский словарь (вид, id) -> запись, где запись -
+кортеж полей объекта в порядке FIELDS, а дочерние объекты (здания проекта,
+этажи здания, комнаты и мебель этажа, стены комнаты, проёмы стены)
+представлены кортежами их id. Выгруженные этажи перед сравнением
+загружаются из файла. Разница
+двух проектов и трёхстороннее слияние считаются по этим словарям за O(n),
+без вложенных переборов.
+
+Патч - компактный список операций, пригодный и для синхронизации:
+    ["+", вид, id, {поле: значение}]  - добавлен объект
+    ["-", вид, id]                     - удалён объект
+    ["~", вид, id, {поле: значение}]  - изменены поля
+Изменение списка дочерних id записывается как {"$del": [...], "$ins":
+[[предшественник, id], ...]}, если не менялся порядок, иначе - списком.
+"""
+
+import gc
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ids import to_uuid, from_uuid
+from .room import Room, Wall, Window, Door, Point2D, WallType
+from .furniture import Furniture, FurnitureItem, FurnitureCategory
+from .level import Building, Level
+from .project import Project
+
+# Ключ объекта: (вид, id). Id проекта, зданий, этажей и комнат - строки,
+# остальных объектов - ObjectId
+EntityKey = Tuple[str, Any]
+FlatProject = Dict[EntityKey, tuple]
+
+PROJECT_KEY: EntityKey = ("project", "")
+
+# Поля записей по видам объектов (id в запись не входит)
+FIELDS = {
+    "project": ("name", "author", "description", "buildings"),
+    "building": ("name", "levels"),
+    "level": ("name", "elevation", "rooms", "furniture"),
+    "room": ("name", "ceiling_height", "holes", "walls"),
+    "wall": ("start", "end", "height", "thickness", "wall_type", "windows", "doors"),
+    "window": ("position", "width", "height", "sill_height"),
+    "door": ("position", "width", "height", "opens_inside", "opens_left"),
+    "furniture": ("name", "category", "width", "depth", "height", "x", "y", "z",
+                  "rotation", "color"),
+}
+
+# Поля со списками дочерних объектов: (вид, поле) -> вид дочерних объектов
+CHILD_KINDS = {
+    ("project", "buildings"): "building",
+    ("building", "levels"): "level",
+    ("level", "rooms"): "room",
+    ("level", "furniture"): "furniture",
+    ("room", "walls"): "wall",
+    ("wall", "windows"): "window",
+    ("wall", "doors"): "door",
+}
+
+# Поля-перечисления (в патче хранятся значением)
+ENUM_FIELDS = {"wall_type": WallType, "category": FurnitureCategory}
+
+PATCH_FORMAT = 1
+
+_MISSING = object()
+
+_window_fields = attrgetter(*FIELDS["window"])
+_door_fields = attrgetter(*FIELDS["door"])
+_furniture_fields = attrgetter(*FIELDS["furniture"])
+
+# Виды со строковыми id (в патче как есть, без to_uuid)
+STRING_ID_KINDS = ("project", "building", "level", "room")
+
+
+def flatten(project: Project) -> FlatProject:
+    """Плоский вид проекта (все этажи должны быть загружены)"""
+    flat: FlatProject = {}
+    building_ids = []
+    for building in project.buildings:
+        level_ids = []
+        for level in building.levels:
+            if not level.loaded:
+                raise ValueError(f"Этаж «{level.name}» не загружен")
+            rooms = project.level_rooms(level)
+            furniture = project.furniture if level.id == project.active_level_id else level.furniture
+            flat[("level", level.id)] = (
+                level.name, level.elevation,
+                _flatten_rooms(rooms, flat), _flatten_furniture(furniture, flat)
+            )
+            level_ids.append(level.id)
+        flat[("building", building.id)] = (building.name, tuple(level_ids))
+        building_ids.append(building.id)
+
+    flat[PROJECT_KEY] = (project.name, project.author, project.description, tuple(building_ids))
+    return flat
+
+
+def _flatten_rooms(rooms, flat: FlatProject) -> tuple:
+    room_ids = []
+    for room in rooms:
+        wall_ids = []
+        for wall in room.walls:
+            for window in wall.windows:
+                flat[("window", window.id)] = _window_fields(window)
+            for door in wall.doors:
+                flat[("door", door.id)] = _door_fields(door)
+            start, end = wall.start, wall.end
+            flat[("wall", wall.id)] = (
+                (start.x, start.y), (end.x, end.y), wall.height, wall.thickness,
+                wall.wall_type,
+                tuple(w.id for w in wall.windows), tuple(d.id for d in wall.doors)
+            )
+            wall_ids.append(wall.id)
+        holes = tuple(tuple((p.x, p.y) for p in hole) for hole in room.holes)
+        flat[("room", room.id)] = (room.name, room.ceiling_height, holes, tuple(wall_ids))
+        room_ids.append(room.id)
+    return tuple(room_ids)
+
+
+def _flatten_furniture(furniture: Furniture, flat: FlatProject) -> tuple:
+    item_ids = []
+    for item in furniture:
+        flat[("furniture", item.id)] = _furniture_fields(item)
+        item_ids.append(item.id)
+    return tuple(item_ids)
+
+
+@contextmanager
+def _gc_paused():
+    """Без сборки мусора на время массового создания объектов (в 2-3 раза быстрее)"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _present(flat: FlatProject, kind: str, ids: tuple) -> list:
+    # Потерявшие запись дочерние id пропускаются
+    return [i for i in ids if (kind, i) in flat]
+
+
+def unflatten(flat: FlatProject, template: Project) -> Project:
+    """
+    Проект из плоского вида (id, даты, память чата и путь берутся из template)
+
+    Активным остаётся этаж template, если он сохранился, иначе - первый.
+    """
+    with _gc_paused():
+        return _unflatten(flat, template)
+
+
+def _unflatten(flat: FlatProject, template: Project) -> Project:
+    name, author, description, building_ids = flat[PROJECT_KEY]
+    buildings = []
+    for building_id in _present(flat, "building", building_ids):
+        building_name, level_ids = flat[("building", building_id)]
+        levels = []
+        for level_id in _present(flat, "level", level_ids):
+            level_name, elevation, room_ids, item_ids = flat[("level", level_id)]
+            levels.append(Level(
+                id=level_id,
+                name=level_name,
+                elevation=elevation,
+                rooms=_build_rooms(flat, room_ids),
+                furniture=Furniture(FurnitureItem(i, *flat[("furniture", i)])
+                                    for i in _present(flat, "furniture", item_ids)),
+                modified=True
+            ))
+        if levels:
+            buildings.append(Building(id=building_id, name=building_name, levels=levels))
+
+    active = next((level for b in buildings for level in b.levels
+                   if level.id == template.active_level_id), None)
+    if active is None:
+        active = buildings[0].levels[0] if buildings else Level()
+        if not buildings:
+            buildings.append(Building(levels=[active]))
+
+    return Project(
+        id=template.id,
+        name=name,
+        created_at=template.created_at,
+        modified_at=template.modified_at,
+        rooms=active.rooms,
+        furniture=active.furniture,
+        buildings=buildings,
+        active_level_id=active.id,
+        author=author,
+        description=description,
+        ai_conversation=template.ai_conversation,
+        file_path=template.file_path
+    )
+
+
+def _build_rooms(flat: FlatProject, room_ids: tuple) -> List[Room]:
+    rooms = []
+    for room_id in _present(flat, "room", room_ids):
+        room_name, ceiling_height, holes, wall_ids = flat[("room", room_id)]
+        walls = []
+        for wall_id in _present(flat, "wall", wall_ids):
+            start, end, height, thickness, wall_type, window_ids, door_ids = flat[("wall", wall_id)]
+            walls.append(Wall(
+                id=wall_id,
+                start=Point2D(*start),
+                end=Point2D(*end),
+                height=height,
+                thickness=thickness,
+                wall_type=wall_type,
+                windows=[Window(i, *flat[("window", i)]) for i in _present(flat, "window", window_ids)],
+                doors=[Door(i, *flat[("door", i)]) for i in _present(flat, "door", door_ids)]
+            ))
+        room = Room(id=room_id, name=room_name, walls=walls, ceiling_height=ceiling_height,
+                    holes=[[Point2D(x, y) for x, y in hole] for hole in holes])
+        room.weld_vertices()
+        rooms.append(room)
+    return rooms
+
+
+# === Списки дочерних id ===
+
+def _insert_chains(ids: list, following: Dict[Any, list], pending: list) -> list:
+    """Вставить цепочки following[предшественник] после предшественников"""
+    result = []
+    emitted = set()
+    stack = list(reversed(following.get(None, [])))
+    for anchor in [None] + ids:
+        if anchor is not None:
+            result.append(anchor)
+            stack = list(reversed(following.get(anchor, [])))
+        while stack:
+            x = stack.pop()
+            result.append(x)
+            emitted.add(x)
+            stack.extend(reversed(following.get(x, [])))
+    # Предшественник пропал - в конец
+    result.extend(x for x in pending if x not in emitted)
+    return result
+
+
+def _ids_delta(old: tuple, new: tuple):
+    """Изменение списка id: дельта или новый список, если менялся порядок"""
+    old_set = set(old)
+    new_set = set(new)
+    removed = tuple(x for x in old if x not in new_set)
+    inserted = []
+    previous = None
+    for x in new:
+        if x not in old_set:
+            inserted.append((previous, x))
+        previous = x
+    delta = {"$del": removed, "$ins": tuple(inserted)}
+    if len(removed) + len(inserted) >= len(new) or _apply_ids_delta(old, delta) != new:
+        return new
+    return delta
+
+
+def _apply_ids_delta(ids: tuple, delta: dict) -> tuple:
+    removed = set(delta["$del"])
+    kept = [x for x in ids if x not in removed]
+    if not delta["$ins"]:
+        return tuple(kept)
+    following: Dict[Any, list] = {}
+    for anchor, x in delta["$ins"]:
+        following.setdefault(anchor, []).append(x)
+    return tuple(_insert_chains(kept, following, [x for _, x in delta["$ins"]]))
+
+
+def _merge_ids(base: tuple, ours: tuple, theirs: tuple) -> tuple:
+    """
+    Слияние списков id: удалённое любой стороной убирается, добавленное
+    ими встаёт после своего предшественника в их списке
+    """
+    base_set = set(base)
+    ours_set = set(ours)
+    theirs_set = set(theirs)
+    kept = [x for x in ours if x in theirs_set or x not in base_set]
+
+    following: Dict[Any, list] = {}
+    added = []
+    previous = None
+    for x in theirs:
+        if x not in base_set and x not in ours_set:
+            following.setdefault(previous, []).append(x)
+            added.append(x)
+        previous = x
+    if not added:
+        return tuple(kept)
+    return tuple(_insert_chains(kept, following, added))
+
+
+# === Патч ===
+
+def _export_id(kind: str, value: Any) -> Any:
+    return value if kind in STRING_ID_KINDS else to_uuid(value)
+
+
+def _import_id(kind: str, value: Any) -> Any:
+    return value if kind in STRING_ID_KINDS else from_uuid(value)
+
+
+def _export_value(kind: str, name: str, value: Any) -> Any:
+    child_kind = CHILD_KINDS.get((kind, name))
+    if child_kind:
+        if isinstance(value, dict):
+            return {
+                "$del": [_export_id(child_kind, x) for x in value["$del"]],
+                "$ins": [[None if a is None else _export_id(child_kind, a), _export_id(child_kind, x)]
+                         for a, x in value["$ins"]]
+            }
+        return [_export_id(child_kind, x) for x in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _import_value(kind: str, name: str, value: Any) -> Any:
+    child_kind = CHILD_KINDS.get((kind, name))
+    if child_kind:
+        if isinstance(value, dict):
+            return {
+                "$del": tuple(_import_id(child_kind, x) for x in value["$del"]),
+                "$ins": tuple((None if a is None else _import_id(child_kind, a), _import_id(child_kind, x))
+                              for a, x in value["$ins"])
+            }
+        return tuple(_import_id(child_kind, x) for x in value)
+    if name in ENUM_FIELDS:
+        return ENUM_FIELDS[name](value)
+    if name == "holes":
+        return tuple(tuple(tuple(p) for p in hole) for hole in value)
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+@dataclass
+class ProjectPatch:
+    """Патч проекта (список операций, см. описание модуля)"""
+    ops: List[list] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def is_empty(self) -> bool:
+        return not self.ops
+
+    def to_dict(self) -> dict:
+        ops = []
+        for op in self.ops:
+            action, kind, entity_id = op[0], op[1], op[2]
+            exported = [action, kind, _export_id(kind, entity_id)]
+            if action != "-":
+                exported.append({name: _export_value(kind, name, value) for name, value in op[3].items()})
+            ops.append(exported)
+        return {"format": PATCH_FORMAT, "ops": ops}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ProjectPatch':
+        if data.get("format") != PATCH_FORMAT:
+            raise ValueError(f"Неизвестный формат патча: {data.get('format')}")
+        ops = []
+        for op in data["ops"]:
+            action, kind = op[0], op[1]
+            if kind not in FIELDS:
+                raise ValueError(f"Неизвестный вид объекта в патче: {kind}")
+            imported = [action, kind, _import_id(kind, op[2])]
+            if action != "-":
+                imported.append({name: _import_value(kind, name, value) for name, value in op[3].items()})
+            ops.append(imported)
+        return cls(ops=ops)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str) -> 'ProjectPatch':
+        return cls.from_dict(json.loads(text))
+
+
+def diff_flat(old: FlatProject, new: FlatProject) -> ProjectPatch:
+    """Разница плоских проектов"""
+    ops = []
+    for key, record in new.items():
+        before = old.get(key)
+        if before is None:
+            ops.append(["+", key[0], key[1], dict(zip(FIELDS[key[0]], record))])
+        elif before != record:
+            changes = {}
+            for name, old_value, value in zip(FIELDS[key[0]], before, record):
+                if old_value != value:
+                    if (key[0], name) in CHILD_KINDS:
+                        value = _ids_delta(old_value, value)
+                    changes[name] = value
+            ops.append(["~", key[0], key[1], changes])
+    for key in old:
+        if key not in new:
+            ops.append(["-", key[0], key[1]])
+    return ProjectPatch(ops)
+
+
+def diff_projects(old: Project, new: Project) -> ProjectPatch:
+    """Патч, превращающий old в new"""
+    old.load_all_levels()
+    new.load_all_levels()
+    return diff_flat(flatten(old), flatten(new))
+
+
+def apply_flat(flat: FlatProject, patch: ProjectPatch) -> FlatProject:
+    """Применить патч к плоскому проекту (возвращает новый словарь)"""
+    result = dict(flat)
+    for op in patch.ops:
+        action, kind, key = op[0], op[1], (op[1], op[2])
+        if action == "+":
+            result[key] = tuple(op[3][name] for name in FIELDS[kind])
+        elif action == "-":
+            result.pop(key, None)
+        elif action == "~":
+            record = result.get(key)
+            if record is None:
+                raise ValueError(f"Патч не подходит к проекту: нет объекта {kind} {op[2]}")
+            values = list(record)
+            for index, name in enumerate(FIELDS[kind]):
+                value = op[3].get(name, _MISSING)
+                if value is _MISSING:
+                    continue
+                if isinstance(value, dict):
+                    value = _apply_ids_delta(values[index], value)
+                values[index] = value
+            result[key] = tuple(values)
+        else:
+            raise ValueError(f"Неизвестная операция патча: {action}")
+    return result
+
+
+def apply_patch(project: Project, patch: ProjectPatch) -> Project:
+    """Новый проект - project с применённым патчем"""
+    project.load_all_levels()
+    return unflatten(apply_flat(flatten(project), patch), project)
+
+
+# === Трёхстороннее слияние ===
+
+@dataclass
+class MergeConflict:
+    """Конфликт слияния: обе стороны по-разному изменили одно и то же"""
+    kind: str
+    entity_id: Any
+    field: Optional[str]  # None - одна сторона удалила объект, другая изменила
+    base: Any
+    ours: Any
+    theirs: Any
+
+    def describe(self) -> str:
+        target = f"{self.kind} {_export_id(self.kind, self.entity_id)}".strip()
+        if self.field is None:
+            side = "нами" if self.ours is None else "ими"
+            return f"{target}: удалён {side}, но изменён другой стороной"
+        return f"{target}, поле «{self.field}»: {self.ours!r} / {self.theirs!r}"
+
+
+@dataclass
+class MergeResult:
+    """Итог трёхстороннего слияния"""
+    project: Project
+    conflicts: List[MergeConflict] = field(default_factory=list)
+
+    @property
+    def has_conflicts(self) -> bool:
+        return bool(self.conflicts)
+
+
+def _merge_records(key: EntityKey, base: Optional[tuple], ours: tuple, theirs: tuple,
+                   prefer: str, conflicts: List[MergeConflict]) -> tuple:
+    kind = key[0]
+    merged = []
+    for index, name in enumerate(FIELDS[kind]):
+        b = base[index] if base is not None else _MISSING
+        o = ours[index]
+        t = theirs[index]
+        if t == b or o == t:
+            value = o
+        elif o == b:
+            value = t
+        elif (kind, name) in CHILD_KINDS:
+            value = _merge_ids(b if b is not _MISSING else (), o, t)
+        else:
+            conflicts.append(MergeConflict(kind, key[1], name, None if b is _MISSING else b, o, t))
+            value = o if prefer == "ours" else t
+        merged.append(value)
+    return tuple(merged)
+
+
+def merge_flat(base: FlatProject, ours: FlatProject, theirs: FlatProject,
+               prefer: str = "ours") -> Tuple[FlatProject, List[MergeConflict]]:
+    """Трёхстороннее слияние плоских проектов"""
+    merged: FlatProject = {}
+    conflicts: List[MergeConflict] = []
+    kept: List[Tuple[EntityKey, FlatProject]] = []
+
+    for key in {**base, **ours, **theirs}:
+        b = base.get(key)
+        o = ours.get(key)
+        t = theirs.get(key)
+        if t == b or o == t:
+            value = o
+        elif o == b:
+            value = t
+        elif o is None or t is None:
+            # Удаление против изменения
+            conflicts.append(MergeConflict(key[0], key[1], None, b, o, t))
+            value = o if prefer == "ours" else t
+            if value is not None:
+                kept.append((key, ours if value is o else theirs))
+        else:
+            value = _merge_records(key, b, o, t, prefer, conflicts)
+        if value is not None:
+            merged[key] = value
+
+    # Сохранённый при конфликте объект возвращается вместе с дочерними
+    # объектами и ссылкой из родителя: удалившая сторона убрала и то, и другое
+    parents: Dict[int, Dict[EntityKey, Tuple[EntityKey, int]]] = {}
+    for key, side in kept:
+        _restore_subtree(key, side, merged)
+        side_parents = parents.get(id(side))
+        if side_parents is None:
+            side_parents = parents[id(side)] = _parent_index(side)
+        _link_to_parent(key, side, side_parents, merged)
+
+    return merged, conflicts
+
+
+def _parent_index(flat: FlatProject) -> Dict[EntityKey, Tuple[EntityKey, int]]:
+    """Родитель каждого объекта: ключ -> (ключ родителя, номер поля-списка)"""
+    parents = {}
+    for key, record in flat.items():
+        for index, name in enumerate(FIELDS[key[0]]):
+            child_kind = CHILD_KINDS.get((key[0], name))
+            if child_kind:
+                for child_id in record[index]:
+                    parents[(child_kind, child_id)] = (key, index)
+    return parents
+
+
+def _restore_subtree(key: EntityKey, side: FlatProject, merged: FlatProject):
+    """Вернуть в merged объект и его потомков в том виде, как они есть в side"""
+    stack = [key]
+    while stack:
+        key = stack.pop()
+        record = merged.setdefault(key, side[key])
+        for index, name in enumerate(FIELDS[key[0]]):
+            child_kind = CHILD_KINDS.get((key[0], name))
+            if child_kind:
+                for child_id in record[index]:
+                    child = (child_kind, child_id)
+                    if child not in merged and child in side:
+                        stack.append(child)
+
+
+def _link_to_parent(key: EntityKey, side: FlatProject,
+                    parents: Dict[EntityKey, Tuple[EntityKey, int]], merged: FlatProject):
+    """Вписать id объекта в список родителя (удалённый родитель возвращается целиком)"""
+    while key in parents:
+        parent, index = parents[key]
+        linked = parent in merged
+        if not linked:
+            _restore_subtree(parent, side, merged)
+        record = merged[parent]
+        ids = record[index]
+        if key[1] not in ids:
+            # Встаёт после ближайшего предшественника из списка side
+            side_ids = side[parent][index]
+            position = 0
+            for previous in reversed(side_ids[:side_ids.index(key[1])]):
+                if previous in ids:
+                    position = ids.index(previous) + 1
+                    break
+            ids = ids[:position] + (key[1],) + ids[position:]
+            merged[parent] = record[:index] + (ids,) + record[index + 1:]
+        if linked:
+            break
+        key = parent
+
+
+def merge_projects(base: Project, ours: Project, theirs: Project,
+                   prefer: str = "ours") -> MergeResult:
+    """
+    Трёхстороннее слияние: изменения ours и theirs относительно общей версии base
+
+    Id объектов совпадают у копий одного файла: from_uuid сопоставляет
+    одинаковые UUID одному номеру.
+
+    Args:
+        prefer: Чьё значение брать при конфликте ("ours" / "theirs")
+    """
+    for project in (base, ours, theirs):
+        project.load_all_levels()
+    merged, conflicts = merge_flat(flatten(base), flatten(ours), flatten(theirs), prefer)
+    return MergeResult(unflatten(merged, ours), conflicts)
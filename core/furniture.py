@@ -3,9 +3,10 @@
 """
 
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, Optional, Dict, Tuple
 from enum import Enum
-import uuid
+
+from .ids import ObjectId, new_id, to_uuid, from_uuid
 
 
 class FurnitureCategory(Enum):
@@ -21,10 +22,10 @@ class FurnitureCategory(Enum):
     KITCHEN = "kitchen"  # Кухонная мебель
 
 
-@dataclass
+@dataclass(slots=True)
 class FurnitureItem:
     """Предмет мебели"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: ObjectId = field(default_factory=new_id)
     name: str = "Предмет"
     category: FurnitureCategory = FurnitureCategory.DECOR
 
@@ -46,7 +47,7 @@ class FurnitureItem:
 
     def to_dict(self) -> dict:
         return {
-            "id": self.id,
+            "id": to_uuid(self.id),
             "name": self.name,
             "category": self.category.value,
             "width": self.width,
@@ -62,30 +63,60 @@ class FurnitureItem:
     @classmethod
     def from_dict(cls, data: dict) -> 'FurnitureItem':
         data_copy = data.copy()
+        data_copy["id"] = from_uuid(data["id"])
         data_copy["category"] = FurnitureCategory(data["category"])
         data_copy["color"] = tuple(data["color"])
         return cls(**data_copy)
 
 
-@dataclass
 class Furniture:
-    """Коллекция мебели в комнате"""
-    items: List[FurnitureItem] = field(default_factory=list)
+    """
+    Коллекция мебели в комнате
+
+    Предметы хранятся в словаре id -> предмет (порядок добавления
+    сохраняется): поиск, добавление и удаление - O(1).
+    """
+
+    def __init__(self, items: Iterable[FurnitureItem] = ()):
+        self._items: Dict[ObjectId, FurnitureItem] = {item.id: item for item in items}
+
+    @property
+    def items(self) -> Tuple[FurnitureItem, ...]:
+        """Предметы по порядку добавления (изменять через add/remove)"""
+        return tuple(self._items.values())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[FurnitureItem]:
+        return iter(self._items.values())
+
+    def __contains__(self, item_id: ObjectId) -> bool:
+        return item_id in self._items
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Furniture):
+            return NotImplemented
+        return list(self._items.values()) == list(other._items.values())
+
+    def __repr__(self) -> str:
+        return f"Furniture(items={list(self._items.values())!r})"
 
     def add(self, item: FurnitureItem):
-        self.items.append(item)
+        self._items[item.id] = item
+
+    def remove(self, item_id: ObjectId):
+        self._items.pop(item_id, None)
 
-    def remove(self, item_id: str):
-        self.items = [i for i in self.items if i.id != item_id]
+    def copy(self) -> 'Furniture':
+        """Копия коллекции (предметы общие: они заменяются, а не изменяются)"""
+        return Furniture(self._items.values())
 
-    def get_by_id(self, item_id: str) -> Optional[FurnitureItem]:
-        for item in self.items:
-            if item.id == item_id:
-                return item
-        return None
+    def get_by_id(self, item_id: ObjectId) -> Optional[FurnitureItem]:
+        return self._items.get(item_id)
 
     def to_dict(self) -> dict:
-        return {"items": [i.to_dict() for i in self.items]}
+        return {"items": [i.to_dict() for i in self._items.values()]}
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Furniture':
@@ -0,0 +1,552 @@
+"""
+История изменений проекта: отмена и повтор
+
+Каждое изменение - команда с дельтой (сдвиг комнаты, старые и новые
+координаты затронутых стен, добавленный или удалённый объект), а не
+снимок проекта, поэтому отмена и повтор стоят O(размер изменения).
+Удалённые объекты не копируются: команда хранит ссылку на тот же объект.
+
+Непрерывное действие (перетаскивание, изменение размера) оформляется
+транзакцией begin()/end() и попадает в историю одной командой. Объём
+истории ограничен бюджетом памяти - старые команды отбрасываются.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .project import Project
+from .room import Room, Wall, Door, Point2D
+from .furniture import FurnitureItem
+from .ids import ObjectId
+
+# Координаты стены: (start.x, start.y, end.x, end.y)
+WallCoords = Tuple[float, float, float, float]
+
+# Оценка памяти (байт) для бюджета истории
+COMMAND_OVERHEAD = 200
+WALL_CHANGE_SIZE = 150
+OBJECT_SIZE = 500  # Ссылка на удалённую/добавленную стену, проём или мебель
+
+
+def wall_coords(wall: Wall) -> WallCoords:
+    return (wall.start.x, wall.start.y, wall.end.x, wall.end.y)
+
+
+def _set_wall_coords(wall: Wall, coords: WallCoords):
+    wall.start.x, wall.start.y, wall.end.x, wall.end.y = coords
+
+
+def _room(project: Project, room_id: str) -> Room:
+    """Комната для изменения (copy-on-write, см. Project.snapshot)"""
+    room = project.edit_room(room_id)
+    if room is None:
+        raise KeyError(f"Комната {room_id} не найдена")
+    return room
+
+
+class Command:
+    """Изменение проекта, которое можно отменить"""
+
+    __slots__ = ()
+
+    label = "Изменение"
+
+    def apply(self, project: Project):
+        raise NotImplementedError
+
+    def revert(self, project: Project):
+        raise NotImplementedError
+
+    def merge(self, other: 'Command') -> bool:
+        """Поглотить следующую команду того же действия (True - поглощена)"""
+        return False
+
+    def size(self) -> int:
+        """Оценка занимаемой памяти (байт)"""
+        return COMMAND_OVERHEAD
+
+    def room_ids(self) -> Set[str]:
+        """Комнаты, которые команда меняет (для точечного обновления виджетов)"""
+        return set()
+
+
+@dataclass(slots=True)
+class MoveRoomCommand(Command):
+    """Сдвиг комнаты целиком"""
+    room_id: str
+    dx: float
+    dy: float
+
+    label = "Перемещение комнаты"
+
+    @staticmethod
+    def _translate(room: Room, dx: float, dy: float):
+        # Соседние стены могут делить один Point2D - сдвигаем каждую точку один раз
+        for point in room.points():
+            point.x += dx
+            point.y += dy
+        room.touch()
+
+    def apply(self, project: Project):
+        self._translate(_room(project, self.room_id), self.dx, self.dy)
+
+    def revert(self, project: Project):
+        self._translate(_room(project, self.room_id), -self.dx, -self.dy)
+
+    def merge(self, other: Command) -> bool:
+        if isinstance(other, MoveRoomCommand) and other.room_id == self.room_id:
+            self.dx += other.dx
+            self.dy += other.dy
+            return True
+        return False
+
+    def room_ids(self) -> Set[str]:
+        return {self.room_id}
+
+
+@dataclass(slots=True)
+class ReshapeRoomCommand(Command):
+    """
+    Изменение координат стен (только изменённые стены)
+
+    Одна команда может менять несколько комнат: общая стена соседей
+    сдвигается вместе с комнатой и отменяется тем же шагом.
+    """
+    # (id комнаты, индекс стены) -> (старые, новые координаты)
+    changes: dict = field(default_factory=dict)
+
+    label = "Изменение формы комнаты"
+
+    @classmethod
+    def diff(cls, rooms: List[Room],
+             before: Dict[str, List[WallCoords]]) -> Optional['ReshapeRoomCommand']:
+        """Команда по координатам стен до изменения (None - ничего не изменилось)"""
+        changes = {}
+        for room in rooms:
+            for index, (wall, old) in enumerate(zip(room.walls, before.get(room.id, ()))):
+                new = wall_coords(wall)
+                if new != old:
+                    changes[(room.id, index)] = (old, new)
+        return cls(changes) if changes else None
+
+    def _set(self, project: Project, which: int):
+        rooms = {}
+        for (room_id, index), coords in self.changes.items():
+            if room_id not in rooms:
+                rooms[room_id] = _room(project, room_id)
+            _set_wall_coords(rooms[room_id].walls[index], coords[which])
+        for room in rooms.values():
+            room.touch()
+
+    def apply(self, project: Project):
+        self._set(project, 1)
+
+    def revert(self, project: Project):
+        self._set(project, 0)
+
+    def merge(self, other: Command) -> bool:
+        if not isinstance(other, ReshapeRoomCommand):
+            return False
+        for key, (old, new) in other.changes.items():
+            first = self.changes.get(key, (old, new))[0]
+            self.changes[key] = (first, new)
+        return True
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + WALL_CHANGE_SIZE * len(self.changes)
+
+    def room_ids(self) -> Set[str]:
+        return {room_id for room_id, _ in self.changes}
+
+
+@dataclass(slots=True)
+class AddRoomCommand(Command):
+    """Добавление комнаты (index=None - в конец)"""
+    room: Room
+    index: Optional[int] = None
+
+    label = "Добавление комнаты"
+
+    def apply(self, project: Project):
+        if self.index is None:
+            self.index = len(project.rooms)
+        project.insert_room(self.index, self.room)
+
+    def revert(self, project: Project):
+        # После снимка в проекте может быть копия - повтор вернёт её
+        self.room = project.get_room_by_id(self.room.id) or self.room
+        project.remove_room(self.room.id)
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + OBJECT_SIZE * (1 + len(self.room.walls))
+
+    def room_ids(self) -> Set[str]:
+        return {self.room.id}
+
+
+@dataclass(slots=True)
+class RemoveRoomCommand(Command):
+    """Удаление комнаты (объект комнаты сохраняется для отмены)"""
+    room_id: str
+    room: Optional[Room] = None
+    index: int = 0
+
+    label = "Удаление комнаты"
+
+    def apply(self, project: Project):
+        self.room = project.get_room_by_id(self.room_id)
+        if self.room is None:
+            raise KeyError(f"Комната {self.room_id} не найдена")
+        self.index = project.room_position(self.room_id)
+        project.remove_room(self.room_id)
+
+    def revert(self, project: Project):
+        project.insert_room(self.index, self.room)
+
+    def size(self) -> int:
+        walls = len(self.room.walls) if self.room else 0
+        return COMMAND_OVERHEAD + OBJECT_SIZE * (1 + walls)
+
+    def room_ids(self) -> Set[str]:
+        return {self.room_id}
+
+
+@dataclass(slots=True)
+class AddOpeningCommand(Command):
+    """Добавление окна или двери в стену"""
+    room_id: str
+    wall_index: int
+    opening: object  # Window или Door
+
+    @property
+    def label(self) -> str:
+        return "Добавление двери" if isinstance(self.opening, Door) else "Добавление окна"
+
+    def _openings(self, project: Project) -> list:
+        wall = _room(project, self.room_id).walls[self.wall_index]
+        return wall.doors if isinstance(self.opening, Door) else wall.windows
+
+    def apply(self, project: Project):
+        self._openings(project).append(self.opening)
+
+    def revert(self, project: Project):
+        openings = self._openings(project)
+        # Стена могла быть скопирована после снимка - сравниваем по id
+        openings[:] = [o for o in openings if o.id != self.opening.id]
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + OBJECT_SIZE
+
+    def room_ids(self) -> Set[str]:
+        return {self.room_id}
+
+
+@dataclass(slots=True)
+class SetRoomAttributeCommand(Command):
+    """Изменение свойства комнаты (название, высота потолка)"""
+    room_id: str
+    attribute: str
+    old: object
+    new: object
+    # Высота потолка меняет и высоту стен: старые высоты для отмены
+    old_wall_heights: Tuple[float, ...] = ()
+    timestamp: float = field(default_factory=time.monotonic)
+
+    # Правки одного поля с интервалом меньше этого сливаются (ввод текста)
+    MERGE_WINDOW = 1.0  # с
+
+    @property
+    def label(self) -> str:
+        return "Переименование комнаты" if self.attribute == "name" else "Изменение комнаты"
+
+    @classmethod
+    def capture(cls, room: Room, attribute: str, new: object) -> 'SetRoomAttributeCommand':
+        """Команда с текущим значением свойства в качестве старого"""
+        heights = tuple(w.height for w in room.walls) if attribute == "ceiling_height" else ()
+        return cls(room.id, attribute, cls._value(attribute, getattr(room, attribute)),
+                   cls._value(attribute, new), heights)
+
+    @staticmethod
+    def _value(attribute: str, value: object) -> object:
+        """
+        Значение, не связанное с комнатой
+
+        Точки отверстий сдвигаются на месте (MoveRoomCommand): команда и
+        комната не должны делить их, иначе сдвиг в комнате проекта меняет
+        и историю, и снимок, который читают фоновые задачи.
+        """
+        if attribute == "holes":
+            return [[Point2D(p.x, p.y) for p in hole] for hole in value]
+        return value
+
+    def apply(self, project: Project):
+        room = _room(project, self.room_id)
+        setattr(room, self.attribute, self._value(self.attribute, self.new))
+        if self.attribute == "ceiling_height":
+            for wall in room.walls:
+                wall.height = self.new
+        elif self.attribute == "holes":
+            room.touch()
+
+    def revert(self, project: Project):
+        room = _room(project, self.room_id)
+        setattr(room, self.attribute, self._value(self.attribute, self.old))
+        for wall, height in zip(room.walls, self.old_wall_heights):
+            wall.height = height
+        if self.attribute == "holes":
+            room.touch()
+
+    def merge(self, other: Command) -> bool:
+        if (not isinstance(other, SetRoomAttributeCommand)
+                or (other.room_id, other.attribute) != (self.room_id, self.attribute)
+                or other.timestamp - self.timestamp > self.MERGE_WINDOW):
+            return False
+        self.new = other.new
+        self.timestamp = other.timestamp
+        return True
+
+    def room_ids(self) -> Set[str]:
+        return {self.room_id}
+
+
+@dataclass(slots=True)
+class AddFurnitureCommand(Command):
+    """Добавление предмета мебели"""
+    item: FurnitureItem
+
+    label = "Добавление мебели"
+
+    def apply(self, project: Project):
+        project.edit_furniture().add(self.item)
+
+    def revert(self, project: Project):
+        project.edit_furniture().remove(self.item.id)
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + OBJECT_SIZE
+
+
+@dataclass(slots=True)
+class RemoveFurnitureCommand(Command):
+    """Удаление предмета мебели (предмет сохраняется для отмены)"""
+    item_id: ObjectId
+    item: Optional[FurnitureItem] = None
+
+    label = "Удаление мебели"
+
+    def apply(self, project: Project):
+        self.item = project.furniture.get_by_id(self.item_id)
+        if self.item is None:
+            raise KeyError(f"Предмет {self.item_id} не найден")
+        project.edit_furniture().remove(self.item_id)
+
+    def revert(self, project: Project):
+        project.edit_furniture().add(self.item)
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + OBJECT_SIZE
+
+
+@dataclass(slots=True)
+class CompositeCommand(Command):
+    """Несколько команд одного действия"""
+    commands: List[Command]
+    title: str = "Изменение"
+
+    @property
+    def label(self) -> str:
+        return self.title
+
+    def apply(self, project: Project):
+        for command in self.commands:
+            command.apply(project)
+
+    def revert(self, project: Project):
+        for command in reversed(self.commands):
+            command.revert(project)
+
+    def add(self, other: Command):
+        """Добавить команду в открытую транзакцию (History.begin)"""
+        if not (self.commands and self.commands[-1].merge(other)):
+            self.commands.append(other)
+
+    def merge(self, other: Command) -> bool:
+        # Готовое составное действие (объединение комнат и т.п.) - отдельный
+        # шаг отмены: следующее действие в него не попадает
+        return False
+
+    def size(self) -> int:
+        return COMMAND_OVERHEAD + sum(c.size() for c in self.commands)
+
+    def room_ids(self) -> Set[str]:
+        return set().union(*(c.room_ids() for c in self.commands))
+
+
+class History:
+    """
+    Стек отмены/повтора
+
+    Пример:
+        history.execute(AddRoomCommand(room), project)
+        history.begin("Перемещение комнаты")
+        for dx, dy in drag:
+            history.execute(MoveRoomCommand(room.id, dx, dy), project)
+        history.end()  # в истории - один MoveRoomCommand с суммарным сдвигом
+        history.undo(project)
+    """
+
+    def __init__(self, memory_budget: int = 16 * 1024 * 1024, max_depth: int = 1000):
+        """
+        Args:
+            memory_budget: Предельный объём истории (байт, по оценке Command.size)
+            max_depth: Предельное число шагов отмены
+        """
+        self.memory_budget = memory_budget
+        self.max_depth = max_depth
+
+        self._undo: List[Command] = []
+        self._redo: List[Command] = []
+        self._memory = 0
+        self._group: Optional[CompositeCommand] = None
+        self._group_depth = 0
+        self._can_merge_top = False  # Вершину стека можно дополнять (ввод текста)
+        self._listeners: List[Callable[[], None]] = []
+        # Последний отменённый или повторённый шаг (что обновить в виджетах)
+        self.last_command: Optional[Command] = None
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Вызывается после любого изменения истории"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback()
+
+    # === Запись ===
+
+    def execute(self, command: Command, project: Project):
+        """Выполнить команду и записать её"""
+        command.apply(project)
+        self.record(command)
+
+    def record(self, command: Command):
+        """Записать уже выполненное изменение"""
+        self._clear_redo()
+
+        if self._group is not None:
+            self._group.add(command)
+            return
+
+        top = self._undo[-1] if self._undo else None
+        top_size = top.size() if top is not None else 0
+        if top is not None and self._can_merge_top and top.merge(command):
+            self._memory += top.size() - top_size
+        else:
+            self._push(command)
+        self._can_merge_top = True
+        self._notify()
+
+    def begin(self, label: str):
+        """Начать транзакцию: команды до end() станут одним шагом отмены"""
+        if self._group_depth == 0:
+            self._group = CompositeCommand([], label)
+        self._group_depth += 1
+
+    def end(self):
+        """Завершить транзакцию"""
+        if self._group_depth == 0:
+            return
+        self._group_depth -= 1
+        if self._group_depth:
+            return
+
+        group, self._group = self._group, None
+        if group.commands:
+            self._push(group.commands[0] if len(group.commands) == 1 else group)
+            # Следующее действие - новый шаг отмены
+            self._can_merge_top = False
+            self._notify()
+
+    def _push(self, command: Command):
+        self._undo.append(command)
+        self._memory += command.size()
+        self._trim()
+
+    def _trim(self):
+        """Отбросить старые шаги сверх бюджета (последний шаг остаётся всегда)"""
+        dropped = 0
+        while len(self._undo) - dropped > 1 and (
+                self._memory > self.memory_budget
+                or len(self._undo) - dropped > self.max_depth):
+            self._memory -= self._undo[dropped].size()
+            dropped += 1
+        if dropped:
+            del self._undo[:dropped]
+
+    def _clear_redo(self):
+        for command in self._redo:
+            self._memory -= command.size()
+        self._redo.clear()
+
+    # === Отмена и повтор ===
+
+    def undo(self, project: Project) -> Optional[str]:
+        """Отменить последний шаг; возвращает его название"""
+        self.end_all()
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        command.revert(project)
+        self.last_command = command
+        self._redo.append(command)
+        self._can_merge_top = False
+        self._notify()
+        return command.label
+
+    def redo(self, project: Project) -> Optional[str]:
+        """Повторить отменённый шаг; возвращает его название"""
+        self.end_all()
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        command.apply(project)
+        self.last_command = command
+        self._undo.append(command)
+        self._can_merge_top = False
+        self._notify()
+        return command.label
+
+    def end_all(self):
+        """Закрыть незавершённые транзакции"""
+        while self._group_depth:
+            self.end()
+
+    def clear(self):
+        """Очистить историю (новый или открытый проект)"""
+        self._undo.clear()
+        self._redo.clear()
+        self._memory = 0
+        self._group = None
+        self._group_depth = 0
+        self._can_merge_top = False
+        self._notify()
+
+    # === Состояние ===
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo_label(self) -> str:
+        return self._undo[-1].label if self._undo else ""
+
+    def redo_label(self) -> str:
+        return self._redo[-1].label if self._redo else ""
+
+    @property
+    def memory_used(self) -> int:
+        """Оценка объёма истории (байт)"""
+        return self._memory
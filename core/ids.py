@@ -0,0 +1,79 @@
+"""
+Компактные идентификаторы объектов плана
+
+Стены, проёмы и мебель внутри программы нумеруются целыми числами
+(~28 байт против ~85 байт у строки UUID на каждый объект). UUID нужен
+только в файле проекта: to_uuid() выдаёт его при сохранении, from_uuid()
+сопоставляет UUID из файла с номером при загрузке.
+
+UUID новых объектов не хранятся, а вычисляются из номера и случайного
+префикса сеанса (формат UUID4), поэтому повторные сохранения дают те же
+значения. UUID из файла и есть номер объекта: 128-битное число, которое
+to_uuid() переводит обратно в строку. Поэтому загрузка не заводит таблиц
+соответствия и память освобождается вместе с объектами, а копии одного
+файла получают одинаковые номера в любом сеансе. Таблицы остаются только
+для редких id, которые не являются UUID.
+"""
+
+import itertools
+import threading
+import uuid
+from typing import Dict, Union
+
+# Идентификатор объекта плана (стены, окна, двери, мебели)
+ObjectId = int
+
+_COUNTER_BITS = 32
+_COUNTER_MASK = (1 << _COUNTER_BITS) - 1
+
+# Префикс сеанса: случайные старшие биты UUID4, младшие 32 бита - номер
+_session_base = uuid.UUID(int=uuid.uuid4().int & ~_COUNTER_MASK, version=4).int
+
+_counter = itertools.count(1)
+_lock = threading.Lock()
+# Id из файла, которые нельзя сделать номером (не UUID или слишком малы)
+_to_uuid: Dict[ObjectId, str] = {}
+_from_uuid: Dict[str, ObjectId] = {}
+
+
+def new_id() -> ObjectId:
+    """Номер для нового объекта"""
+    return next(_counter)
+
+
+def to_uuid(object_id: ObjectId) -> str:
+    """UUID объекта для сохранения в файл"""
+    if object_id > _COUNTER_MASK:
+        # UUID, прочитанный из файла
+        return str(uuid.UUID(int=object_id))
+    known = _to_uuid.get(object_id)
+    if known is not None:
+        return known
+    return str(uuid.UUID(int=_session_base | object_id))
+
+
+def from_uuid(value: Union[str, int]) -> ObjectId:
+    """Номер объекта по UUID из файла (один и тот же UUID - один номер)"""
+    if isinstance(value, int):
+        return value
+
+    try:
+        parsed = uuid.UUID(value).int
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        if parsed & ~_COUNTER_MASK == _session_base:
+            # Сохранён в этом же сеансе - номер записан в самом UUID
+            return parsed & _COUNTER_MASK
+        if parsed > _COUNTER_MASK:
+            return parsed
+
+    with _lock:
+        object_id = _from_uuid.get(value)
+        if object_id is not None:
+            return object_id
+
+        object_id = new_id()
+        _to_uuid[object_id] = value
+        _from_uuid[value] = object_id
+        return object_id
@@ -0,0 +1,95 @@
+"""
+Здания и этажи проекта
+
+Проект состоит из зданий, здание - из этажей (уровней) со своими
+комнатами и мебелью. Редактируется, рисуется и считается один активный
+этаж: его комнаты и мебель - это Project.rooms и Project.furniture.
+Неактивные этажи можно выгрузить из памяти и загрузить обратно из файла.
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import List
+import uuid
+
+from .room import Room
+from .furniture import Furniture
+
+
+@dataclass
+class Level:
+    """
+    Этаж здания
+
+    Пока этаж активен, его комнаты и мебель хранит проект
+    (Project.level_rooms) - поля rooms и furniture актуальны только
+    для неактивных этажей.
+    """
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    name: str = "1 этаж"
+    elevation: float = 0  # Отметка пола (мм)
+
+    rooms: List[Room] = field(default_factory=list)
+    furniture: Furniture = field(default_factory=Furniture)
+
+    # False - этаж выгружен, в памяти только заголовок
+    loaded: bool = True
+    # Есть изменения, не сохранённые в файл (выгружать нельзя)
+    modified: bool = False
+
+    def header(self) -> dict:
+        """Заголовок этажа (без комнат и мебели)"""
+        return {"id": self.id, "name": self.name, "elevation": self.elevation}
+
+    def to_dict(self) -> dict:
+        return {
+            **self.header(),
+            "rooms": [r.to_dict() for r in self.rooms],
+            "furniture": self.furniture.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, load: bool = True) -> 'Level':
+        """Этаж из словаря (load=False - только заголовок, этаж выгружен)"""
+        level = cls(id=data["id"], name=data["name"], elevation=data.get("elevation", 0))
+        if load:
+            level.load_from(data)
+        else:
+            level.loaded = False
+        return level
+
+    def load_from(self, data: dict):
+        """Загрузить комнаты и мебель из словаря этажа"""
+        self.rooms = [Room.from_dict(r) for r in data["rooms"]]
+        self.furniture = Furniture.from_dict(data["furniture"])
+        self.loaded = True
+        self.modified = False
+
+    def unload(self):
+        """Выгрузить комнаты и мебель из памяти"""
+        self.rooms = []
+        self.furniture = Furniture()
+        self.loaded = False
+
+    def copy(self) -> 'Level':
+        """Копия этажа (список комнат и мебель общие - их копирует проект при записи)"""
+        return replace(self)
+
+
+@dataclass
+class Building:
+    """Здание - набор этажей"""
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    name: str = "Здание"
+    levels: List[Level] = field(default_factory=list)
+
+    def copy(self) -> 'Building':
+        """Копия здания с копиями этажей"""
+        return Building(id=self.id, name=self.name, levels=[level.copy() for level in self.levels])
+
+    def to_dict(self, levels: List[dict]) -> dict:
+        """Сериализация с уже готовыми словарями этажей"""
+        return {"id": self.id, "name": self.name, "levels": levels}
+
+    @classmethod
+    def from_dict(cls, data: dict, levels: List[Level]) -> 'Building':
+        return cls(id=data["id"], name=data["name"], levels=levels)
@@ -52,8 +52,23 @@ class MaterialsCalculator:
         "tile_area": 0.09,
     }
 
-    def __init__(self, project: Project):
+    def __init__(self, project: Project, adjacency=None):
+        """
+        Args:
+            adjacency: Готовый анализ смежности (utils.adjacency.PlanAdjacency),
+                например, из Canvas2D - иначе выполняется заново
+        """
         self.project = project
+        self._adjacency = adjacency
+
+    @property
+    def adjacency(self):
+        """Общие участки стен соседних комнат"""
+        if self._adjacency is None:
+            from utils.adjacency import PlanAdjacency
+            self._adjacency = PlanAdjacency()
+            self._adjacency.analyze(self.project)
+        return self._adjacency
 
     def calculate_all(self) -> Dict[str, List[MaterialResult]]:
         """Рассчитать все материалы"""
@@ -69,7 +84,10 @@ class MaterialsCalculator:
         """Расчёт материалов для стен"""
         results = []
 
-        total_wall_area = sum(r.net_wall_area for r in self.project.rooms)
+        # Обе стороны перегородки отделываются, но проём, внесённый
+        # в соседнюю комнату, вырезает и эту сторону
+        total_wall_area = sum(self.adjacency.net_wall_area(self.project, r)
+                              for r in self.project.rooms)
 
         # Штукатурка гипсовая (слой 20мм)
         plaster_kg = total_wall_area * self.NORMS["plaster_gypsum"] * 2
@@ -202,9 +220,13 @@ class MaterialsCalculator:
         """Прочие материалы"""
         results = []
 
-        # Подсчёт дверей и окон
-        total_doors = sum(len(w.doors) for r in self.project.rooms for w in r.walls)
-        total_windows = sum(len(w.windows) for r in self.project.rooms for w in r.walls)
+        # Подсчёт дверей и окон (проём в перегородке, внесённый в обе
+        # соседние комнаты, - один проём)
+        adjacency = self.adjacency
+        total_doors = (sum(len(w.doors) for r in self.project.rooms for w in r.walls)
+                       - adjacency.duplicate_openings(self.project, "doors"))
+        total_windows = (sum(len(w.windows) for r in self.project.rooms for w in r.walls)
+                         - adjacency.duplicate_openings(self.project, "windows"))
 
         if total_doors > 0:
             results.append(MaterialResult(
@@ -0,0 +1,67 @@
+"""
+Сетка пола комнаты: многоугольник, триангуляция, площадь и центр
+
+Сетка хранится в самой комнате и перестраивается, только когда растёт
+Room.geometry_version (код, меняющий координаты стен или отверстий,
+вызывает Room.touch()). Поэтому на обычном кадре 2D-заливка, пол и
+потолок в 3D и расчёт площадей берут готовую сетку, не обходя стены.
+Триангуляция считается при первом обращении: расчёту площадей она
+не нужна.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .polygon import Polygon, Vec, room_polygon
+
+
+class RoomMesh:
+    """Триангулированный пол комнаты (вершины + тройки индексов)"""
+
+    __slots__ = ("polygon", "_vertices", "_triangles", "_centroid")
+
+    def __init__(self, polygon: Polygon):
+        self.polygon = polygon
+        self._vertices: Optional[List[Vec]] = None
+        self._triangles: Optional[List[Tuple[int, int, int]]] = None
+        self._centroid: Optional[Vec] = None
+
+    @property
+    def area(self) -> float:
+        """Площадь пола в мм² (без отверстий)"""
+        return max(self.polygon.area, 0.0)
+
+    @property
+    def centroid(self) -> Vec:
+        if self._centroid is None:
+            self._centroid = self.polygon.centroid()
+        return self._centroid
+
+    def _build(self):
+        index: Dict[Vec, int] = {}
+        triangles = []
+        for triangle in self.polygon.triangles():
+            triangles.append(tuple(index.setdefault(p, len(index)) for p in triangle))
+        self._vertices = list(index)
+        self._triangles = triangles
+
+    @property
+    def vertices(self) -> List[Vec]:
+        if self._vertices is None:
+            self._build()
+        return self._vertices
+
+    @property
+    def triangles(self) -> List[Tuple[int, int, int]]:
+        if self._triangles is None:
+            self._build()
+        return self._triangles
+
+
+def room_mesh(room) -> RoomMesh:
+    """Сетка комнаты (из кэша, пока не изменилась geometry_version)"""
+    mesh = room._mesh
+    if mesh is None or room._mesh_version != room.geometry_version:
+        mesh = RoomMesh(room_polygon(room))
+        room._mesh = mesh
+        room._mesh_version = room.geometry_version
+    return mesh
@@ -0,0 +1,586 @@
+"""
+Многоугольники плана: предикаты, площадь, булевы операции, триангуляция
+
+Контур комнаты собирается из стен по совпадающим концам (порядок и
+направление стен не важны), отверстия (колонны, шахты) - отдельные
+контуры. Внешний контур хранится против часовой стрелки, отверстия - по
+часовой, поэтому точка внутри, если сумма чисел оборотов по всем контурам
+не равна нулю.
+
+Ориентация тройки точек (orient2d) считается в double с оценкой
+погрешности, а в спорных случаях (почти коллинеарные точки) -
+точно, в рациональных числах. На этом предикате построены попадание
+точки, пересечения отрезков, булевы операции (наложение контуров с
+разбиением рёбер в точках пересечения) и триангуляция отсечением ушей.
+
+Многоугольник комнаты и его триангуляция кэшируются по координатам
+(room_polygon), поэтому на каждом кадре при редактировании пересчитывается
+только изменённая комната.
+"""
+
+import math
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Vec = Tuple[float, float]
+Ring = List[Vec]
+Triangle = Tuple[Vec, Vec, Vec]
+
+# Расположение точки относительно многоугольника
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+# Граница относительной погрешности orient2d в double (Shewchuk, ccwerrboundA)
+_EPS = 2.0 ** -53
+_ORIENT_ERROR = (3.0 + 16.0 * _EPS) * _EPS
+
+# Точность совмещения вершин при булевых операциях (мм)
+_SNAP_DIGITS = 6
+
+
+# === Предикаты ===
+
+def orient2d(a: Vec, b: Vec, c: Vec) -> float:
+    """
+    Удвоенная ориентированная площадь треугольника abc
+
+    > 0 - поворот против часовой стрелки, < 0 - по часовой, 0 - на одной прямой.
+    Знак всегда верный: если оценка в double ненадёжна, считается точно.
+    """
+    left = (a[0] - c[0]) * (b[1] - c[1])
+    right = (a[1] - c[1]) * (b[0] - c[0])
+    det = left - right
+    if abs(det) > _ORIENT_ERROR * (abs(left) + abs(right)):
+        return det
+
+    ax, ay, bx, by, cx, cy = (Fraction(v) for v in (a[0], a[1], b[0], b[1], c[0], c[1]))
+    exact = (ax - cx) * (by - cy) - (ay - cy) * (bx - cx)
+    if exact == 0:
+        return 0.0
+    return math.copysign(max(abs(float(exact)), 5e-324), exact)
+
+
+def orientation(a: Vec, b: Vec, c: Vec) -> int:
+    """Знак orient2d: 1, -1 или 0"""
+    det = orient2d(a, b, c)
+    return (det > 0) - (det < 0)
+
+
+def _between(a: Vec, b: Vec, p: Vec) -> bool:
+    """p в габаритах отрезка ab (для точек на прямой ab)"""
+    return (min(a[0], b[0]) <= p[0] <= max(a[0], b[0])
+            and min(a[1], b[1]) <= p[1] <= max(a[1], b[1]))
+
+
+def on_segment(p: Vec, a: Vec, b: Vec) -> bool:
+    return orient2d(a, b, p) == 0 and _between(a, b, p)
+
+
+def signed_area(ring: Sequence[Vec]) -> float:
+    """Ориентированная площадь контура (> 0 - против часовой стрелки)"""
+    n = len(ring)
+    area = 0.0
+    for i in range(n):
+        x1, y1 = ring[i]
+        x2, y2 = ring[(i + 1) % n]
+        area += x1 * y2 - x2 * y1
+    return area / 2
+
+
+def winding_number(p: Vec, ring: Sequence[Vec]) -> int:
+    """Число оборотов контура вокруг точки"""
+    wn = 0
+    y = p[1]
+    n = len(ring)
+    for i in range(n):
+        a = ring[i]
+        b = ring[(i + 1) % n]
+        if a[1] <= y:
+            if b[1] > y and orient2d(a, b, p) > 0:
+                wn += 1
+        elif b[1] <= y and orient2d(a, b, p) < 0:
+            wn -= 1
+    return wn
+
+
+def _clean(ring: Sequence[Vec]) -> Ring:
+    """Контур без повторяющихся подряд вершин"""
+    result = []
+    for p in ring:
+        if not result or result[-1] != p:
+            result.append(p)
+    while len(result) > 1 and result[0] == result[-1]:
+        result.pop()
+    return result
+
+
+def _simplify(ring: Ring) -> Ring:
+    """Контур без вершин на прямой между соседями"""
+    ring = list(ring)
+    changed = True
+    while changed and len(ring) > 3:
+        changed = False
+        for i in range(len(ring)):
+            if orient2d(ring[i - 1], ring[i], ring[(i + 1) % len(ring)]) == 0:
+                del ring[i]
+                changed = True
+                break
+    return ring
+
+
+# === Многоугольник ===
+
+class Polygon:
+    """
+    Многоугольник с отверстиями
+
+    Пример:
+        polygon = Polygon([(0, 0), (4000, 0), (4000, 3000), (0, 3000)],
+                          holes=[[(1000, 1000), (1400, 1000), (1400, 1400), (1000, 1400)]])
+        polygon.area          # мм²
+        polygon.contains(x, y)
+        polygon.triangles()   # для заливки и 3D
+    """
+
+    __slots__ = ("outer", "holes", "_area", "_bbox", "_triangles")
+
+    def __init__(self, outer: Sequence[Vec], holes: Sequence[Sequence[Vec]] = ()):
+        outer = _clean(outer)
+        if signed_area(outer) < 0:
+            outer.reverse()
+        self.outer: Ring = outer
+
+        self.holes: List[Ring] = []
+        for hole in holes:
+            hole = _clean(hole)
+            if len(hole) < 3:
+                continue
+            if signed_area(hole) > 0:
+                hole.reverse()
+            self.holes.append(hole)
+
+        self._area: Optional[float] = None
+        self._bbox: Optional[Tuple[float, float, float, float]] = None
+        self._triangles: Optional[List[Triangle]] = None
+
+    def __repr__(self) -> str:
+        return f"Polygon({len(self.outer)} вершин, {len(self.holes)} отверстий)"
+
+    def rings(self) -> List[Ring]:
+        return [self.outer] + self.holes
+
+    def is_valid(self) -> bool:
+        return len(self.outer) >= 3 and self.area > 0
+
+    @property
+    def area(self) -> float:
+        """Площадь в мм² (за вычетом отверстий)"""
+        if self._area is None:
+            self._area = sum(signed_area(ring) for ring in self.rings())
+        return self._area
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """(min_x, min_y, max_x, max_y)"""
+        if self._bbox is None:
+            xs = [p[0] for p in self.outer] or [0.0]
+            ys = [p[1] for p in self.outer] or [0.0]
+            self._bbox = (min(xs), min(ys), max(xs), max(ys))
+        return self._bbox
+
+    def centroid(self) -> Vec:
+        """Центр масс (с учётом отверстий)"""
+        cx = cy = 0.0
+        total = 0.0
+        for ring in self.rings():
+            n = len(ring)
+            for i in range(n):
+                x1, y1 = ring[i]
+                x2, y2 = ring[(i + 1) % n]
+                cross = x1 * y2 - x2 * y1
+                cx += (x1 + x2) * cross
+                cy += (y1 + y2) * cross
+                total += cross
+        if total == 0:
+            xs = [p[0] for p in self.outer]
+            ys = [p[1] for p in self.outer]
+            return (sum(xs) / len(xs), sum(ys) / len(ys)) if xs else (0.0, 0.0)
+        return (cx / (3 * total), cy / (3 * total))
+
+    def locate(self, x: float, y: float) -> int:
+        """OUTSIDE, INSIDE или BOUNDARY"""
+        min_x, min_y, max_x, max_y = self.bbox
+        if x < min_x or x > max_x or y < min_y or y > max_y:
+            return OUTSIDE
+
+        p = (x, y)
+        wn = 0
+        for ring in self.rings():
+            n = len(ring)
+            for i in range(n):
+                if on_segment(p, ring[i], ring[(i + 1) % n]):
+                    return BOUNDARY
+            wn += winding_number(p, ring)
+        return INSIDE if wn != 0 else OUTSIDE
+
+    def contains(self, x: float, y: float, boundary: bool = True) -> bool:
+        location = self.locate(x, y)
+        return location == INSIDE or (boundary and location == BOUNDARY)
+
+    def triangles(self) -> List[Triangle]:
+        """Триангуляция (вычисляется один раз на многоугольник)"""
+        if self._triangles is None:
+            if len(self.outer) < 3:
+                self._triangles = []
+            else:
+                self._triangles = _ear_clip(_bridge_holes(self.outer, self.holes))
+        return self._triangles
+
+    # === Булевы операции ===
+
+    def union(self, other: 'Polygon') -> List['Polygon']:
+        return _overlay(self, other, "union")
+
+    def intersection(self, other: 'Polygon') -> List['Polygon']:
+        return _overlay(self, other, "intersection")
+
+    def difference(self, other: 'Polygon') -> List['Polygon']:
+        return _overlay(self, other, "difference")
+
+    def split(self, a: Vec, b: Vec) -> Tuple[List['Polygon'], List['Polygon']]:
+        """Разрезать прямой через a и b: (части слева от a->b, части справа)"""
+        length = math.hypot(b[0] - a[0], b[1] - a[1])
+        if length == 0:
+            return [self], []
+        min_x, min_y, max_x, max_y = self.bbox
+        reach = 4 * (math.hypot(max_x - min_x, max_y - min_y)
+                     + math.hypot(a[0] - min_x, a[1] - min_y) + 1)
+        ux, uy = (b[0] - a[0]) / length * reach, (b[1] - a[1]) / length * reach
+        nx, ny = -uy, ux
+        left_half = Polygon([
+            (a[0] - ux, a[1] - uy),
+            (a[0] + ux, a[1] + uy),
+            (a[0] + ux + nx, a[1] + uy + ny),
+            (a[0] - ux + nx, a[1] - uy + ny)
+        ])
+        return self.intersection(left_half), self.difference(left_half)
+
+
+# === Булевы операции: наложение контуров ===
+
+def _segment_intersections(p1: Vec, p2: Vec, q1: Vec, q2: Vec) -> List[Vec]:
+    """Точки пересечения отрезков (концы - как есть, без пересчёта)"""
+    d1 = orient2d(q1, q2, p1)
+    d2 = orient2d(q1, q2, p2)
+    if d1 == 0 and d2 == 0:
+        # На одной прямой: концы, лежащие на другом отрезке
+        points = [p for p in (p1, p2) if _between(q1, q2, p)]
+        points += [q for q in (q1, q2) if _between(p1, p2, q)]
+        return points
+
+    d3 = orient2d(p1, p2, q1)
+    d4 = orient2d(p1, p2, q2)
+    if d1 == 0 and _between(q1, q2, p1):
+        return [p1]
+    if d2 == 0 and _between(q1, q2, p2):
+        return [p2]
+    if d3 == 0 and _between(p1, p2, q1):
+        return [q1]
+    if d4 == 0 and _between(p1, p2, q2):
+        return [q2]
+    if (d1 > 0) != (d2 > 0) and (d3 > 0) != (d4 > 0) and d1 and d2 and d3 and d4:
+        t = d1 / (d1 - d2)
+        return [(p1[0] + t * (p2[0] - p1[0]), p1[1] + t * (p2[1] - p1[1]))]
+    return []
+
+
+def _split_edges(a: 'Polygon', b: 'Polygon') -> Tuple[List[Tuple[Vec, Vec]], List[Tuple[Vec, Vec]]]:
+    """Рёбра обоих многоугольников, разбитые во всех точках пересечения"""
+    snapped: Dict[Vec, Vec] = {}
+
+    def snap(p: Vec) -> Vec:
+        key = (round(p[0], _SNAP_DIGITS), round(p[1], _SNAP_DIGITS))
+        return snapped.setdefault(key, p)
+
+    def edges(polygon: 'Polygon') -> List[Tuple[Vec, Vec]]:
+        result = []
+        for ring in polygon.rings():
+            ring = [snap(p) for p in ring]
+            for i in range(len(ring)):
+                result.append((ring[i], ring[(i + 1) % len(ring)]))
+        return result
+
+    edges_a, edges_b = edges(a), edges(b)
+    cuts_a: List[List[Vec]] = [[] for _ in edges_a]
+    cuts_b: List[List[Vec]] = [[] for _ in edges_b]
+    boxes_b = [(min(q1[0], q2[0]), min(q1[1], q2[1]), max(q1[0], q2[0]), max(q1[1], q2[1]))
+               for q1, q2 in edges_b]
+
+    for i, (p1, p2) in enumerate(edges_a):
+        min_x, max_x = min(p1[0], p2[0]), max(p1[0], p2[0])
+        min_y, max_y = min(p1[1], p2[1]), max(p1[1], p2[1])
+        for j, (q1, q2) in enumerate(edges_b):
+            box = boxes_b[j]
+            if box[0] > max_x or box[2] < min_x or box[1] > max_y or box[3] < min_y:
+                continue
+            for point in _segment_intersections(p1, p2, q1, q2):
+                point = snap(point)
+                cuts_a[i].append(point)
+                cuts_b[j].append(point)
+
+    def pieces(edge_list, cuts) -> List[Tuple[Vec, Vec]]:
+        result = []
+        for (p1, p2), points in zip(edge_list, cuts):
+            dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+            ordered = sorted(set(points + [p1, p2]),
+                             key=lambda p: (p[0] - p1[0]) * dx + (p[1] - p1[1]) * dy)
+            for u, v in zip(ordered, ordered[1:]):
+                if u != v:
+                    result.append((u, v))
+        return result
+
+    return pieces(edges_a, cuts_a), pieces(edges_b, cuts_b)
+
+
+def _classify(edges: List[Tuple[Vec, Vec]], other: 'Polygon',
+              other_edges: set) -> List[Tuple[Tuple[Vec, Vec], str]]:
+    """Положение каждого ребра относительно другого многоугольника"""
+    result = []
+    for u, v in edges:
+        if (u, v) in other_edges:
+            where = "same"
+        elif (v, u) in other_edges:
+            where = "opposite"
+        else:
+            location = other.locate((u[0] + v[0]) / 2, (u[1] + v[1]) / 2)
+            where = "inside" if location == INSIDE else "outside"
+        result.append(((u, v), where))
+    return result
+
+
+# Какие рёбра остаются: (положение ребра A, положение ребра B) для операции
+_KEEP = {
+    "union": ({"outside", "same"}, {"outside"}),
+    "intersection": ({"inside", "same"}, {"inside"}),
+    "difference": ({"outside", "opposite"}, {"inside"}),
+}
+
+
+def _overlay(a: 'Polygon', b: 'Polygon', operation: str) -> List['Polygon']:
+    edges_a, edges_b = _split_edges(a, b)
+    set_a, set_b = set(edges_a), set(edges_b)
+    keep_a, keep_b = _KEEP[operation]
+
+    selected = [edge for edge, where in _classify(edges_a, b, set_b) if where in keep_a]
+    for (u, v), where in _classify(edges_b, a, set_a):
+        if where in keep_b:
+            # Из вычитаемого берутся рёбра внутри A - в обратном направлении
+            selected.append((v, u) if operation == "difference" else (u, v))
+
+    return _assemble(_stitch(selected))
+
+
+def _stitch(edges: List[Tuple[Vec, Vec]]) -> List[Ring]:
+    """Собрать направленные рёбра в замкнутые контуры"""
+    outgoing: Dict[Vec, List[int]] = {}
+    for index, (u, _) in enumerate(edges):
+        outgoing.setdefault(u, []).append(index)
+
+    used = [False] * len(edges)
+    rings = []
+    for first in range(len(edges)):
+        if used[first]:
+            continue
+        start = edges[first][0]
+        ring = []
+        current = first
+        while True:
+            used[current] = True
+            u, v = edges[current]
+            ring.append(u)
+            if v == start:
+                break
+            candidates = [k for k in outgoing.get(v, []) if not used[k]]
+            if not candidates:
+                ring = None
+                break
+            # В вершине касания уходим по самому левому повороту - контуры не слипаются
+            dx, dy = v[0] - u[0], v[1] - u[1]
+
+            def turn(k: int) -> float:
+                w = edges[k][1]
+                ex, ey = w[0] - v[0], w[1] - v[1]
+                return math.atan2(dx * ey - dy * ex, dx * ex + dy * ey)
+
+            current = max(candidates, key=turn)
+        if ring and len(ring) >= 3:
+            ring = _simplify(ring)
+            if len(ring) >= 3 and signed_area(ring) != 0:
+                rings.append(ring)
+    return rings
+
+
+def _assemble(rings: List[Ring]) -> List['Polygon']:
+    """Контуры -> многоугольники: против часовой - внешние, по часовой - отверстия"""
+    outers = [ring for ring in rings if signed_area(ring) > 0]
+    holes = [ring for ring in rings if signed_area(ring) < 0]
+    shells = [Polygon(ring) for ring in outers]
+    hole_lists: List[List[Ring]] = [[] for _ in shells]
+
+    for hole in holes:
+        owner = None
+        for index, shell in enumerate(shells):
+            location = BOUNDARY
+            for p in hole:
+                location = shell.locate(*p)
+                if location != BOUNDARY:
+                    break
+            if location == INSIDE and (owner is None or shell.area < shells[owner].area):
+                owner = index
+        if owner is not None:
+            hole_lists[owner].append(hole)
+
+    return [Polygon(shell.outer, hole_list) for shell, hole_list in zip(shells, hole_lists)]
+
+
+# === Триангуляция ===
+
+def _segments_cross(p1: Vec, p2: Vec, q1: Vec, q2: Vec) -> bool:
+    """Отрезки имеют общую точку, кроме совпадающих концов"""
+    if p1 in (q1, q2) or p2 in (q1, q2):
+        shared = {p1, p2} & {q1, q2}
+        # Общий конец - проверяем только наложение на одной прямой
+        if len(shared) == 2:
+            return True
+        return orient2d(p1, p2, q1) == 0 and orient2d(p1, p2, q2) == 0 and (
+            (q1 not in shared and _between(p1, p2, q1)) or (q2 not in shared and _between(p1, p2, q2))
+            or (p1 not in shared and _between(q1, q2, p1)) or (p2 not in shared and _between(q1, q2, p2)))
+    return bool(_segment_intersections(p1, p2, q1, q2))
+
+
+def _bridge_holes(outer: Ring, holes: List[Ring]) -> Ring:
+    """
+    Один контур из внешнего и отверстий (разрезы-«мостики»)
+
+    Отверстия подключаются справа налево: от самой правой вершины
+    отверстия к ближайшей видимой вершине уже собранного контура.
+    """
+    polygon = list(outer)
+    pending = sorted(holes, key=lambda hole: -max(p[0] for p in hole))
+    while pending:
+        hole = pending.pop(0)
+        mi = max(range(len(hole)), key=lambda i: (hole[i][0], -hole[i][1]))
+        m = hole[mi]
+
+        blockers = []
+        for ring in [polygon, hole] + pending:
+            n = len(ring)
+            blockers.extend((ring[i], ring[(i + 1) % n]) for i in range(n))
+
+        order = sorted(range(len(polygon)),
+                       key=lambda i: (polygon[i][0] - m[0]) ** 2 + (polygon[i][1] - m[1]) ** 2)
+        target = order[0]
+        for i in order:
+            p = polygon[i]
+            if not any(_segments_cross(m, p, a, b) for a, b in blockers):
+                target = i
+                break
+
+        polygon = (polygon[:target + 1] + hole[mi:] + hole[:mi] + [m]
+                   + polygon[target:target + 1] + polygon[target + 1:])
+    return polygon
+
+
+def _in_triangle(p: Vec, a: Vec, b: Vec, c: Vec) -> bool:
+    return orient2d(a, b, p) >= 0 and orient2d(b, c, p) >= 0 and orient2d(c, a, p) >= 0
+
+
+def _ear_clip(polygon: Ring) -> List[Triangle]:
+    """Триангуляция отсечением ушей (контур против часовой стрелки)"""
+    index = list(range(len(polygon)))
+    triangles: List[Triangle] = []
+
+    while len(index) > 3:
+        count = len(index)
+        for k in range(count):
+            a = polygon[index[k - 1]]
+            b = polygon[index[k]]
+            c = polygon[index[(k + 1) % count]]
+            if orient2d(a, b, c) <= 0:
+                continue
+            corners = (a, b, c)
+            if any(polygon[j] not in corners and _in_triangle(polygon[j], a, b, c)
+                   for j in index):
+                continue
+            triangles.append(corners)
+            del index[k]
+            break
+        else:
+            # Ушей нет - остались вырожденные вершины (на прямой или повторы)
+            for k in range(count):
+                if orient2d(polygon[index[k - 1]], polygon[index[k]],
+                            polygon[index[(k + 1) % count]]) <= 0:
+                    del index[k]
+                    break
+            else:
+                break
+
+    if len(index) == 3:
+        a, b, c = (polygon[i] for i in index)
+        if orient2d(a, b, c) > 0:
+            triangles.append((a, b, c))
+    return triangles
+
+
+# === Комнаты ===
+
+WallKey = Tuple[Tuple[float, float, float, float], ...]
+HolesKey = Tuple[Tuple[Vec, ...], ...]
+
+
+def _chain(segments: WallKey) -> Optional[Ring]:
+    """Контур из отрезков по совпадающим концам (None - контур не замкнут)"""
+    if len(segments) < 3:
+        return None
+    ends: Dict[Vec, List[int]] = {}
+    for index, (x1, y1, x2, y2) in enumerate(segments):
+        ends.setdefault((x1, y1), []).append(index)
+        ends.setdefault((x2, y2), []).append(index)
+
+    used = [False] * len(segments)
+    x1, y1, x2, y2 = segments[0]
+    start, current = (x1, y1), (x2, y2)
+    used[0] = True
+    ring = [start]
+    while current != start:
+        ring.append(current)
+        following = next((i for i in ends.get(current, ()) if not used[i]), None)
+        if following is None:
+            return None
+        used[following] = True
+        x1, y1, x2, y2 = segments[following]
+        current = (x2, y2) if (x1, y1) == current else (x1, y1)
+    return ring if all(used) else None
+
+
+@lru_cache(maxsize=4096)
+def _polygon_for(walls: WallKey, holes: HolesKey) -> Polygon:
+    outer = _chain(walls)
+    if outer is None:
+        # Стены не сходятся концами - контур по началам стен, как нарисованы
+        outer = [(x1, y1) for x1, y1, _, _ in walls]
+    return Polygon(outer, holes)
+
+
+def room_polygon(room) -> Polygon:
+    """
+    Многоугольник пола комнаты (с отверстиями), из кэша по координатам
+
+    Пока комната не меняется, возвращается тот же объект - вместе с его
+    площадью и триангуляцией.
+    """
+    walls = tuple((w.start.x, w.start.y, w.end.x, w.end.y) for w in room.walls)
+    holes = tuple(tuple((p.x, p.y) for p in hole) for hole in room.holes)
+    return _polygon_for(walls, holes)
@@ -1,16 +1,40 @@
 """
 Проект - сохранение и загрузка
+
+Снимки проекта (snapshot) - неизменяемые версии для фоновых задач
+(AI, расчёты, сохранение). Снимок создаётся за O(1): он делит с проектом
+список комнат, мебель и здания с этажами, а проект копирует комнату или
+список только при первой записи после снимка (copy-on-write). Поэтому комнаты и мебель
+изменяются только через edit_room() / edit_furniture() и методы проекта.
+
+Комнаты ищутся по словарю id -> комната, стены и проёмы - по словарю
+id -> id комнаты (room_of), оба ведутся вместе со списком rooms.
+Позиция комнаты в rooms (room_position) тоже кэшируется: кэш хранит
+позиции на момент построения и журнал вставок/удалений после него,
+так что поиск не сравнивает комнаты. Само удаление из середины списка
+остаётся O(n) - это сдвиг списка (memmove).
+
+Проект делится на здания и этажи (core.level). rooms и furniture - это
+комнаты и мебель активного этажа: с ними работают отрисовка, расчёт
+материалов и AI, поэтому их стоимость ограничена одним этажом.
 """
 
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 import json
+import os
+import re
 import uuid
+import weakref
 from datetime import datetime
 
-from .room import Room
+from .ids import ObjectId
+from .room import Room, Wall
 from .furniture import Furniture
+from .level import Building, Level
+
+FORMAT_VERSION = "2.0"
 
 
 @dataclass
@@ -21,63 +45,464 @@ class Project:
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     modified_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
+    # Комнаты и мебель активного этажа
     rooms: List[Room] = field(default_factory=list)
     furniture: Furniture = field(default_factory=Furniture)
 
+    # Здания и этажи (пусто - создаётся одно здание с одним этажом)
+    buildings: List[Building] = field(default_factory=list)
+    active_level_id: str = ""
+
     # Метаданные проекта
     author: str = ""
     description: str = ""
 
+    # Память чата с AI (ConversationMemory.to_dict)
+    ai_conversation: dict = field(default_factory=dict)
+
     # Путь к файлу (если сохранён)
     file_path: Optional[str] = None
 
+    # Номер версии: растёт при каждом изменении
+    version: int = field(default=0, compare=False)
+
+    # Copy-on-write: живые снимки и объекты, уже скопированные после последнего снимка
+    read_only: bool = field(default=False, init=False, repr=False, compare=False)
+    _snapshots: weakref.WeakValueDictionary = field(default_factory=weakref.WeakValueDictionary,
+                                                    init=False, repr=False, compare=False)
+    _owned_rooms: set = field(default_factory=set, init=False, repr=False, compare=False)
+    _owns_room_list: bool = field(default=True, init=False, repr=False, compare=False)
+    _owns_furniture: bool = field(default=True, init=False, repr=False, compare=False)
+    _owns_buildings: bool = field(default=True, init=False, repr=False, compare=False)
+
+    # Индексы: id комнаты -> комната, id стены/проёма -> id комнаты (строятся лениво)
+    _rooms_by_id: Optional[Dict[str, Room]] = field(default=None, init=False, repr=False,
+                                                    compare=False)
+    _owners: Optional[Dict[ObjectId, str]] = field(default=None, init=False, repr=False,
+                                                   compare=False)
+    # id комнаты -> (позиция в rooms, сколько записей журнала она уже учитывает);
+    # журнал - вставки (позиция, 1) и удаления (позиция, -1) после построения
+    _positions: Dict[str, Tuple[int, int]] = field(default_factory=dict, init=False,
+                                                   repr=False, compare=False)
+    _position_edits: List[Tuple[int, int]] = field(default_factory=list, init=False,
+                                                   repr=False, compare=False)
+
+    # Файл, из которого подгружаются выгруженные этажи, и положение этажей
+    # в нём: id этажа -> (начало, конец) в байтах, плюс (mtime, размер) файла
+    _source_path: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _source_index: Optional[Dict[str, Tuple[int, int]]] = field(default=None, init=False,
+                                                                 repr=False, compare=False)
+    _source_stamp: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False,
+                                                     compare=False)
+    # Версия проекта на момент активации этажа (изменён ли этаж)
+    _activated_version: int = field(default=0, init=False, repr=False, compare=False)
+
+    MAX_POSITION_EDITS = 64  # Длиннее журнал - кэш позиций строится заново
+
+    def __post_init__(self):
+        if not self.buildings:
+            level = Level(rooms=self.rooms, furniture=self.furniture)
+            self.buildings = [Building(levels=[level])]
+        if not self.active_level_id:
+            self.active_level_id = self.buildings[0].levels[0].id
+        self._activated_version = self.version
+
+    def snapshot(self) -> 'Project':
+        """
+        Неизменяемая версия проекта за O(1)
+
+        Снимок - обычный Project (его принимают MaterialsCalculator,
+        ContextBuilder, to_dict), но только для чтения: последующие правки
+        проекта его не затрагивают.
+        """
+        snapshot = Project(
+            id=self.id,
+            name=self.name,
+            created_at=self.created_at,
+            modified_at=self.modified_at,
+            rooms=self.rooms,
+            furniture=self.furniture,
+            author=self.author,
+            description=self.description,
+            ai_conversation=self.ai_conversation,
+            file_path=self.file_path,
+            version=self.version,
+            buildings=self.buildings,
+            active_level_id=self.active_level_id
+        )
+        snapshot.read_only = True
+        snapshot._rooms_by_id = self._rooms_by_id
+        # Выгруженные этажи снимок читает из того же файла
+        snapshot._source_path = self._source_path
+        snapshot._source_index = self._source_index
+        snapshot._source_stamp = self._source_stamp
+        self._snapshots[id(snapshot)] = snapshot
+        self._owned_rooms = set()
+        self._owns_room_list = False
+        self._owns_furniture = False
+        self._owns_buildings = False
+        return snapshot
+
+    def _shared(self) -> bool:
+        """Есть живые снимки, делящие данные с проектом"""
+        if self.read_only:
+            raise RuntimeError("Снимок проекта только для чтения")
+        return len(self._snapshots) > 0
+
+    def _own_room_list(self):
+        if not self._owns_room_list and self._shared():
+            self.rooms = list(self.rooms)
+            self._rooms_by_id = dict(self._room_index())
+        self._owns_room_list = True
+
+    def _own_buildings(self):
+        """Здания и этажи для изменения (копируются, если их делит снимок)"""
+        if not self._owns_buildings and self._shared():
+            self.buildings = [building.copy() for building in self.buildings]
+        self._owns_buildings = True
+
+    def edit_room(self, room_id: str) -> Optional[Room]:
+        """Комната для изменения (копируется, если её делит снимок)"""
+        room = self.get_room_by_id(room_id)
+        if room is None:
+            return None
+        if room_id not in self._owned_rooms and self._shared():
+            self._own_room_list()
+            index = self.room_position(room_id)
+            room = self.rooms[index] = self._rooms_by_id[room_id] = room.copy()
+            self._owned_rooms.add(room_id)
+        self.version += 1
+        return room
+
+    def edit_furniture(self) -> Furniture:
+        """Мебель для изменения (копируется, если её делит снимок)"""
+        if not self._owns_furniture and self._shared():
+            self.furniture = self.furniture.copy()
+        self._owns_furniture = True
+        self.version += 1
+        return self.furniture
+
     def add_room(self, room: Room):
         """Добавить комнату"""
-        self.rooms.append(room)
+        self.insert_room(len(self.rooms), room)
+
+    def insert_room(self, index: int, room: Room):
+        """Вставить комнату на позицию (отмена удаления)"""
+        self._own_room_list()
+        self._room_index()[room.id] = room
+        self.rooms.insert(index, room)
+        self._log_position_edit(index, 1)
+        self._positions[room.id] = (index, len(self._position_edits))
+        if self._owners is not None:
+            self._index_owner(room)
         self._update_modified()
 
     def remove_room(self, room_id: str):
         """Удалить комнату"""
-        self.rooms = [r for r in self.rooms if r.id != room_id]
+        room = self._room_index().get(room_id)
+        if room is None:
+            return
+        position = self.room_position(room_id)
+        self._own_room_list()
+        del self._rooms_by_id[room_id]
+        del self.rooms[position]
+        del self._positions[room_id]
+        self._log_position_edit(position, -1)
+        if self._owners is not None:
+            for object_id in self._contents(room):
+                self._owners.pop(object_id, None)
+        self._update_modified()
+
+    def room_position(self, room_id: str) -> int:
+        """Позиция комнаты в rooms (ValueError, если комнаты нет)"""
+        cached = self._positions.get(room_id)
+        if cached is not None:
+            position, applied = cached
+            for index, delta in self._position_edits[applied:]:
+                if position > index or (delta > 0 and position == index):
+                    position += delta
+            if position < len(self.rooms) and self.rooms[position].id == room_id:
+                return position
+
+        # Список менялся в обход проекта (другой этаж, прямая правка rooms)
+        self._positions = {room.id: (index, 0) for index, room in enumerate(self.rooms)}
+        self._position_edits = []
+        if room_id not in self._positions:
+            raise ValueError(f"Комната {room_id} не найдена")
+        return self._positions[room_id][0]
+
+    def _log_position_edit(self, index: int, delta: int):
+        if len(self._position_edits) >= self.MAX_POSITION_EDITS:
+            self._positions = {}
+            self._position_edits = []
+        else:
+            self._position_edits.append((index, delta))
+
+    # === Этажи ===
+
+    def levels(self) -> Iterator[Tuple[Building, Level]]:
+        """Все этажи всех зданий"""
+        for building in self.buildings:
+            for level in building.levels:
+                yield building, level
+
+    def get_level(self, level_id: str) -> Optional[Level]:
+        for _, level in self.levels():
+            if level.id == level_id:
+                return level
+        return None
+
+    @property
+    def active_level(self) -> Level:
+        return self.get_level(self.active_level_id)
+
+    def level_rooms(self, level: Level) -> List[Room]:
+        """Комнаты этажа (у активного - из проекта)"""
+        return self.rooms if level.id == self.active_level_id else level.rooms
+
+    def add_level(self, name: str, elevation: float = 0,
+                  building: Optional[Building] = None) -> Level:
+        """Добавить этаж (по умолчанию - в первое здание)"""
+        self._own_buildings()
+        if building is not None:
+            # Здание могло быть скопировано - берётся копия проекта
+            building = next(b for b in self.buildings if b.id == building.id)
+        level = Level(name=name, elevation=elevation, modified=True)
+        (building or self.buildings[0]).levels.append(level)
         self._update_modified()
+        return level
+
+    def add_building(self, name: str) -> Building:
+        """Добавить здание с одним этажом"""
+        self._own_buildings()
+        building = Building(name=name, levels=[Level(modified=True)])
+        self.buildings.append(building)
+        self._update_modified()
+        return building
+
+    def remove_level(self, level_id: str):
+        """Удалить неактивный этаж (пустое здание удаляется вместе с ним)"""
+        self._own_buildings()
+        if level_id == self.active_level_id:
+            raise ValueError("Нельзя удалить активный этаж")
+        for building in self.buildings:
+            building.levels = [level for level in building.levels if level.id != level_id]
+        self.buildings = [b for b in self.buildings if b.levels]
+        self._update_modified()
+
+    def set_active_level(self, level_id: str):
+        """Сделать этаж активным (выгруженный загружается из файла)"""
+        if level_id == self.active_level_id:
+            return
+        self._own_buildings()
+        level = self.get_level(level_id)
+        if level is None:
+            raise KeyError(f"Этаж {level_id} не найден")
+        if not level.loaded:
+            self.load_level(level_id)
+
+        # Комнаты текущего этажа возвращаются в его Level
+        current = self.active_level
+        current.rooms = self.rooms
+        current.furniture = self.furniture
+        current.modified = current.modified or self.version != self._activated_version
+
+        self.rooms = level.rooms
+        self.furniture = level.furniture
+        self.active_level_id = level_id
+        # Списки этажа могли попасть в снимок, пока он был активен
+        self._rooms_by_id = None
+        self._owners = None
+        self._owned_rooms = set()
+        self._owns_room_list = False
+        self._owns_furniture = False
+        self.version += 1
+        self._activated_version = self.version
+
+    def is_level_modified(self, level: Level) -> bool:
+        if level.id == self.active_level_id:
+            return level.modified or self.version != self._activated_version
+        return level.modified
+
+    def _set_source(self, path: str, index: Optional[Dict[str, Tuple[int, int]]] = None):
+        """Файл выгруженных этажей (index - их позиции в байтах, если известны)"""
+        self._source_path = path
+        self._source_stamp = _file_stamp(path)
+        self._source_index = index
+
+    def _read_levels(self, level_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Словари этажей из файла проекта: id -> данные
+
+        Читается только нужный кусок файла. Весь файл разбирается, если
+        индекс этажей ещё не построен (после сохранения) или файл изменён.
+        """
+        if not self._source_path:
+            raise ValueError("Проект не сохранён - выгруженные этажи негде взять")
+        level_ids = list(level_ids)
+        if self._source_index is None or self._source_stamp != _file_stamp(self._source_path):
+            with open(self._source_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            data, spans = _parse_project(text)
+            self._set_source(self._source_path, _byte_spans(text, spans))
+            if any(level_id not in spans for level_id in level_ids):
+                # Файл версии 1.0: этаж не записан отдельным объектом
+                return {level["id"]: level for level in _level_dicts(data)}
+
+        result = {}
+        with open(self._source_path, 'rb') as f:
+            for level_id in level_ids:
+                start, end = self._source_index[level_id]
+                f.seek(start)
+                result[level_id] = json.loads(f.read(end - start).decode('utf-8'))
+        return result
+
+    def load_level(self, level_id: str):
+        """Загрузить выгруженный этаж из файла проекта"""
+        level = self.get_level(level_id)
+        if level is None or level.loaded:
+            return
+        level.load_from(self._read_levels([level_id])[level_id])
+
+    def unload_level(self, level_id: str):
+        """Выгрузить неактивный сохранённый этаж из памяти"""
+        level = self.get_level(level_id)
+        if level is None or not level.loaded:
+            return
+        if level_id == self.active_level_id:
+            raise ValueError("Нельзя выгрузить активный этаж")
+        if level.modified or not self._source_path:
+            raise ValueError(f"Этаж «{level.name}» не сохранён - выгрузка потеряет изменения")
+        self._own_buildings()
+        self.get_level(level_id).unload()
+
+    def load_all_levels(self):
+        """Загрузить все выгруженные этажи (файл читается один раз)"""
+        unloaded = [level for _, level in self.levels() if not level.loaded]
+        if unloaded:
+            source = self._read_levels(level.id for level in unloaded)
+            for level in unloaded:
+                level.load_from(source[level.id])
+
+    def _room_index(self) -> Dict[str, Room]:
+        # Список мог быть заменён или изменён в обход методов - перестраиваем
+        if self._rooms_by_id is None or len(self._rooms_by_id) != len(self.rooms):
+            self._rooms_by_id = {room.id: room for room in self.rooms}
+        return self._rooms_by_id
 
     def get_room_by_id(self, room_id: str) -> Optional[Room]:
         """Получить комнату по ID"""
-        for room in self.rooms:
-            if room.id == room_id:
+        return self._room_index().get(room_id)
+
+    @staticmethod
+    def _contents(room: Room):
+        """Id стен и проёмов комнаты"""
+        for wall in room.walls:
+            yield wall.id
+            for window in wall.windows:
+                yield window.id
+            for door in wall.doors:
+                yield door.id
+
+    def _index_owner(self, room: Room):
+        for object_id in self._contents(room):
+            self._owners[object_id] = room.id
+
+    def room_of(self, object_id: ObjectId) -> Optional[Room]:
+        """Комната, которой принадлежит стена, окно или дверь"""
+        if self._owners is not None:
+            room = self.get_room_by_id(self._owners.get(object_id))
+            if room is not None and object_id in self._contents(room):
                 return room
+
+        # Нет в индексе или он устарел (стены и проёмы меняются внутри комнат)
+        self._owners = {}
+        for room in self.rooms:
+            self._index_owner(room)
+        return self.get_room_by_id(self._owners.get(object_id))
+
+    def get_wall_by_id(self, wall_id: ObjectId) -> Optional[Wall]:
+        """Стена по ID (или None)"""
+        room = self.room_of(wall_id)
+        if room is None:
+            return None
+        for wall in room.walls:
+            if wall.id == wall_id:
+                return wall
         return None
 
     def _update_modified(self):
         """Обновить время изменения"""
         self.modified_at = datetime.now().isoformat()
+        self.version += 1
 
     def to_dict(self) -> dict:
-        """Сериализация в словарь"""
+        """Сериализация в словарь (выгруженные этажи читаются из файла)"""
+        unloaded = [level.id for _, level in self.levels()
+                    if not level.loaded and level.id != self.active_level_id]
+        source = self._read_levels(unloaded) if unloaded else {}
+        buildings = []
+        for building in self.buildings:
+            levels = []
+            for level in building.levels:
+                if level.id == self.active_level_id:
+                    active = Level(level.id, level.name, level.elevation, self.rooms, self.furniture)
+                    levels.append(active.to_dict())
+                elif level.loaded:
+                    levels.append(level.to_dict())
+                else:
+                    levels.append({**source[level.id], **level.header()})
+            buildings.append(building.to_dict(levels))
+
         return {
             "id": self.id,
             "name": self.name,
             "created_at": self.created_at,
             "modified_at": self.modified_at,
-            "rooms": [r.to_dict() for r in self.rooms],
-            "furniture": self.furniture.to_dict(),
+            "buildings": buildings,
+            "active_level": self.active_level_id,
             "author": self.author,
             "description": self.description,
-            "version": "1.0"
+            "ai_conversation": self.ai_conversation,
+            "version": FORMAT_VERSION
         }
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Project':
-        """Десериализация из словаря"""
+    def from_dict(cls, data: dict, lazy: bool = False) -> 'Project':
+        """
+        Десериализация из словаря
+
+        Args:
+            lazy: Загрузить только активный этаж, остальные - по запросу
+        """
+        active_id = data.get("active_level", "")
+        buildings_data = _buildings_data(data)
+        buildings = []
+        for building_data in buildings_data:
+            levels = [
+                Level.from_dict(level, load=not lazy or level["id"] == active_id)
+                for level in building_data["levels"]
+            ]
+            buildings.append(Building.from_dict(building_data, levels))
+
+        active = next((level for b in buildings for level in b.levels if level.id == active_id),
+                      buildings[0].levels[0])
+        if not active.loaded:
+            # Активный этаж не найден - первый этаж загружается всегда
+            active.load_from(buildings_data[0]["levels"][0])
+
         return cls(
             id=data["id"],
             name=data["name"],
             created_at=data["created_at"],
             modified_at=data["modified_at"],
-            rooms=[Room.from_dict(r) for r in data["rooms"]],
-            furniture=Furniture.from_dict(data["furniture"]),
+            rooms=active.rooms,
+            furniture=active.furniture,
+            buildings=buildings,
+            active_level_id=active.id,
             author=data.get("author", ""),
-            description=data.get("description", "")
+            description=data.get("description", ""),
+            ai_conversation=data.get("ai_conversation", {})
         )
 
     def save(self, file_path: Optional[str] = None) -> str:
@@ -96,19 +521,38 @@ class Project:
 
         self._update_modified()
 
+        # Сначала сериализуем: выгруженные этажи читаются из прежнего файла
+        data = self.to_dict()
         with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+        # Индекс этажей нового файла строится при первой подгрузке этажа
+        self._set_source(self.file_path)
+        self._own_buildings()
+        for _, level in self.levels():
+            level.modified = False
+        self._activated_version = self.version
 
         return self.file_path
 
     @classmethod
-    def load(cls, file_path: str) -> 'Project':
-        """Загрузить проект из файла"""
+    def load(cls, file_path: str, lazy: bool = True) -> 'Project':
+        """
+        Загрузить проект из файла
+
+        Args:
+            lazy: Загрузить только активный этаж (остальные - load_level)
+        """
         with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            text = f.read()
+        # Разбор заодно даёт положение этажей в файле - подгрузка читает только их
+        data, spans = _parse_project(text)
+        index = _byte_spans(text, spans) if lazy else None
+        del text
 
-        project = cls.from_dict(data)
+        project = cls.from_dict(data, lazy=lazy)
         project.file_path = file_path
+        project._set_source(file_path, index)
         return project
 
     @property
@@ -121,7 +565,7 @@ class Project:
         return {
             "total_rooms": len(self.rooms),
             "total_area": round(self.total_area, 2),
-            "total_furniture": len(self.furniture.items),
+            "total_furniture": len(self.furniture),
             "rooms": [
                 {
                     "name": room.name,
@@ -131,3 +575,123 @@ class Project:
                 for room in self.rooms
             ]
         }
+
+
+def _buildings_data(data: dict) -> List[dict]:
+    """Здания из словаря проекта (файлы версии 1.0 - одно здание с одним этажом)"""
+    if "buildings" in data:
+        return data["buildings"]
+    # id здания и этажа выводятся из id проекта: две загрузки одного файла
+    # дают один и тот же план (diff пуст, merge не удваивает комнаты)
+    project_id = uuid.UUID(data["id"]) if _is_uuid(data["id"]) else uuid.uuid5(uuid.NAMESPACE_OID, data["id"])
+    level = {"id": str(uuid.uuid5(project_id, "level")), "name": "1 этаж", "elevation": 0,
+             "rooms": data["rooms"], "furniture": data["furniture"]}
+    return [{"id": str(uuid.uuid5(project_id, "building")), "name": "Здание", "levels": [level]}]
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        return False
+    return True
+
+
+def _level_dicts(data: dict) -> Iterator[dict]:
+    for building in _buildings_data(data):
+        yield from building["levels"]
+
+
+# === Разбор файла с положением этажей ===
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _parse_project(text: str) -> Tuple[dict, Dict[str, Tuple[int, int]]]:
+    """
+    Разбор файла проекта: словарь и положение этажей в тексте (символы)
+
+    Этажи и остальные значения разбираются json.raw_decode, который
+    возвращает конец значения, поэтому текст проходится один раз.
+    """
+    spans: Dict[str, Tuple[int, int]] = {}
+
+    def level(index: int):
+        value, end = _DECODER.raw_decode(text, index)
+        if isinstance(value, dict) and isinstance(value.get("id"), str):
+            spans[value["id"]] = (index, end)
+        return value, end
+
+    def building(index: int):
+        return _parse_container(text, index, {"levels": lambda i: _parse_container(text, i, level)})
+
+    def project(index: int):
+        return _parse_container(text, index, {"buildings": lambda i: _parse_container(text, i, building)})
+
+    data, end = project(_WHITESPACE.match(text, 0).end())
+    if _WHITESPACE.match(text, end).end() != len(text):
+        raise json.JSONDecodeError("Extra data", text, end)
+    return data, spans
+
+
+def _parse_container(text: str, index: int, parse):
+    """
+    Объект или массив с разбором элементов через parse
+
+    parse - для массива функция элемента, для объекта словарь
+    ключ -> функция значения (остальные ключи - raw_decode).
+    """
+    opening = text[index:index + 1]
+    if opening == "[":
+        closing, result = "]", []
+    elif opening == "{" and isinstance(parse, dict):
+        closing, result = "}", {}
+    else:
+        # Не та структура - значение как есть
+        return _DECODER.raw_decode(text, index)
+
+    index = _WHITESPACE.match(text, index + 1).end()
+    if text[index:index + 1] == closing:
+        return result, index + 1
+    while True:
+        if closing == "]":
+            value, index = parse(index)
+            result.append(value)
+        else:
+            key, index = _DECODER.raw_decode(text, index)
+            index = _WHITESPACE.match(text, index).end()
+            if text[index:index + 1] != ":" or not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, index)
+            index = _WHITESPACE.match(text, index + 1).end()
+            handler = parse.get(key)
+            value, index = handler(index) if handler else _DECODER.raw_decode(text, index)
+            result[key] = value
+        index = _WHITESPACE.match(text, index).end()
+        char = text[index:index + 1]
+        if char == closing:
+            return result, index + 1
+        if char != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+        index = _WHITESPACE.match(text, index + 1).end()
+
+
+def _byte_spans(text: str, spans: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+    """Позиции в символах -> позиции в байтах UTF-8 (один проход по тексту)"""
+    result = {}
+    position = offset = 0
+    for level_id, (start, end) in sorted(spans.items(), key=lambda item: item[1]):
+        offset += len(text[position:start].encode('utf-8'))
+        length = len(text[start:end].encode('utf-8'))
+        result[level_id] = (offset, offset + length)
+        offset += length
+        position = end
+    return result
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
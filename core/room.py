@@ -1,13 +1,22 @@
 """
 Модель комнаты - стены, двери, окна
+
+Точки, проёмы и стены - dataclass со __slots__ и целочисленными id
+(core.ids): в больших проектах их миллионы, и память определяют
+накладные расходы на объект.
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import List, Optional, Tuple
 from enum import Enum
+import copy
 import uuid
 import json
 
+from .ids import ObjectId, new_id, to_uuid, from_uuid
+from .polygon import Polygon
+from .mesh import RoomMesh, room_mesh
+
 
 class WallType(Enum):
     """Тип стены"""
@@ -16,7 +25,7 @@ class WallType(Enum):
     PARTITION = "partition"  # Перегородка
 
 
-@dataclass
+@dataclass(slots=True)
 class Point2D:
     """Точка на 2D плане"""
     x: float  # мм
@@ -30,10 +39,10 @@ class Point2D:
         return cls(x=data["x"], y=data["y"])
 
 
-@dataclass
+@dataclass(slots=True)
 class Window:
     """Окно в стене"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: ObjectId = field(default_factory=new_id)
     position: float = 0  # Позиция от начала стены (мм)
     width: float = 1200  # мм
     height: float = 1400  # мм
@@ -41,7 +50,7 @@ class Window:
 
     def to_dict(self) -> dict:
         return {
-            "id": self.id,
+            "id": to_uuid(self.id),
             "position": self.position,
             "width": self.width,
             "height": self.height,
@@ -50,13 +59,13 @@ class Window:
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Window':
-        return cls(**data)
+        return cls(**{**data, "id": from_uuid(data["id"])})
 
 
-@dataclass
+@dataclass(slots=True)
 class Door:
     """Дверь в стене"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: ObjectId = field(default_factory=new_id)
     position: float = 0  # Позиция от начала стены (мм)
     width: float = 900  # мм
     height: float = 2100  # мм
@@ -65,7 +74,7 @@ class Door:
 
     def to_dict(self) -> dict:
         return {
-            "id": self.id,
+            "id": to_uuid(self.id),
             "position": self.position,
             "width": self.width,
             "height": self.height,
@@ -75,13 +84,13 @@ class Door:
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Door':
-        return cls(**data)
+        return cls(**{**data, "id": from_uuid(data["id"])})
 
 
-@dataclass
+@dataclass(slots=True)
 class Wall:
     """Стена комнаты"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    id: ObjectId = field(default_factory=new_id)
     start: Point2D = field(default_factory=lambda: Point2D(0, 0))
     end: Point2D = field(default_factory=lambda: Point2D(1000, 0))
     height: float = 2700  # мм
@@ -112,7 +121,7 @@ class Wall:
 
     def to_dict(self) -> dict:
         return {
-            "id": self.id,
+            "id": to_uuid(self.id),
             "start": self.start.to_dict(),
             "end": self.end.to_dict(),
             "height": self.height,
@@ -125,7 +134,7 @@ class Wall:
     @classmethod
     def from_dict(cls, data: dict) -> 'Wall':
         return cls(
-            id=data["id"],
+            id=from_uuid(data["id"]),
             start=Point2D.from_dict(data["start"]),
             end=Point2D.from_dict(data["end"]),
             height=data["height"],
@@ -143,25 +152,34 @@ class Room:
     name: str = "Новая комната"
     walls: List[Wall] = field(default_factory=list)
     ceiling_height: float = 2700  # мм
+    # Отверстия в полу (колонны, шахты) - контуры из точек
+    holes: List[List[Point2D]] = field(default_factory=list)
+    # Версия геометрии: растёт при каждом изменении координат стен или
+    # отверстий (touch), по ней сбрасываются сетка и пути отрисовки
+    geometry_version: int = field(default=0, init=False, compare=False, repr=False)
+    _mesh: Optional[RoomMesh] = field(default=None, init=False, compare=False, repr=False)
+    _mesh_version: int = field(default=-1, init=False, compare=False, repr=False)
+
+    def touch(self):
+        """Отметить изменение геометрии (вызывать после сдвига точек)"""
+        self.geometry_version += 1
+
+    @property
+    def mesh(self) -> RoomMesh:
+        """Триангулированный пол (кэш до следующего touch)"""
+        return room_mesh(self)
+
+    @property
+    def polygon(self) -> Polygon:
+        """Многоугольник пола (контур по стенам в любом порядке, с отверстиями)"""
+        return self.mesh.polygon
 
     @property
     def floor_area(self) -> float:
-        """Площадь пола в м² (по методу шнурка)"""
+        """Площадь пола в м² (без колонн и шахт)"""
         if len(self.walls) < 3:
             return 0
-
-        # Собираем все точки по порядку
-        points = [wall.start for wall in self.walls]
-
-        # Формула площади многоугольника (shoelace formula)
-        n = len(points)
-        area = 0
-        for i in range(n):
-            j = (i + 1) % n
-            area += points[i].x * points[j].y
-            area -= points[j].x * points[i].y
-
-        return abs(area) / 2 / 1_000_000  # в м²
+        return self.mesh.area / 1_000_000  # в м²
 
     @property
     def perimeter(self) -> float:
@@ -183,22 +201,88 @@ class Room:
         """Площадь потолка = площадь пола"""
         return self.floor_area
 
+    def points(self) -> List[Point2D]:
+        """Точки углов комнаты и отверстий (общая точка соседних стен - один раз)"""
+        unique = {}
+        for wall in self.walls:
+            unique.setdefault(id(wall.start), wall.start)
+            unique.setdefault(id(wall.end), wall.end)
+        for hole in self.holes:
+            for point in hole:
+                unique.setdefault(id(point), point)
+        return list(unique.values())
+
+    def weld_vertices(self, tolerance: float = 0.0):
+        """
+        Сделать общими точки соседних стен (конец стены = начало следующей)
+
+        Как у create_rectangular: угол - одна точка, и сдвиг угла не
+        разрывает контур и не сдвигает точку дважды. По умолчанию сливаются
+        только точно совпадающие концы, чтобы загрузка не меняла координаты.
+        """
+        n = len(self.walls)
+        if n < 2:
+            return
+        for i, wall in enumerate(self.walls):
+            following = self.walls[(i + 1) % n]
+            end, start = wall.end, following.start
+            if (end is not start
+                    and abs(end.x - start.x) <= tolerance
+                    and abs(end.y - start.y) <= tolerance):
+                following.start = end
+        self.touch()
+
+    def copy(self) -> 'Room':
+        """Глубокая копия с теми же id (общие точки соседних стен остаются общими)"""
+        return copy.deepcopy(self)
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "name": self.name,
             "walls": [w.to_dict() for w in self.walls],
-            "ceiling_height": self.ceiling_height
+            "ceiling_height": self.ceiling_height,
+            "holes": [[p.to_dict() for p in hole] for hole in self.holes]
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Room':
-        return cls(
+        room = cls(
             id=data["id"],
             name=data["name"],
             walls=[Wall.from_dict(w) for w in data["walls"]],
-            ceiling_height=data["ceiling_height"]
+            ceiling_height=data["ceiling_height"],
+            holes=[[Point2D.from_dict(p) for p in hole] for hole in data.get("holes", [])]
         )
+        room.weld_vertices()
+        return room
+
+    @classmethod
+    def from_polygon(cls, polygon: Polygon, name: str, ceiling_height: float,
+                     source_walls: List[Wall] = ()) -> 'Room':
+        """
+        Комната по многоугольнику (результат объединения или разреза)
+
+        Стена, лежащая на одной линии со стенами из source_walls, берёт
+        толщину и тип первой из них и их проёмы (с позицией, пересчитанной
+        вдоль новой стены); новые стены (линия разреза) - перегородки.
+        """
+        room = cls(name=name, ceiling_height=ceiling_height)
+        points = [Point2D(x, y) for x, y in polygon.outer]
+        for i, start in enumerate(points):
+            end = points[(i + 1) % len(points)]
+            wall = Wall(start=start, end=end, height=ceiling_height, wall_type=WallType.PARTITION)
+            sources = [w for w in source_walls if _overlaps(wall, w)]
+            if sources:
+                wall.height = sources[0].height
+                wall.thickness = sources[0].thickness
+                wall.wall_type = sources[0].wall_type
+            for source in sources:
+                wall.windows.extend(_moved_openings(source.windows, source, wall))
+                wall.doors.extend(_moved_openings(source.doors, source, wall))
+            room.walls.append(wall)
+        room.holes = [[Point2D(x, y) for x, y in hole] for hole in polygon.holes]
+        return room
 
     @classmethod
     def create_rectangular(cls, name: str, width: float, length: float,
@@ -223,3 +307,80 @@ class Room:
             room.walls.append(wall)
 
         return room
+
+
+# === Объединение и разрез комнат ===
+
+_ON_WALL_TOLERANCE = 1.0  # мм
+
+
+def _offset_along(wall: Wall, x: float, y: float) -> Tuple[float, float]:
+    """(позиция вдоль стены от начала, расстояние от линии стены) в мм"""
+    length = wall.length
+    ux = (wall.end.x - wall.start.x) / length
+    uy = (wall.end.y - wall.start.y) / length
+    dx, dy = x - wall.start.x, y - wall.start.y
+    return dx * ux + dy * uy, abs(dx * uy - dy * ux)
+
+
+def _overlaps(wall: Wall, source: Wall) -> bool:
+    """Стены на одной линии и перекрываются на участке ненулевой длины"""
+    if wall.length == 0 or source.length == 0:
+        return False
+    ends = []
+    for point in (source.start, source.end):
+        along, offset = _offset_along(wall, point.x, point.y)
+        if offset > _ON_WALL_TOLERANCE:
+            return False
+        ends.append(along)
+    return min(max(ends), wall.length) - max(min(ends), 0) > _ON_WALL_TOLERANCE
+
+
+def _moved_openings(openings: list, source: Wall, wall: Wall) -> list:
+    """Проёмы source, попадающие на wall, с позицией вдоль wall"""
+    length = wall.length
+    if length == 0:
+        return []
+    ux = (source.end.x - source.start.x) / source.length
+    uy = (source.end.y - source.start.y) / source.length
+    moved = []
+    for opening in openings:
+        ends = []
+        for distance in (opening.position, opening.position + opening.width):
+            along, _ = _offset_along(wall, source.start.x + ux * distance, source.start.y + uy * distance)
+            ends.append(along)
+        position = min(ends)
+        if position >= -_ON_WALL_TOLERANCE and position + opening.width <= length + _ON_WALL_TOLERANCE:
+            moved.append(replace(opening, position=max(position, 0)))
+    return moved
+
+
+def merge_rooms(first: Room, second: Room) -> Optional[Room]:
+    """
+    Объединить две комнаты (None - они не касаются и не пересекаются)
+
+    Общая стена исчезает вместе с её проёмами, остальные стены
+    сохраняют толщину, тип, окна и двери. Название и высота - от first.
+    """
+    parts = first.polygon.union(second.polygon)
+    if len(parts) != 1:
+        return None
+    return Room.from_polygon(parts[0], first.name, first.ceiling_height,
+                             first.walls + second.walls)
+
+
+def split_room(room: Room, a: Tuple[float, float],
+               b: Tuple[float, float]) -> Optional[Tuple[Room, Room]]:
+    """
+    Разрезать комнату прямой через точки a и b
+
+    None - прямая не делит комнату на две части (проходит мимо или
+    режет на большее число частей).
+    """
+    left, right = room.polygon.split(a, b)
+    if len(left) != 1 or len(right) != 1:
+        return None
+    return (
+        Room.from_polygon(left[0], room.name, room.ceiling_height, room.walls),
+        Room.from_polygon(right[0], f"{room.name} (2)", room.ceiling_height, room.walls)
+    )
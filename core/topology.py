@@ -0,0 +1,182 @@
+"""
+Топология плана: общие вершины и стены комнат
+
+Углы комнат, совпадающие с точностью до tolerance, сливаются в одну
+вершину (Vertex), каждая стена - полуребро (HalfEdge) от начала к концу.
+Стена, которая целиком совпадает со стеной соседней комнаты, получает
+пару (twin) - это перегородка между комнатами. Структура строится за
+O(число стен) через сетку вершин и отвечает на вопросы о соседстве, не
+перебирая все пары стен.
+
+Внутри комнаты соседние стены делят один Point2D (Room.weld_vertices),
+поэтому сдвиг вершины - это изменение одной точки, а не каждой стены.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .ids import ObjectId
+from .room import Room, Wall, Point2D
+
+
+class Vertex:
+    """Вершина плана - все совпадающие углы комнат"""
+
+    __slots__ = ("index", "x", "y", "points", "edges")
+
+    def __init__(self, index: int, x: float, y: float):
+        self.index = index
+        self.x = x
+        self.y = y
+        self.points: Dict[int, Point2D] = {}  # id(точки) -> точка (каждая один раз)
+        self.edges: List['HalfEdge'] = []  # Исходящие полурёбра
+
+    def rooms(self) -> Set[str]:
+        return {edge.room_id for edge in self.edges}
+
+
+class HalfEdge:
+    """Стена комнаты как направленное ребро между вершинами"""
+
+    __slots__ = ("room_id", "wall", "wall_index", "origin", "target", "twin", "next", "prev")
+
+    def __init__(self, room_id: str, wall: Wall, wall_index: int, origin: Vertex, target: Vertex):
+        self.room_id = room_id
+        self.wall = wall
+        self.wall_index = wall_index
+        self.origin = origin
+        self.target = target
+        self.twin: Optional['HalfEdge'] = None  # Та же стена у соседней комнаты
+        self.next: Optional['HalfEdge'] = None
+        self.prev: Optional['HalfEdge'] = None
+
+    @property
+    def is_shared(self) -> bool:
+        return self.twin is not None
+
+    def points(self) -> List[Point2D]:
+        """Точки стены (начало, конец)"""
+        return [self.wall.start, self.wall.end]
+
+
+class PlanTopology:
+    """
+    Граф вершин и стен этажа
+
+    Пример:
+        topology = PlanTopology.build(project.rooms)
+        topology.adjacent_rooms(room.id)
+        for a, b in topology.shared_walls(): ...
+    """
+
+    def __init__(self, tolerance: float = 1.0):
+        self.tolerance = tolerance
+        self.vertices: List[Vertex] = []
+        self.edges: List[HalfEdge] = []
+        self._grid: Dict[Tuple[int, int], List[Vertex]] = {}
+        self._room_edges: Dict[str, List[HalfEdge]] = {}
+        self._wall_edges: Dict[ObjectId, HalfEdge] = {}
+
+    @classmethod
+    def build(cls, rooms: Iterable[Room], tolerance: float = 1.0) -> 'PlanTopology':
+        topology = cls(tolerance)
+        for room in rooms:
+            topology._add_room(room)
+        topology._link_twins()
+        return topology
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.tolerance), math.floor(y / self.tolerance))
+
+    def _vertex_for(self, point: Point2D) -> Vertex:
+        """Вершина в пределах tolerance от точки (или новая)"""
+        cx, cy = self._cell(point.x, point.y)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for vertex in self._grid.get((gx, gy), ()):
+                    if (abs(vertex.x - point.x) <= self.tolerance
+                            and abs(vertex.y - point.y) <= self.tolerance):
+                        vertex.points[id(point)] = point
+                        return vertex
+
+        vertex = Vertex(len(self.vertices), point.x, point.y)
+        vertex.points[id(point)] = point
+        self.vertices.append(vertex)
+        self._grid.setdefault((cx, cy), []).append(vertex)
+        return vertex
+
+    def _add_room(self, room: Room):
+        edges = []
+        for index, wall in enumerate(room.walls):
+            edge = HalfEdge(room.id, wall, index, self._vertex_for(wall.start), self._vertex_for(wall.end))
+            edge.origin.edges.append(edge)
+            edges.append(edge)
+            self._wall_edges[wall.id] = edge
+
+        for i, edge in enumerate(edges):
+            edge.next = edges[(i + 1) % len(edges)]
+            edge.next.prev = edge
+
+        self.edges.extend(edges)
+        self._room_edges[room.id] = edges
+
+    def _link_twins(self):
+        """Пары стен соседних комнат с общими концами"""
+        by_vertices: Dict[Tuple[int, int], List[HalfEdge]] = {}
+        for edge in self.edges:
+            a, b = edge.origin.index, edge.target.index
+            if a != b:
+                by_vertices.setdefault((min(a, b), max(a, b)), []).append(edge)
+
+        for pair in by_vertices.values():
+            if len(pair) == 2 and pair[0].room_id != pair[1].room_id:
+                pair[0].twin = pair[1]
+                pair[1].twin = pair[0]
+
+    # === Запросы ===
+
+    def room_edges(self, room_id: str) -> List[HalfEdge]:
+        return self._room_edges.get(room_id, [])
+
+    def edge_of(self, wall_id: ObjectId) -> Optional[HalfEdge]:
+        return self._wall_edges.get(wall_id)
+
+    def room_vertices(self, room_id: str) -> List[Vertex]:
+        """Вершины комнаты по порядку (каждая один раз)"""
+        seen = {}
+        for edge in self.room_edges(room_id):
+            seen.setdefault(edge.origin.index, edge.origin)
+            seen.setdefault(edge.target.index, edge.target)
+        return list(seen.values())
+
+    def shared_walls(self) -> List[Tuple[HalfEdge, HalfEdge]]:
+        """Перегородки: пары стен соседних комнат (каждая пара один раз)"""
+        return [(edge, edge.twin) for edge in self.edges
+                if edge.twin is not None and id(edge) < id(edge.twin)]
+
+    def adjacent_rooms(self, room_id: str) -> Set[str]:
+        """Комнаты, имеющие с данной общую стену"""
+        return {edge.twin.room_id for edge in self.room_edges(room_id) if edge.twin is not None}
+
+    def room_graph(self) -> Dict[str, Set[str]]:
+        """Граф соседства комнат через общие стены"""
+        return {room_id: self.adjacent_rooms(room_id) for room_id in self._room_edges}
+
+    def side_points(self, room_id: str, axis: str, value: float) -> List[Point2D]:
+        """
+        Точки, которые двигаются вместе со стороной комнаты axis == value
+
+        Точки самой комнаты на этой линии и концы парных стен соседей:
+        перегородка сдвигается целиком, без разрыва. Каждая точка - один раз.
+        """
+        points: Dict[int, Point2D] = {}
+        for edge in self.room_edges(room_id):
+            for point in edge.points():
+                if abs(getattr(point, axis) - value) <= self.tolerance:
+                    points[id(point)] = point
+            twin = edge.twin
+            if twin is not None and all(abs(getattr(p, axis) - value) <= self.tolerance
+                                        for p in edge.points()):
+                for point in twin.points():
+                    points[id(point)] = point
+        return list(points.values())
@@ -13,7 +13,17 @@ REM Проверяем наличие Python
 python --version >nul 2>&1
 if errorlevel 1 (
     echo [ОШИБКА] Python не найден!
-    echo Установите Python 3.9+ с python.org
+    echo Установите Python 3.10+ с python.org
+    pause
+    exit /b 1
+)
+
+REM Проверяем версию Python (dataclass slots - с 3.10)
+python -c "import sys; sys.exit(sys.version_info < (3, 10))" >nul 2>&1
+if errorlevel 1 (
+    echo [ОШИБКА] Нужен Python 3.10 или новее!
+    python --version
+    echo Установите Python 3.10+ с python.org
     pause
     exit /b 1
 )
@@ -0,0 +1,65 @@
+"""
+Мост между asyncio (AsyncRuntime) и Qt
+
+Корутина выполняется в фоновом цикле событий, а результат приходит
+сигналом в GUI-поток - без отдельного QThread на каждый запрос.
+"""
+
+from concurrent.futures import CancelledError, Future
+from typing import Awaitable, Set
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+from ai.async_client import AsyncRuntime
+
+
+class AsyncTask(QObject):
+    """Асинхронная задача; сигналы доставляются в поток, где создан объект"""
+    finished = pyqtSignal(object)  # результат корутины
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    _done = pyqtSignal(object)  # внутренний: Future из фонового потока
+
+    def __init__(self, coro: Awaitable, parent=None):
+        super().__init__(parent)
+        # Всегда через очередь: finished не придёт раньше, чем на него подпишутся
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+        self.future: Future = AsyncRuntime.get().submit(coro)
+        self.future.add_done_callback(self._done.emit)
+
+    def cancel(self):
+        """Отменить задачу (корутина получит CancelledError)"""
+        self.future.cancel()
+
+    def is_running(self) -> bool:
+        return not self.future.done()
+
+    def _on_done(self, future: Future):
+        _active_tasks.discard(self)
+        try:
+            result = future.result()
+        except CancelledError:
+            self.cancelled.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+        else:
+            self.finished.emit(result)
+
+
+# Задачи без родителя держим здесь, пока они не завершатся
+_active_tasks: Set[AsyncTask] = set()
+
+
+def run_async(coro: Awaitable, parent=None) -> AsyncTask:
+    """
+    Запустить корутину из GUI
+
+    Пример:
+        task = run_async(client.send_simple("..."))
+        task.finished.connect(self._on_response)
+    """
+    task = AsyncTask(coro, parent)
+    if parent is None:
+        _active_tasks.add(task)
+    return task
@@ -8,12 +8,22 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal, QPoint, QPointF, QRectF
 from PyQt5.QtGui import (
-    QPainter, QPen, QBrush, QColor, QFont, QPainterPath,
+    QPainter, QPen, QBrush, QColor, QFont, QPainterPath, QPolygonF, QTransform,
     QMouseEvent, QWheelEvent, QKeyEvent, QCursor
 )
 
+from typing import Dict, Optional, Tuple
+
 from core.project import Project
-from core.room import Room, Wall, Point2D, Window, Door
+from core.room import Room, Wall, Point2D, Window, Door, merge_rooms, split_room
+from core.history import (
+    History, MoveRoomCommand, ReshapeRoomCommand, AddRoomCommand, RemoveRoomCommand,
+    AddOpeningCommand, SetRoomAttributeCommand, CompositeCommand, wall_coords
+)
+from core.polygon import INSIDE
+from core.topology import PlanTopology
+from utils.validation import PlanValidator
+from utils.adjacency import PlanAdjacency
 from .toolbar import EditMode, StatusToolbar
 from .styles import COLORS
 
@@ -54,7 +64,7 @@ class Canvas2D(QWidget):
     GRID_SIZE = 100  # мм
     SNAP_THRESHOLD = 20  # пикселей
 
-    def __init__(self, project: Project, parent=None):
+    def __init__(self, project: Project, parent=None, history: Optional[History] = None):
         super().__init__(parent)
         self.project = project
 
@@ -85,9 +95,25 @@ class Canvas2D(QWidget):
         self.draw_start_pos = None
         self.draw_current_pos = None
 
-        # История для undo/redo
-        self.history = []
-        self.history_index = -1
+        # Изменение размера: топология и комнаты, которые оно меняет
+        # (выделенная и соседи с общими стенами)
+        self._resize_topology: Optional[PlanTopology] = None
+        self._resize_rooms: Dict[str, Room] = {}
+
+        # Пути заливки и отверстий комнат в мировых координатах:
+        # id -> (комната, geometry_version, заливка, контуры отверстий).
+        # Сдвиг и масштаб вида применяются при отрисовке (QTransform)
+        self._room_paths: Dict[str, Tuple[Room, int, QPainterPath, QPainterPath]] = {}
+
+        # История для undo/redo: все изменения плана - команды History
+        self.history = history or History()
+
+        # Проверка плана (пересечения стен, наложения комнат)
+        self.validator = PlanValidator()
+        self.plan_issues = []
+
+        # Общие стены соседних комнат (для материалов и 3D)
+        self.adjacency = PlanAdjacency()
 
         self._setup_ui()
 
@@ -125,8 +151,40 @@ class Canvas2D(QWidget):
         self.project = project
         self.selected_room_id = None
         self.selected_wall_id = None
+        self.validate_plan()
+        self.update()
+
+    def refresh_rooms(self, room_ids):
+        """
+        Перепроверить изменённые комнаты (после отмены и повтора)
+
+        Проверяются только эти комнаты; выделение сохраняется, если
+        выбранная комната осталась в проекте.
+        """
+        for room_id in room_ids:
+            self.validate_plan(room_id)
+        if self.selected_room_id and self.project.get_room_by_id(self.selected_room_id) is None:
+            self.selected_room_id = None
+            self.selected_wall_id = None
+            self.selection_changed.emit(None)
         self.update()
 
+    def validate_plan(self, room_id: str = None):
+        """
+        Проверить план
+
+        Args:
+            room_id: Если указан - перепроверяется только эта комната
+                (остальные найденные проблемы сохраняются)
+        """
+        if room_id is None:
+            self.plan_issues = self.validator.validate(self.project)
+            self.adjacency.analyze(self.project)
+        else:
+            kept = [i for i in self.plan_issues if not i.involves(room_id)]
+            self.plan_issues = kept + self.validator.validate_room(self.project, room_id)
+            self.adjacency.update_room(self.project, room_id)
+
     # === Преобразование координат ===
 
     def world_to_screen(self, x: float, y: float) -> QPointF:
@@ -141,6 +199,10 @@ class Canvas2D(QWidget):
         y = (self.height() - sy - self.offset_y) / self.scale
         return (x, y)
 
+    def world_transform(self) -> QTransform:
+        """Преобразование мировых координат в экранные (как world_to_screen)"""
+        return QTransform(self.scale, 0, 0, -self.scale, self.offset_x, self.height() - self.offset_y)
+
     def snap_to_grid(self, x: float, y: float) -> tuple:
         """Привязка к сетке"""
         return (
@@ -163,9 +225,17 @@ class Canvas2D(QWidget):
             self._draw_grid(painter)
 
         # Комнаты
-        for room in self.project.rooms:
+        rooms = self.project.rooms
+        if len(self._room_paths) > len(rooms):
+            ids = {room.id for room in rooms}
+            self._room_paths = {k: v for k, v in self._room_paths.items() if k in ids}
+        for room in rooms:
             self._draw_room(painter, room)
 
+        # Проблемы плана
+        if self.plan_issues:
+            self._draw_plan_issues(painter)
+
         # Текущее рисование
         if self.is_drawing and self.draw_start_pos and self.draw_current_pos:
             self._draw_preview(painter)
@@ -230,34 +300,35 @@ class Canvas2D(QWidget):
             return
 
         is_selected = room.id == self.selected_room_id
+        mesh = room.mesh
+        fill_path, holes_path = self._room_paths_for(room)
 
-        # Собираем точки для полигона
-        points = []
-        for wall in room.walls:
-            p = self.world_to_screen(wall.start.x, wall.start.y)
-            points.append(p)
-
-        if not points:
-            return
-
-        # Заливка
-        path = QPainterPath()
-        path.moveTo(points[0])
-        for p in points[1:]:
-            path.lineTo(p)
-        path.closeSubpath()
-
+        # Заливка по треугольникам сетки, в мировых координатах
         fill_color = QColor(COLORS['accent'])
         fill_color.setAlpha(30 if is_selected else 15)
-        painter.fillPath(path, QBrush(fill_color))
+        painter.save()
+        painter.setTransform(self.world_transform())
+        painter.fillPath(fill_path, QBrush(fill_color))
+        painter.restore()
 
         # Стены
         for wall in room.walls:
             self._draw_wall(painter, wall, room.id, is_selected)
 
+        # Контуры отверстий (колонны, шахты)
+        if not holes_path.isEmpty():
+            hole_color = QColor(COLORS['wall'])
+            hole_color.setAlpha(180)
+            pen = QPen(hole_color, 1)
+            pen.setCosmetic(True)
+            painter.save()
+            painter.setTransform(self.world_transform())
+            painter.strokePath(holes_path, pen)
+            painter.restore()
+
         # Название и площадь
-        cx = sum(p.x() for p in points) / len(points)
-        cy = sum(p.y() for p in points) / len(points)
+        center = self.world_to_screen(*mesh.centroid)
+        cx, cy = center.x(), center.y()
 
         painter.setPen(QColor(COLORS['text_primary']))
         font = painter.font()
@@ -272,6 +343,28 @@ class Canvas2D(QWidget):
         painter.setPen(QColor(COLORS['text_secondary']))
         painter.drawText(QPointF(cx - 30, cy + 12), f"{room.floor_area:.1f} м²")
 
+    def _room_paths_for(self, room: Room) -> Tuple[QPainterPath, QPainterPath]:
+        """Пути заливки и отверстий комнаты (перестраиваются только при touch)"""
+        cached = self._room_paths.get(room.id)
+        if cached is not None and cached[0] is room and cached[1] == room.geometry_version:
+            return cached[2], cached[3]
+
+        mesh = room.mesh
+        fill_path = QPainterPath()
+        fill_path.setFillRule(Qt.WindingFill)
+        vertices = [QPointF(x, y) for x, y in mesh.vertices]
+        for a, b, c in mesh.triangles:
+            fill_path.addPolygon(QPolygonF([vertices[a], vertices[b], vertices[c]]))
+            fill_path.closeSubpath()
+
+        holes_path = QPainterPath()
+        for hole in mesh.polygon.holes:
+            holes_path.addPolygon(QPolygonF([QPointF(x, y) for x, y in hole]))
+            holes_path.closeSubpath()
+
+        self._room_paths[room.id] = (room, room.geometry_version, fill_path, holes_path)
+        return fill_path, holes_path
+
     def _draw_wall(self, painter: QPainter, wall: Wall, room_id: str, room_selected: bool):
         """Отрисовка стены"""
         p1 = self.world_to_screen(wall.start.x, wall.start.y)
@@ -350,6 +443,20 @@ class Canvas2D(QWidget):
             painter.fillRect(bg_rect, QColor(COLORS['bg_primary']))
             painter.drawText(mp + QPointF(-text_rect.width()/2, text_rect.height()/4), text)
 
+    def _draw_plan_issues(self, painter: QPainter):
+        """Подсветка пересечений и наложений"""
+        color = QColor(COLORS['danger'])
+        painter.setPen(QPen(color, 2))
+        fill = QColor(color)
+        fill.setAlpha(80)
+        painter.setBrush(QBrush(fill))
+
+        for issue in self.plan_issues:
+            p = self.world_to_screen(*issue.point)
+            painter.drawEllipse(p, 6, 6)
+
+        painter.setBrush(Qt.NoBrush)
+
     def _draw_preview(self, painter: QPainter):
         """Отрисовка превью при рисовании"""
         if self.edit_mode == EditMode.DRAW_ROOM:
@@ -471,6 +578,8 @@ class Canvas2D(QWidget):
                     self.is_resizing = True
                     self.hovered_handle = handle.position
                     self.drag_start_pos = (wx, wy)
+                    self.history.begin("Изменение размера комнаты")
+                    self._begin_resize()
                     return
 
             if self.edit_mode == EditMode.SELECT:
@@ -496,6 +605,7 @@ class Canvas2D(QWidget):
                         self.selected_room_id = room.id
                         self.is_dragging = True
                         self.drag_start_pos = (wx, wy)
+                        self.history.begin("Перемещение комнаты")
                         break
 
             elif self.edit_mode in (EditMode.DRAW_WALL, EditMode.DRAW_ROOM):
@@ -538,17 +648,23 @@ class Canvas2D(QWidget):
                 dy = wy - self.drag_start_pos[1]
 
                 if dx or dy:
-                    for wall in room.walls:
-                        wall.start.x += dx
-                        wall.start.y += dy
-                        wall.end.x += dx
-                        wall.end.y += dy
+                    # Сдвиги за время перетаскивания сливаются в один шаг отмены
+                    self.history.execute(MoveRoomCommand(room.id, dx, dy), self.project)
 
                     self.drag_start_pos = (wx, wy)
+                    self.validate_plan(room.id)
                     self.update()
 
         elif self.is_resizing:
+            before = {room_id: [wall_coords(w) for w in room.walls]
+                      for room_id, room in self._resize_rooms.items()}
             if self._resize_room(wx, wy):
+                # Общие стены соседей меняются тем же шагом отмены
+                command = ReshapeRoomCommand.diff(list(self._resize_rooms.values()), before)
+                if command:
+                    self.history.record(command)
+                for room_id in self._resize_rooms:
+                    self.validate_plan(room_id)
                 self.update()
 
         elif self.is_drawing:
@@ -580,10 +696,15 @@ class Canvas2D(QWidget):
             if self.is_drawing and self.draw_start_pos and self.draw_current_pos:
                 self._finish_drawing()
 
+            if self.is_dragging or self.is_resizing:
+                self.history.end()
+
             self.is_dragging = False
             self.is_resizing = False
             self.is_drawing = False
             self.drag_start_pos = None
+            self._resize_topology = None
+            self._resize_rooms = {}
 
     def wheelEvent(self, event: QWheelEvent):
         """Масштабирование"""
@@ -656,25 +777,10 @@ class Canvas2D(QWidget):
     # === Вспомогательные методы ===
 
     def _point_in_room(self, x: float, y: float, room: Room) -> bool:
-        """Проверка попадания точки в комнату"""
+        """Проверка попадания точки в комнату (в колонну или шахту - мимо)"""
         if len(room.walls) < 3:
             return False
-
-        points = [(wall.start.x, wall.start.y) for wall in room.walls]
-        n = len(points)
-        inside = False
-
-        j = n - 1
-        for i in range(n):
-            xi, yi = points[i]
-            xj, yj = points[j]
-
-            if ((yi > y) != (yj > y) and
-                    x < (xj - xi) * (y - yi) / (yj - yi) + xi):
-                inside = not inside
-            j = i
-
-        return inside
+        return room.polygon.contains(x, y)
 
     def _finish_drawing(self):
         """Завершить рисование"""
@@ -699,80 +805,104 @@ class Canvas2D(QWidget):
                 offset_x = min(x1, x2)
                 offset_y = min(y1, y2)
 
-                for wall in room.walls:
-                    wall.start.x += offset_x
-                    wall.start.y += offset_y
-                    wall.end.x += offset_x
-                    wall.end.y += offset_y
+                # Углы общие у соседних стен - сдвигаем каждый один раз
+                for point in room.points():
+                    point.x += offset_x
+                    point.y += offset_y
+                room.touch()
 
-                self.project.add_room(room)
+                self.history.execute(AddRoomCommand(room), self.project)
                 self.selected_room_id = room.id
+                self.validate_plan(room.id)
                 self.room_selected.emit(room.id)
 
         self.draw_start_pos = None
         self.draw_current_pos = None
         self.update()
 
+    def _begin_resize(self):
+        """Топология плана на время изменения размера выделенной комнаты"""
+        topology = PlanTopology.build(self.project.rooms)
+        room_ids = [self.selected_room_id, *sorted(topology.adjacent_rooms(self.selected_room_id))]
+        self._resize_rooms = {}
+        self._prepare_resize(room_ids)
+
+    def _prepare_resize(self, room_ids) -> bool:
+        """
+        Свои (не общие со снимками) копии изменяемых комнат
+
+        Топология ссылается на точки комнат, поэтому если edit_room
+        скопировал комнату (например, после снимка для фоновой задачи),
+        она перестраивается. False - выделенной комнаты больше нет.
+        """
+        rooms = {}
+        for room_id in room_ids:
+            room = self.project.edit_room(room_id)
+            if room:
+                rooms[room_id] = room
+        if self.selected_room_id not in rooms:
+            return False
+
+        if (self._resize_topology is None or rooms.keys() != self._resize_rooms.keys()
+                or any(room is not self._resize_rooms[room_id] for room_id, room in rooms.items())):
+            self._resize_rooms = rooms
+            self._resize_topology = PlanTopology.build(self.project.rooms)
+        return True
+
     def _resize_room(self, wx: float, wy: float) -> bool:
-        """Изменение размера комнаты через маркеры"""
-        room = self.project.get_room_by_id(self.selected_room_id)
-        if not room:
+        """
+        Изменение размера комнаты через маркеры
+
+        Каждый угол сдвигается один раз; общая стена соседней комнаты
+        сдвигается вместе со стороной, а не расходится с ней.
+        """
+        if self._resize_topology is None:
+            self._begin_resize()
+        if not self._prepare_resize(list(self._resize_rooms)):
             return False
 
+        room = self._resize_rooms[self.selected_room_id]
+        topology = self._resize_topology
+
         # Привязка к сетке
         wx, wy = self.snap_to_grid(wx, wy)
 
         # Находим текущие границы
-        min_x = min(w.start.x for w in room.walls)
-        max_x = max(w.start.x for w in room.walls)
-        min_y = min(w.start.y for w in room.walls)
-        max_y = max(w.start.y for w in room.walls)
+        points = room.points()
+        min_x = min(p.x for p in points)
+        max_x = max(p.x for p in points)
+        min_y = min(p.y for p in points)
+        max_y = max(p.y for p in points)
 
         # Изменяем в зависимости от маркера
         handle = self.hovered_handle
 
-        changed = False
+        # (ось, старое значение, новое значение)
+        moves = []
 
         if handle in (SelectionHandle.LEFT, SelectionHandle.TOP_LEFT, SelectionHandle.BOTTOM_LEFT):
-            new_min_x = min(wx, max_x - 500)
-            if new_min_x != min_x:
-                for wall in room.walls:
-                    if wall.start.x == min_x:
-                        wall.start.x = new_min_x
-                    if wall.end.x == min_x:
-                        wall.end.x = new_min_x
-                changed = True
+            moves.append(("x", min_x, min(wx, max_x - 500)))
 
         if handle in (SelectionHandle.RIGHT, SelectionHandle.TOP_RIGHT, SelectionHandle.BOTTOM_RIGHT):
-            new_max_x = max(wx, min_x + 500)
-            if new_max_x != max_x:
-                for wall in room.walls:
-                    if wall.start.x == max_x:
-                        wall.start.x = new_max_x
-                    if wall.end.x == max_x:
-                        wall.end.x = new_max_x
-                changed = True
+            moves.append(("x", max_x, max(wx, min_x + 500)))
 
         if handle in (SelectionHandle.TOP, SelectionHandle.TOP_LEFT, SelectionHandle.TOP_RIGHT):
-            new_max_y = max(wy, min_y + 500)
-            if new_max_y != max_y:
-                for wall in room.walls:
-                    if wall.start.y == max_y:
-                        wall.start.y = new_max_y
-                    if wall.end.y == max_y:
-                        wall.end.y = new_max_y
-                changed = True
+            moves.append(("y", max_y, max(wy, min_y + 500)))
 
         if handle in (SelectionHandle.BOTTOM, SelectionHandle.BOTTOM_LEFT, SelectionHandle.BOTTOM_RIGHT):
-            new_min_y = min(wy, max_y - 500)
-            if new_min_y != min_y:
-                for wall in room.walls:
-                    if wall.start.y == min_y:
-                        wall.start.y = new_min_y
-                    if wall.end.y == min_y:
-                        wall.end.y = new_min_y
+            moves.append(("y", min_y, min(wy, max_y - 500)))
+
+        changed = False
+        for axis, old, new in moves:
+            if new != old:
+                for point in topology.side_points(room.id, axis, old):
+                    setattr(point, axis, new)
                 changed = True
 
+        if changed:
+            # Сдвиг стороны мог задеть и соседей по перегородке
+            for resized in self._resize_rooms.values():
+                resized.touch()
         return changed
 
     def _add_door_at(self, wx: float, wy: float):
@@ -801,12 +931,15 @@ class Canvas2D(QWidget):
                     width=door_width,
                     height=2100
                 )
-                closest_wall.doors.append(door)
+                self.history.execute(AddOpeningCommand(
+                    closest_room.id, closest_room.walls.index(closest_wall), door
+                ), self.project)
                 self.update()
 
     def _add_window_at(self, wx: float, wy: float):
         """Добавить окно на ближайшую стену"""
         closest_wall = None
+        closest_room = None
         min_dist = float('inf')
         closest_pos = 0
 
@@ -816,6 +949,7 @@ class Canvas2D(QWidget):
                 if dist < min_dist and dist < 500:
                     min_dist = dist
                     closest_wall = wall
+                    closest_room = room
                     closest_pos = pos
 
         if closest_wall:
@@ -827,7 +961,9 @@ class Canvas2D(QWidget):
                     height=1400,
                     sill_height=900
                 )
-                closest_wall.windows.append(window)
+                self.history.execute(AddOpeningCommand(
+                    closest_room.id, closest_room.walls.index(closest_wall), window
+                ), self.project)
                 self.update()
 
     def _point_to_wall_distance(self, px: float, py: float, wall: Wall) -> tuple:
@@ -860,9 +996,13 @@ class Canvas2D(QWidget):
 
     def _delete_selected(self):
         """Удалить выбранный элемент"""
-        if self.selected_room_id:
-            self.project.remove_room(self.selected_room_id)
+        if self.selected_room_id and self.project.get_room_by_id(self.selected_room_id):
+            removed_id = self.selected_room_id
+            self.history.execute(RemoveRoomCommand(removed_id), self.project)
             self.selected_room_id = None
+            self.plan_issues = [i for i in self.plan_issues if not i.involves(removed_id)]
+            self.validator.remove_room(removed_id)
+            self.adjacency.remove_room(removed_id)
             self.update()
             self.selection_changed.emit(None)
 
@@ -932,6 +1072,23 @@ class Canvas2D(QWidget):
                 rename_action = menu.addAction("Переименовать")
                 rename_action.triggered.connect(self._rename_selected_room)
 
+                neighbours = self.adjacency.room_graph().get(room.id, set())
+                if neighbours:
+                    merge_menu = menu.addMenu("Объединить с")
+                    for other_id in sorted(neighbours):
+                        other = self.project.get_room_by_id(other_id)
+                        if other:
+                            action = merge_menu.addAction(other.name)
+                            action.triggered.connect(
+                                lambda _, rid=other_id: self._merge_selected_with(rid))
+
+                split_action = menu.addAction("Разделить пополам")
+                split_action.triggered.connect(self._split_selected_room)
+
+                wx, wy = self.screen_to_world(pos.x(), pos.y())
+                column_action = menu.addAction("Добавить колонну")
+                column_action.triggered.connect(lambda: self._add_column_at(wx, wy))
+
                 delete_action = menu.addAction("Удалить")
                 delete_action.triggered.connect(self._delete_selected)
         else:
@@ -945,6 +1102,69 @@ class Canvas2D(QWidget):
 
         menu.exec_(self.mapToGlobal(pos))
 
+    def _replace_rooms(self, old_ids: list, new_rooms: list, title: str):
+        """Заменить комнаты новыми одним шагом отмены (на месте первой из старых)"""
+        index = min(self.project.room_position(i) for i in old_ids)
+        commands = [RemoveRoomCommand(i) for i in old_ids]
+        commands += [AddRoomCommand(room, index + k) for k, room in enumerate(new_rooms)]
+        self.history.execute(CompositeCommand(commands, title), self.project)
+
+        self.selected_room_id = new_rooms[0].id
+        self.validate_plan()
+        self.update()
+        self.room_selected.emit(new_rooms[0].id)
+
+    def _merge_selected_with(self, other_id: str):
+        """Объединить выбранную комнату с соседней"""
+        room = self.project.get_room_by_id(self.selected_room_id)
+        other = self.project.get_room_by_id(other_id)
+        if not room or not other:
+            return
+        merged = merge_rooms(room, other)
+        if merged is None:
+            QMessageBox.information(self, "Объединение", "Комнаты не соприкасаются.")
+            return
+        self._replace_rooms([room.id, other.id], [merged], "Объединение комнат")
+
+    def _split_selected_room(self):
+        """Разделить комнату через центр поперёк длинной стороны"""
+        room = self.project.get_room_by_id(self.selected_room_id)
+        if not room:
+            return
+        polygon = room.polygon
+        cx, cy = polygon.centroid()
+        min_x, min_y, max_x, max_y = polygon.bbox
+        if max_x - min_x >= max_y - min_y:
+            line = ((cx, cy), (cx, cy + 1))
+        else:
+            line = ((cx, cy), (cx + 1, cy))
+
+        parts = split_room(room, *line)
+        if parts is None:
+            QMessageBox.information(self, "Разделение", "Комнату нельзя разделить на две части по центру.")
+            return
+        self._replace_rooms([room.id], list(parts), "Разделение комнаты")
+
+    def _add_column_at(self, wx: float, wy: float, size: float = 400):
+        """Колонна (отверстие в полу) с центром в точке"""
+        room = self.project.get_room_by_id(self.selected_room_id)
+        if not room:
+            return
+        half = size / 2
+        corners = [(wx - half, wy - half), (wx + half, wy - half),
+                   (wx + half, wy + half), (wx - half, wy + half)]
+        polygon = room.polygon
+        if any(polygon.locate(x, y) != INSIDE for x, y in corners):
+            QMessageBox.information(self, "Колонна", "Колонна должна целиком находиться внутри комнаты.")
+            return
+
+        # Копии точек: отверстия комнаты в проекте могут принадлежать снимку
+        holes = [[Point2D(p.x, p.y) for p in hole] for hole in room.holes]
+        holes.append([Point2D(x, y) for x, y in corners])
+        self.history.execute(SetRoomAttributeCommand.capture(room, "holes", holes), self.project)
+        self.update()
+        self.room_selected.emit(room.id)
+
     def _rename_selected_room(self):
         """Переименовать комнату"""
         room = self.project.get_room_by_id(self.selected_room_id)
@@ -954,5 +1174,5 @@ class Canvas2D(QWidget):
                 "Название комнаты:", text=room.name
             )
             if ok and name:
-                room.name = name
+                self.history.execute(SetRoomAttributeCommand.capture(room, "name", name), self.project)
                 self.update()
\ No newline at end of file
@@ -96,8 +96,9 @@ class PropertyRow(QWidget):
         return widget
 
     def set_value(self, value):
-        """Установить значение"""
+        """Установить значение (без value_changed - это не правка пользователя)"""
         widget = self.value_widget
+        widget.blockSignals(True)
         if isinstance(widget, QLineEdit):
             widget.setText(str(value))
         elif isinstance(widget, (QSpinBox, QDoubleSpinBox)):
@@ -108,6 +109,7 @@ class PropertyRow(QWidget):
                 widget.setCurrentIndex(idx)
         elif isinstance(widget, QLabel):
             widget.setText(str(value))
+        widget.blockSignals(False)
 
     def get_value(self):
         """Получить значение"""
@@ -11,6 +11,7 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt
 
 from config.settings import Settings
+from ui.async_bridge import run_async
 
 
 class SettingsDialog(QDialog):
@@ -19,6 +20,8 @@ class SettingsDialog(QDialog):
     def __init__(self, settings: Settings, parent=None):
         super().__init__(parent)
         self.settings = settings
+        self._test_client = None
+        self._test_task = None
 
         self._setup_ui()
         self._load_settings()
@@ -72,9 +75,9 @@ class SettingsDialog(QDialog):
         api_layout.addWidget(info_label)
 
         # Проверка ключа
-        test_btn = QPushButton("🔍 Проверить подключение")
-        test_btn.clicked.connect(self._test_api)
-        api_layout.addWidget(test_btn)
+        self.test_btn = QPushButton("🔍 Проверить подключение")
+        self.test_btn.clicked.connect(self._test_api)
+        api_layout.addWidget(self.test_btn)
 
         api_layout.addStretch()
         tabs.addTab(api_tab, "🤖 AI")
@@ -170,29 +173,52 @@ class SettingsDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Введите API ключ")
             return
 
-        try:
-            from ai.gpt_client import GPTClient
-
-            client = GPTClient(api_key, self.model_combo.currentText())
-            response = client.send_simple("Привет! Ответь одним словом: работает")
-
-            if response.success:
-                QMessageBox.information(
-                    self, "Успех",
-                    f"✅ Подключение работает!\n\nОтвет: {response.content[:100]}"
-                )
-            else:
-                QMessageBox.warning(
-                    self, "Ошибка",
-                    f"❌ Ошибка подключения:\n{response.error}"
-                )
-
-        except Exception as e:
-            QMessageBox.critical(
+        from ai.async_client import AsyncGPTClient
+
+        # Один клиент на диалог: повторные проверки используют тот же пул соединений
+        if self._test_client is None:
+            self._test_client = AsyncGPTClient(api_key, self.model_combo.currentText())
+        else:
+            self._test_client.set_api_key(api_key)
+            self._test_client.model = self.model_combo.currentText()
+
+        self.test_btn.setEnabled(False)
+        self.test_btn.setText("⏳ Проверка...")
+
+        self._test_task = run_async(
+            self._test_client.send_simple("Привет! Ответь одним словом: работает"),
+            parent=self
+        )
+        self._test_task.finished.connect(self._on_test_finished)
+        self._test_task.error.connect(self._on_test_error)
+
+    def _on_test_finished(self, response):
+        """Результат проверки подключения"""
+        self._reset_test_button()
+
+        if response.success:
+            QMessageBox.information(
+                self, "Успех",
+                f"✅ Подключение работает!\n\nОтвет: {response.content[:100]}"
+            )
+        else:
+            QMessageBox.warning(
                 self, "Ошибка",
-                f"❌ Не удалось проверить:\n{str(e)}"
+                f"❌ Ошибка подключения:\n{response.error}"
             )
 
+    def _on_test_error(self, error: str):
+        """Исключение при проверке"""
+        self._reset_test_button()
+        QMessageBox.critical(
+            self, "Ошибка",
+            f"❌ Не удалось проверить:\n{error}"
+        )
+
+    def _reset_test_button(self):
+        self.test_btn.setEnabled(True)
+        self.test_btn.setText("🔍 Проверить подключение")
+
     def _reset_to_defaults(self):
         """Сбросить к значениям по умолчанию"""
         reply = QMessageBox.question(
@@ -6,13 +6,15 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QSplitter, QTabWidget, QMenuBar, QMenu, QAction,
-    QStatusBar, QFileDialog, QMessageBox, QLabel, QFrame
+    QStatusBar, QFileDialog, QMessageBox, QLabel, QFrame, QInputDialog
 )
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QKeySequence
 
 from config.settings import Settings
 from core.project import Project
+from core.history import History, AddRoomCommand, AddFurnitureCommand, RemoveFurnitureCommand
+from core.diff import merge_projects
 
 from .icons import Icons
 from .styles import COLORS
@@ -33,6 +35,12 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.settings = settings
         self.project = Project(name="Новый проект")
+        self.history = History()
+        # Своя история отмены у каждого этажа
+        self._histories = {self.project.active_level_id: self.history}
+        # Мебель последней AI-генерации по комнатам и история, в которой открыт её шаг
+        self._ai_furniture = {}
+        self._ai_history = None
 
         self._setup_ui()
         self._create_menus()
@@ -83,7 +91,7 @@ class MainWindow(QMainWindow):
         canvas_layout.setContentsMargins(0, 0, 0, 0)
         canvas_layout.setSpacing(0)
 
-        self.canvas_2d = Canvas2D(self.project)
+        self.canvas_2d = Canvas2D(self.project, history=self.history)
         canvas_layout.addWidget(self.canvas_2d, 1)
 
         # Статус панель
@@ -94,7 +102,7 @@ class MainWindow(QMainWindow):
         self.view_tabs.addTab(canvas_container, "2D План")
 
         # 3D Viewport
-        self.viewport_3d = Viewport3D(self.project)
+        self.viewport_3d = Viewport3D(self.project, adjacency=self.canvas_2d.adjacency)
         self.view_tabs.addTab(self.viewport_3d, "3D Просмотр")
 
         workspace_layout.addWidget(self.view_tabs)
@@ -114,13 +122,13 @@ class MainWindow(QMainWindow):
         self.tool_tabs = QTabWidget()
         self.tool_tabs.setDocumentMode(True)
 
-        self.properties_panel = PropertiesPanel(self.project)
+        self.properties_panel = PropertiesPanel(self.project, history=self.history)
         self.tool_tabs.addTab(self.properties_panel, "Проект")
 
         self.ai_panel = AIPanel(self.settings, self.project)
         self.tool_tabs.addTab(self.ai_panel, "AI Дизайн")
 
-        self.materials_panel = MaterialsPanel(self.project)
+        self.materials_panel = MaterialsPanel(self.project, adjacency=self.canvas_2d.adjacency)
         self.tool_tabs.addTab(self.materials_panel, "Материалы")
 
         right_layout.addWidget(self.tool_tabs)
@@ -152,6 +160,9 @@ class MainWindow(QMainWindow):
         open_action.setIcon(Icons.get_icon(Icons.SVG_OPEN))
         open_action.triggered.connect(self._open_project)
 
+        merge_action = file_menu.addAction("Объединить с копией...")
+        merge_action.triggered.connect(self._merge_project)
+
         file_menu.addSeparator()
 
         save_action = file_menu.addAction("Сохранить")
@@ -174,6 +185,9 @@ class MainWindow(QMainWindow):
         export_csv = export_menu.addAction("Материалы (CSV)...")
         export_csv.triggered.connect(self._export_csv)
 
+        export_metrics = export_menu.addAction("Метрики AI (JSON Lines)...")
+        export_metrics.triggered.connect(self._export_ai_metrics)
+
         file_menu.addSeparator()
 
         exit_action = file_menu.addAction("Выход")
@@ -183,13 +197,15 @@ class MainWindow(QMainWindow):
         # === Правка ===
         edit_menu = menubar.addMenu("Правка")
 
-        undo_action = edit_menu.addAction("Отменить")
-        undo_action.setShortcut(QKeySequence.Undo)
-        undo_action.setIcon(Icons.get_icon(Icons.SVG_UNDO))
+        self.undo_action = edit_menu.addAction("Отменить")
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.setIcon(Icons.get_icon(Icons.SVG_UNDO))
+        self.undo_action.triggered.connect(self._undo)
 
-        redo_action = edit_menu.addAction("Повторить")
-        redo_action.setShortcut(QKeySequence.Redo)
-        redo_action.setIcon(Icons.get_icon(Icons.SVG_REDO))
+        self.redo_action = edit_menu.addAction("Повторить")
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.redo_action.setIcon(Icons.get_icon(Icons.SVG_REDO))
+        self.redo_action.triggered.connect(self._redo)
 
         edit_menu.addSeparator()
 
@@ -205,6 +221,22 @@ class MainWindow(QMainWindow):
         add_room_action.setIcon(Icons.get_icon(Icons.SVG_PLUS))
         add_room_action.triggered.connect(self._add_room)
 
+        # === Этаж ===
+        level_menu = menubar.addMenu("Этаж")
+
+        add_level_action = level_menu.addAction("Добавить этаж...")
+        add_level_action.setIcon(Icons.get_icon(Icons.SVG_PLUS))
+        add_level_action.triggered.connect(self._add_level)
+
+        remove_level_action = level_menu.addAction("Удалить этаж")
+        remove_level_action.setIcon(Icons.get_icon(Icons.SVG_DELETE))
+        remove_level_action.triggered.connect(self._remove_level)
+
+        level_menu.addSeparator()
+
+        unload_action = level_menu.addAction("Выгрузить неактивные этажи")
+        unload_action.triggered.connect(self._unload_levels)
+
         # === Вид ===
         view_menu = menubar.addMenu("Вид")
 
@@ -256,6 +288,10 @@ class MainWindow(QMainWindow):
         self.project_info.setStyleSheet(f"color: {COLORS['text_secondary']};")
         self.statusbar.addPermanentWidget(self.project_info)
 
+        self.ai_metrics_label = QLabel()
+        self.ai_metrics_label.setStyleSheet(f"color: {COLORS['text_secondary']};")
+        self.statusbar.addPermanentWidget(self.ai_metrics_label)
+
         self._update_status()
 
     def _connect_signals(self):
@@ -267,8 +303,19 @@ class MainWindow(QMainWindow):
         # Canvas
         self.canvas_2d.room_selected.connect(self._on_room_selected)
 
+        # История
+        self.history.add_listener(self._update_undo_actions)
+        self._update_undo_actions()
+
+        # Этажи
+        self.status_toolbar.level_selected.connect(self._on_level_selected)
+
         # Панели
         self.properties_panel.project_changed.connect(self._on_project_changed)
+        self.ai_panel.project_changed.connect(self._on_project_changed)
+        self.ai_panel.furniture_placed.connect(self._on_ai_furniture_placed)
+        self.ai_panel.design_finished.connect(self._on_ai_design_finished)
+        self.ai_panel.metrics_updated.connect(self._on_ai_metrics)
 
     def _on_mode_changed(self, mode: str):
         """Смена режима редактирования"""
@@ -278,9 +325,9 @@ class MainWindow(QMainWindow):
     def _on_toolbar_action(self, action: str):
         """Действие из тулбара"""
         if action == "undo":
-            pass  # TODO
+            self._undo()
         elif action == "redo":
-            pass  # TODO
+            self._redo()
         elif action == "delete":
             self.canvas_2d._delete_selected()
         elif action == "zoom_in":
@@ -295,6 +342,31 @@ class MainWindow(QMainWindow):
             self.canvas_2d.show_grid = not self.canvas_2d.show_grid
             self.canvas_2d.update()
 
+    def _undo(self):
+        """Отменить последнее изменение"""
+        label = self.history.undo(self.project)
+        if label:
+            self._refresh_rooms(self.history.last_command.room_ids())
+            self.status_label.setText(f"Отменено: {label}")
+
+    def _redo(self):
+        """Повторить отменённое изменение"""
+        label = self.history.redo(self.project)
+        if label:
+            self._refresh_rooms(self.history.last_command.room_ids())
+            self.status_label.setText(f"Повторено: {label}")
+
+    def _update_undo_actions(self):
+        """Доступность и подписи отмены/повтора"""
+        can_undo = self.history.can_undo()
+        can_redo = self.history.can_redo()
+        self.undo_action.setEnabled(can_undo)
+        self.redo_action.setEnabled(can_redo)
+        self.undo_action.setText(f"Отменить: {self.history.undo_label()}" if can_undo else "Отменить")
+        self.redo_action.setText(f"Повторить: {self.history.redo_label()}" if can_redo else "Повторить")
+        self.toolbar.undo_btn.setEnabled(can_undo)
+        self.toolbar.redo_btn.setEnabled(can_redo)
+
     def _update_title(self):
         """Обновить заголовок окна"""
         title = f"DizainAI — {self.project.name}"
@@ -315,9 +387,117 @@ class MainWindow(QMainWindow):
         self.properties_panel.update_project(self.project)
         self.materials_panel.update_project(self.project)
         self.ai_panel.update_project(self.project)
+        self._update_levels()
         self._update_status()
         self._update_title()
 
+    def _refresh_rooms(self, room_ids):
+        """
+        Обновить виджеты после отмены или повтора
+
+        Перепроверяются только затронутые комнаты, выделение сохраняется.
+        Результаты расчёта материалов сбрасываются (пересчёт - по кнопке).
+        """
+        self.canvas_2d.refresh_rooms(room_ids)
+        self.viewport_3d.refresh_rooms(room_ids)
+        self.properties_panel.refresh_rooms(room_ids)
+        self.materials_panel.update_project(self.project)
+        self.ai_panel.refresh_rooms(room_ids)
+        self._update_status()
+
+    def _update_levels(self):
+        """Список этажей в строке статуса канваса"""
+        several_buildings = len(self.project.buildings) > 1
+        levels = []
+        for building, level in self.project.levels():
+            label = f"{building.name}: {level.name}" if several_buildings else level.name
+            if not level.loaded:
+                label += " (выгружен)"
+            levels.append((level.id, label))
+        self.status_toolbar.set_levels(levels, self.project.active_level_id)
+
+    def _reset_history(self):
+        """Новый проект - истории этажей начинаются заново"""
+        self.history.clear()
+        self._histories = {self.project.active_level_id: self.history}
+        self._ai_furniture = {}
+        self._ai_history = None
+
+    def _use_level_history(self):
+        """Подключить историю активного этажа к канвасу и панели свойств"""
+        history = self._histories.get(self.project.active_level_id)
+        if history is None:
+            history = self._histories[self.project.active_level_id] = History()
+            history.add_listener(self._update_undo_actions)
+        self.history = history
+        self.canvas_2d.history = history
+        self.properties_panel.history = history
+        self._update_undo_actions()
+
+    def _on_level_selected(self, level_id: str):
+        """Выбран другой этаж"""
+        try:
+            self.project.set_active_level(level_id)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть этаж:\n{e}")
+            self._update_levels()
+            return
+        self._use_level_history()
+        self._refresh_all()
+        self.canvas_2d.fit_to_view()
+        level = self.project.active_level
+        self.status_label.setText(f"Этаж: {level.name}  •  Отметка {level.elevation / 1000:+.3f} м")
+
+    def _add_level(self):
+        """Добавить этаж над самым верхним"""
+        count = sum(1 for _ in self.project.levels())
+        name, ok = QInputDialog.getText(self, "Новый этаж", "Название:", text=f"{count + 1} этаж")
+        if not ok or not name.strip():
+            return
+        building = next(b for b, l in self.project.levels() if l.id == self.project.active_level_id)
+        elevation = max(level.elevation for level in building.levels) + 3000
+        level = self.project.add_level(name.strip(), elevation, building)
+        self._on_level_selected(level.id)
+
+    def _remove_level(self):
+        """Удалить активный этаж"""
+        others = [l for _, l in self.project.levels() if l.id != self.project.active_level_id]
+        if not others:
+            QMessageBox.warning(self, "Этаж", "В проекте должен остаться хотя бы один этаж.")
+            return
+        level = self.project.active_level
+        reply = QMessageBox.question(
+            self, "Удалить этаж",
+            f"Удалить этаж «{level.name}» со всеми комнатами?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        self._on_level_selected(others[0].id)
+        if self.project.active_level_id == level.id:
+            return
+        self.project.remove_level(level.id)
+        self._histories.pop(level.id, None)
+        self._refresh_all()
+
+    def _unload_levels(self):
+        """Выгрузить из памяти сохранённые неактивные этажи"""
+        unloaded = skipped = 0
+        for _, level in self.project.levels():
+            if level.id == self.project.active_level_id or not level.loaded:
+                continue
+            try:
+                self.project.unload_level(level.id)
+                self._histories.pop(level.id, None)
+                unloaded += 1
+            except ValueError:
+                skipped += 1
+        self._update_levels()
+        status = f"Выгружено этажей: {unloaded}"
+        if skipped:
+            status += f"  •  Не сохранены: {skipped}"
+        self.status_label.setText(status)
+
     def _on_room_selected(self, room_id: str):
         """Выбрана комната"""
         self.properties_panel.select_room(room_id)
@@ -326,6 +506,24 @@ class MainWindow(QMainWindow):
         """Проект изменён"""
         self._refresh_all()
 
+    def _on_ai_furniture_placed(self, room_id: str, item):
+        """Предмет от AI: вся расстановка одной генерации - один шаг отмены"""
+        if self._ai_history is None:
+            self._ai_history = self.history
+            self._ai_history.begin("Расстановка мебели AI")
+            # Новая генерация заменяет предметы прошлой, а не добавляет к ним
+            for item_id in self._ai_furniture.pop(room_id, ()):
+                if self.project.furniture.get_by_id(item_id) is not None:
+                    self._ai_history.execute(RemoveFurnitureCommand(item_id), self.project)
+        self._ai_history.execute(AddFurnitureCommand(item), self.project)
+        self._ai_furniture.setdefault(room_id, []).append(item.id)
+
+    def _on_ai_design_finished(self):
+        """Генерация завершена - шаг отмены с её мебелью закрывается"""
+        if self._ai_history is not None:
+            self._ai_history.end()
+            self._ai_history = None
+
     def _new_project(self):
         """Новый проект"""
         reply = QMessageBox.question(
@@ -336,6 +534,7 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.project = Project(name="Новый проект")
+            self._reset_history()
             self._refresh_all()
             self.status_label.setText("Создан новый проект")
 
@@ -349,11 +548,51 @@ class MainWindow(QMainWindow):
         if file_path:
             try:
                 self.project = Project.load(file_path)
+                self._reset_history()
                 self._refresh_all()
-                self.status_label.setText(f"Открыт: {self.project.name}")
+                status = f"Открыт: {self.project.name}"
+                issues = len(self.canvas_2d.plan_issues)
+                if issues:
+                    status += f"  •  Проблем в плане: {issues}"
+                self.status_label.setText(status)
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось открыть:\n{e}")
 
+    def _merge_project(self):
+        """Трёхстороннее слияние с копией проекта, изменённой другим дизайнером"""
+        base_path, _ = QFileDialog.getOpenFileName(
+            self, "Исходная версия (общая для обеих копий)", "",
+            "DizainAI проекты (*.dizain);;Все файлы (*)"
+        )
+        if not base_path:
+            return
+        theirs_path, _ = QFileDialog.getOpenFileName(
+            self, "Изменённая копия", "",
+            "DizainAI проекты (*.dizain);;Все файлы (*)"
+        )
+        if not theirs_path:
+            return
+
+        try:
+            result = merge_projects(Project.load(base_path), self.project, Project.load(theirs_path))
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось объединить:\n{e}")
+            return
+
+        self.project = result.project
+        self._reset_history()
+        self._refresh_all()
+
+        if result.has_conflicts:
+            details = "\n".join(c.describe() for c in result.conflicts[:20])
+            if len(result.conflicts) > 20:
+                details += f"\n... и ещё {len(result.conflicts) - 20}"
+            QMessageBox.warning(
+                self, "Конфликты слияния",
+                f"Оставлены наши значения для {len(result.conflicts)} конфликтов:\n\n{details}"
+            )
+        self.status_label.setText(f"Объединено с {theirs_path}  •  Конфликтов: {len(result.conflicts)}")
+
     def _save_project(self):
         """Сохранить проект"""
         if self.project.file_path:
@@ -409,13 +648,44 @@ class MainWindow(QMainWindow):
             if ProjectExporter.to_csv_materials(self.project, file_path):
                 self.status_label.setText(f"Экспортировано: {file_path}")
 
+    def _export_ai_metrics(self):
+        """Экспорт метрик запросов к AI"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Экспорт метрик AI",
+            "ai_metrics.jsonl",
+            "JSON Lines (*.jsonl)"
+        )
+
+        if file_path:
+            try:
+                count = self.ai_panel.metrics.export_jsonl(file_path)
+                self.status_label.setText(f"Экспортировано записей: {count}")
+            except OSError as e:
+                QMessageBox.critical(self, "Ошибка", f"Ошибка экспорта:\n{e}")
+
+    def _on_ai_metrics(self, summary: dict):
+        """Сводка запросов к AI в строке состояния"""
+        totals = self.ai_panel.metrics.project_totals(self.project.id)
+        tokens = totals.prompt_tokens + totals.completion_tokens
+        self.ai_metrics_label.setText(
+            f"AI: {summary['requests']} запр.  •  p95 {summary['latency_p95']:.1f} с  •  "
+            f"проект: {tokens / 1000:.1f}k ток., ${totals.cost:.3f}"
+        )
+        self.ai_metrics_label.setToolTip(
+            f"Последние {summary['requests']} запросов: ошибок {summary['errors']}, "
+            f"из кэша {summary['cache_hits']}, повторов {summary['retries']}\n"
+            f"Задержка p50 {summary['latency_p50']:.1f} с, "
+            f"первый токен p50 {summary['first_token_p50']:.1f} с\n"
+            f"Стоимость окна: ${summary['cost']:.3f}"
+        )
+
     def _add_room(self):
         """Добавление комнаты через диалог"""
         dialog = RoomDialog(self)
         if dialog.exec_():
             room = dialog.get_room()
             if room:
-                self.project.add_room(room)
+                self.history.execute(AddRoomCommand(room), self.project)
                 self._refresh_all()
                 self.status_label.setText(f"Добавлена комната: {room.name}")
 
@@ -5,14 +5,25 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QComboBox, QTextEdit, QPushButton, QGroupBox,
-    QLineEdit, QProgressBar, QMessageBox, QFrame
+    QLineEdit, QProgressBar, QMessageBox, QFrame, QCheckBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+import asyncio
+import queue
+import threading
+import time
+from typing import Optional
 
 from config.settings import Settings
 from core.project import Project
-from ai.gpt_client import GPTClient
-from ai.design_generator import DesignGenerator
+from ai.gpt_client import GPTClient, ConnectionSettings, RetryPolicy
+from ai.async_client import AsyncGPTClient
+from ai.response_cache import ResponseCache
+from ai.metrics import MetricsRecorder
+from ai.design_generator import DesignGenerator, placement_to_furniture
+from ai.conversation import ConversationMemory
+from ui.async_bridge import run_async
 
 
 class AIWorker(QThread):
@@ -20,6 +31,8 @@ class AIWorker(QThread):
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
     progress = pyqtSignal(str)
+    token = pyqtSignal(str)  # фрагмент потокового ответа
+    placement = pyqtSignal(dict)  # позиция мебели (normalize_placement)
 
     def __init__(self, generator, room, style, preferences):
         super().__init__()
@@ -35,7 +48,9 @@ class AIWorker(QThread):
                 self.room,
                 self.style,
                 self.preferences,
-                callback=lambda msg: self.progress.emit(msg)
+                callback=lambda msg: self.progress.emit(msg),
+                on_token=self.token.emit,
+                on_placement=self.placement.emit
             )
 
             if result:
@@ -47,9 +62,172 @@ class AIWorker(QThread):
             self.error.emit(str(e))
 
 
+class BatchAIWorker(QThread):
+    """Фоновый поток для генерации дизайна всех комнат проекта"""
+    room_finished = pyqtSignal(str, str)  # название комнаты, текст
+    room_failed = pyqtSignal(str, str)  # название комнаты, ошибка
+    progress = pyqtSignal(int, int)  # готово, всего
+
+    MAX_CONCURRENCY = 3
+
+    def __init__(self, generator, rooms, style, preferences):
+        super().__init__()
+        self.generator = generator
+        self.rooms = rooms
+        self.style = style
+        self.preferences = preferences
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Отменить оставшиеся комнаты"""
+        self.cancel_event.set()
+
+    def run(self):
+        done = 0
+        total = len(self.rooms)
+        self.progress.emit(done, total)
+
+        for result in self.generator.generate_designs(
+            self.rooms,
+            self.style,
+            self.preferences,
+            max_concurrency=self.MAX_CONCURRENCY,
+            cancel_event=self.cancel_event
+        ):
+            done += 1
+            if result.success:
+                text = result.suggestion.description
+                if result.offline:
+                    text = f"(локальный вариант: AI недоступен)\n\n{text}"
+                self.room_finished.emit(result.room_name, text)
+            else:
+                self.room_failed.emit(result.room_name, result.error)
+            self.progress.emit(done, total)
+
+
+class ChatSession(QObject):
+    """
+    Чат с очередью сообщений поверх AsyncGPTClient
+
+    Очередь разбирает одна корутина в цикле AsyncRuntime (run_async),
+    отдельный поток на чат не нужен. Сообщения обрабатываются по порядку;
+    новое сообщение отменяет задачу текущего ответа, а сообщения, которые
+    успели устареть в очереди, попадают в память без отдельного запроса.
+    После ответа ранние реплики сжимаются в сводку до следующего сообщения.
+    Корутина завершается, когда очередь пуста, и запускается следующим
+    сообщением. Сигналы отправляются из потока цикла и приходят в GUI-поток
+    по очереди, в порядке отправки.
+    """
+    reply_started = pyqtSignal(str)  # сообщение, на которое начат ответ
+    token = pyqtSignal(str)  # фрагмент потокового ответа
+    reply_finished = pyqtSignal(str)  # полный ответ
+    reply_cancelled = pyqtSignal(str)  # полученная часть ответа
+    memory_changed = pyqtSignal()  # память диалога обновлена (можно сохранить в проект)
+
+    def __init__(self, generator, memory: Optional[ConversationMemory] = None, parent=None):
+        super().__init__(parent)
+        self.generator = generator
+        self.memory = memory or ConversationMemory()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._reply: Optional[asyncio.Task] = None  # задача текущего ответа
+        self._idle = True
+
+    def submit(self, message: str, project: Project, room_id: Optional[str] = None):
+        """Поставить сообщение в очередь (текущий ответ прерывается)"""
+        with self._lock:
+            self._cancel_reply()
+            self._queue.put((message, project, room_id))
+            if self._idle:
+                self._idle = False
+                run_async(self._process(), self)
+
+    def cancel_current(self):
+        """Прервать текущий ответ"""
+        with self._lock:
+            self._cancel_reply()
+
+    def is_busy(self) -> bool:
+        return not self._idle
+
+    def _cancel_reply(self):
+        # Задача принадлежит циклу AsyncRuntime - отменяем из его потока
+        reply = self._reply
+        if reply is not None:
+            reply.get_loop().call_soon_threadsafe(reply.cancel)
+
+    async def _process(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._queue.empty():
+                        self._idle = True
+                        return
+                    message, project, room_id = self._queue.get()
+                    # Память фиксируется на время ответа: смена проекта её не затронет
+                    memory = self.memory
+                    if not self._queue.empty():
+                        # За этим сообщением уже есть новое - отвечаем сразу на него
+                        memory.add("user", message)
+                        continue
+
+                    parts = []
+
+                    def on_token(delta: str):
+                        parts.append(delta)
+                        self.token.emit(delta)
+
+                    # Задача создаётся под замком: submit её сразу и отменит
+                    self._reply = reply = asyncio.ensure_future(self.generator.chat_async(
+                        message, project,
+                        on_token=on_token,
+                        history=memory.context_messages(),
+                        selected_room_id=room_id
+                    ))
+
+                self.reply_started.emit(message)
+                # wait не пробрасывает отмену ответа - она обрабатывается ниже
+                await asyncio.wait({reply})
+                with self._lock:
+                    self._reply = None
+
+                memory.add("user", message)
+                if reply.cancelled():
+                    partial = "".join(parts)
+                    memory.add("assistant", partial)
+                    self.reply_cancelled.emit(partial)
+                else:
+                    try:
+                        text = reply.result()
+                    except Exception as e:
+                        text = f"Ошибка: {e}"
+                    if not text.startswith("Ошибка:"):
+                        memory.add("assistant", text)
+                    self.reply_finished.emit(text)
+
+                if memory.needs_compaction():
+                    overflow = memory.take_overflow()
+                    memory.set_summary(
+                        await self.generator.summarize_conversation_async(memory.summary, overflow)
+                    )
+                self.memory_changed.emit()
+        finally:
+            # Остановка цикла (выход из программы) - ответ и очередь бросаются
+            with self._lock:
+                if self._reply is not None:
+                    self._reply.cancel()
+                    self._reply = None
+                self._idle = True
+
+
 class AIPanel(QWidget):
     """Панель AI дизайнера"""
 
+    project_changed = pyqtSignal()  # AI добавил мебель в проект
+    furniture_placed = pyqtSignal(str, object)  # id комнаты, FurnitureItem (добавляет MainWindow)
+    design_finished = pyqtSignal()  # генерация комнаты завершена (конец шага отмены)
+    metrics_updated = pyqtSignal(dict)  # сводка MetricsRecorder.summary()
+
     STYLES = {
         "scandinavian": "🇸🇪  Скандинавский",
         "minimalist": "⬜  Минимализм",
@@ -61,13 +239,35 @@ class AIPanel(QWidget):
         "industrial": "⚙️  Индустриальный"
     }
 
+    # Период пакетной вставки потоковых фрагментов в текст (мс)
+    STREAM_FLUSH_INTERVAL = 50
+
     def __init__(self, settings: Settings, project: Project, parent=None):
         super().__init__(parent)
         self.settings = settings
         self.project = project
         self.gpt_client = None
+        self.async_client = None  # чат; повторы, метрики и автомат защиты - общие с gpt_client
         self.generator = None
+        # Без API ключа дизайн строится локально (OfflineDesigner)
+        self.local_generator = DesignGenerator(GPTClient(""))
         self.worker = None
+        self.batch_worker = None
+        self.chat_session = None
+        self.metrics = self._create_metrics()
+
+        # Потоковый вывод: фрагменты копятся и вставляются раз в STREAM_FLUSH_INTERVAL
+        self._stream_buffer = []
+        self._stream_started = False
+        self._stream_owner = None  # "design" / "chat" - чьи фрагменты выводятся
+        self._placed_count = 0
+        self._first_placement_latency = 0.0
+        self._design_room_id = None
+        self._furniture_dirty = False  # project_changed отправляется вместе с выводом текста
+        self._request_started_at = 0.0
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.STREAM_FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self._flush_stream)
 
         self._setup_ui()
         self._init_ai()
@@ -130,6 +330,10 @@ class AIPanel(QWidget):
         self.preferences_edit.setPlaceholderText("Например: бюджетный вариант, для семьи с детьми...")
         gen_layout.addWidget(self.preferences_edit)
 
+        self.apply_furniture_check = QCheckBox("Расставить предложенную мебель на плане")
+        self.apply_furniture_check.setChecked(True)
+        gen_layout.addWidget(self.apply_furniture_check)
+
         # Кнопка генерации
         self.generate_btn = QPushButton("✨  Сгенерировать дизайн")
         self.generate_btn.setMinimumHeight(50)
@@ -146,6 +350,10 @@ class AIPanel(QWidget):
         self.generate_btn.clicked.connect(self._generate_design)
         gen_layout.addWidget(self.generate_btn)
 
+        self.generate_all_btn = QPushButton("🏢  Все комнаты проекта")
+        self.generate_all_btn.clicked.connect(self._toggle_generate_all)
+        gen_layout.addWidget(self.generate_all_btn)
+
         # Прогресс
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -186,9 +394,9 @@ class AIPanel(QWidget):
         self.chat_input.returnPressed.connect(self._send_chat)
         chat_input_layout.addWidget(self.chat_input, 1)
 
-        send_btn = QPushButton("📤 Отправить")
-        send_btn.clicked.connect(self._send_chat)
-        chat_input_layout.addWidget(send_btn)
+        self.send_btn = QPushButton("📤 Отправить")
+        self.send_btn.clicked.connect(self._send_chat)
+        chat_input_layout.addWidget(self.send_btn)
 
         chat_layout.addLayout(chat_input_layout)
         layout.addWidget(chat_group)
@@ -200,41 +408,113 @@ class AIPanel(QWidget):
         api_key = self.settings.api_key
 
         if api_key:
-            self.gpt_client = GPTClient(api_key, self.settings.get("gpt_model", "gpt-4o"))
-            self.generator = DesignGenerator(self.gpt_client)
+            model = self.settings.get("gpt_model", "gpt-4o")
+            if self.gpt_client is None:
+                connection = ConnectionSettings(
+                    timeout=self.settings.get("gpt_timeout", 60),
+                    max_concurrent_requests=self.settings.get("gpt_max_concurrent_requests", 4)
+                )
+                hedge = self.settings.get("gpt_hedge_percentile", 0)
+                retry = RetryPolicy(
+                    max_retries=self.settings.get("gpt_max_retries", 3),
+                    hedge_percentile=hedge or None
+                )
+                self.gpt_client = GPTClient(
+                    api_key, model, connection, self._create_cache(), self.metrics, retry
+                )
+                self.gpt_client.project_id = self.project.id
+                self.async_client = AsyncGPTClient.from_client(self.gpt_client)
+                self.generator = DesignGenerator(self.gpt_client, self.async_client)
+                self._create_chat_session()
+            else:
+                # Пул соединений сохраняется при смене ключа/модели
+                for client in (self.gpt_client, self.async_client):
+                    client.set_api_key(api_key)
+                    client.model = model
             self.status_icon.setText("✅")
             self.status_label.setText("AI подключен и готов к работе")
             self.status_label.setStyleSheet("color: #10b981; font-weight: bold;")
-            self.generate_btn.setEnabled(True)
         else:
             self.status_icon.setText("⚠️")
             self.status_label.setText(
-                "API ключ не настроен\n"
-                "Перейдите: Настройки → Параметры → AI"
+                "API ключ не настроен - дизайн подбирается локально\n"
+                "Для AI: Настройки → Параметры → AI"
             )
             self.status_label.setStyleSheet("color: #f59e0b;")
-            self.generate_btn.setEnabled(False)
+        # Смена настроек во время генерации не должна разблокировать кнопки
+        self._update_generate_buttons()
+
+    def _create_cache(self):
+        """Кэш ответов на диске (None, если отключён в настройках)"""
+        if not self.settings.get("response_cache_enabled", True):
+            return None
+        try:
+            return ResponseCache(
+                ttl=self.settings.get("response_cache_ttl_days", 7) * 24 * 3600,
+                max_bytes=self.settings.get("response_cache_max_mb", 50) * 1024 * 1024
+            )
+        except Exception:
+            # Кэш - оптимизация: без доступа к диску работаем без него
+            return None
+
+    def _create_metrics(self) -> MetricsRecorder:
+        """Метрики запросов; сводка уходит в строку состояния через metrics_updated"""
+        export_path = None
+        if self.settings.get("ai_metrics_log", True):
+            export_path = self.settings.config_dir / "ai_metrics.jsonl"
+        metrics = MetricsRecorder(export_path=export_path)
+        # Вызывается из рабочих потоков - сигнал доставит сводку в GUI-поток
+        metrics.add_listener(self.metrics_updated.emit)
+        return metrics
+
+    def _create_chat_session(self):
+        """Асинхронный чат (создаётся вместе с генератором)"""
+        self.chat_session = ChatSession(
+            self.generator, ConversationMemory.from_dict(self.project.ai_conversation), self
+        )
+        self.chat_session.memory_changed.connect(self._on_chat_memory_changed)
+        self.chat_session.reply_started.connect(self._on_chat_reply_started)
+        self.chat_session.token.connect(self._on_chat_token)
+        self.chat_session.reply_finished.connect(self._on_chat_reply_finished)
+        self.chat_session.reply_cancelled.connect(self._on_chat_reply_cancelled)
 
     def update_project(self, project: Project):
         """Обновить проект"""
+        if project is not self.project:
+            # Другой проект - продолжаем его собственный разговор
+            self._cancel_chat()
+            if self.chat_session:
+                self.chat_session.memory = ConversationMemory.from_dict(project.ai_conversation)
+            if self.gpt_client:
+                self.gpt_client.project_id = project.id
+                self.async_client.project_id = project.id
         self.project = project
         self._update_room_combo()
 
+    def refresh_rooms(self, room_ids):
+        """Обновить изменённые комнаты (после отмены и повтора)"""
+        for room_id in room_ids:
+            room = self.project.get_room_by_id(room_id)
+            index = self.room_combo.findData(room_id)
+            if (room is None) != (index < 0):
+                self._update_room_combo()
+                return
+            if room is not None:
+                self.room_combo.setItemText(index, f"🏠  {room.name}")
+
     def _update_room_combo(self):
-        """Обновить список комнат"""
+        """Обновить список комнат (выбранная комната сохраняется)"""
+        current = self.room_combo.currentData()
         self.room_combo.clear()
         for room in self.project.rooms:
             self.room_combo.addItem(f"🏠  {room.name}", room.id)
 
+        index = self.room_combo.findData(current)
+        if index >= 0:
+            self.room_combo.setCurrentIndex(index)
+
     def _generate_design(self):
         """Запустить генерацию дизайна"""
-        if not self.generator:
-            QMessageBox.warning(
-                self, "AI не настроен",
-                "Укажите API ключ OpenAI в настройках."
-            )
-            return
-
         if self.room_combo.count() == 0:
             QMessageBox.warning(
                 self, "Нет комнат",
@@ -243,7 +523,8 @@ class AIPanel(QWidget):
             return
 
         room_id = self.room_combo.currentData()
-        room = self.project.get_room_by_id(room_id)
+        # Фоновый поток работает со снимком: правки плана во время генерации его не меняют
+        room = self.project.snapshot().get_room_by_id(room_id)
 
         if not room:
             return
@@ -253,43 +534,229 @@ class AIPanel(QWidget):
         preferences = self.preferences_edit.text()
 
         # UI состояние загрузки
-        self.generate_btn.setEnabled(False)
+        self._cancel_chat()
+        self._set_chat_enabled(False)
         self.generate_btn.setText("⏳ Генерация...")
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)
         self.progress_label.setVisible(True)
-        self.result_text.setText("🎨 Генерация дизайна...")
+        self._begin_stream("design")
+        self._placed_count = 0
+        self._design_room_id = room_id
+
+        generator = self.generator or self.local_generator
+        if self.generator:
+            # Мгновенный локальный черновик, пока GPT готовит ответ
+            draft = generator.offline.design(room, style, preferences, layout=False)
+            self.result_text.setText(f"🎨 Генерация дизайна... Пока - черновик:\n\n{draft.description}")
+        else:
+            self.result_text.setText("🎨 Локальный подбор дизайна...")
 
         # Запускаем в фоне
-        self.worker = AIWorker(self.generator, room, style, preferences)
+        self.worker = AIWorker(generator, room, style, preferences)
         self.worker.finished.connect(self._on_generation_finished)
         self.worker.error.connect(self._on_generation_error)
         self.worker.progress.connect(self._on_generation_progress)
+        self.worker.token.connect(self._on_design_token)
+        if self.apply_furniture_check.isChecked():
+            self.worker.placement.connect(self._on_design_placement)
         self.worker.start()
+        self._update_generate_buttons()
+
+    def _begin_stream(self, owner: str):
+        """Подготовка к приёму потокового ответа"""
+        self._flush_stream()
+        self._stream_owner = owner
+        self._stream_started = False
+        self._request_started_at = time.monotonic()
+
+    def _end_stream(self):
+        """Вывести остаток буфера и перестать принимать фрагменты"""
+        self._flush_stream()
+        self._flush_timer.stop()
+        self._stream_owner = None
+
+    def _on_design_token(self, delta: str):
+        """Фрагмент дизайн-концепции: первый заменяет заглушку"""
+        if self._stream_owner != "design":
+            return
+        if not self._stream_started:
+            self.result_text.clear()
+            # Описание идёт в ответе последним: до него на плане уже видна мебель
+            latency = time.monotonic() - self._request_started_at
+            text = f"Описание пошло через {latency:.1f} с"
+            if self._placed_count:
+                text = f"{self._placed_text()}  •  {text}"
+            self.progress_label.setText(text)
+        self._append_token(delta)
+
+    def _on_design_placement(self, placement: dict):
+        """Позиция мебели пришла до окончания ответа - сразу ставим на план"""
+        self.furniture_placed.emit(self._design_room_id, placement_to_furniture(placement))
+        if self._placed_count == 0:
+            # Мебель - первое, что видно из ответа
+            self._first_placement_latency = time.monotonic() - self._request_started_at
+        self._placed_count += 1
+        if not self._stream_started:
+            self.progress_label.setText(self._placed_text())
+
+        # Обновление плана - не чаще вывода текста
+        self._furniture_dirty = True
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _placed_text(self) -> str:
+        """Сколько предметов расставлено и когда пришёл первый"""
+        return (f"Расставлено предметов: {self._placed_count} "
+                f"(первый через {self._first_placement_latency:.1f} с)")
+
+    def _append_token(self, delta: str):
+        """Фрагмент потокового ответа - в буфер, вставка по таймеру"""
+        self._stream_started = True
+        self._stream_buffer.append(delta)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_stream(self):
+        """Вставить накопленные фрагменты одним изменением документа"""
+        if self._furniture_dirty:
+            self._furniture_dirty = False
+            self.project_changed.emit()
+
+        if not self._stream_buffer:
+            self._flush_timer.stop()
+            return
+
+        text = "".join(self._stream_buffer)
+        self._stream_buffer = []
+        self._insert_text(text)
+
+    def _insert_text(self, text: str):
+        """Дописать текст в конец результата без нового абзаца"""
+        cursor = self.result_text.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.result_text.ensureCursorVisible()
 
     def _on_generation_finished(self, result: str):
         """Генерация завершена"""
-        self.result_text.setText(result)
-        self._reset_ui()
+        streamed = self._stream_started
+        # Текст уже выведен потоком - дописываем остаток буфера
+        self._end_stream()
+        if not streamed:
+            self.result_text.setText(result)
+        self.design_finished.emit()
+        self._reset_ui(self.worker)
 
     def _on_generation_error(self, error: str):
         """Ошибка генерации"""
+        self._end_stream()
         self.result_text.setText(f"❌ Ошибка: {error}")
-        self._reset_ui()
+        self.design_finished.emit()
+        self._reset_ui(self.worker)
 
     def _on_generation_progress(self, message: str):
         """Прогресс генерации"""
         self.progress_label.setText(message)
 
-    def _reset_ui(self):
-        """Сбросить UI после генерации"""
-        self.generate_btn.setEnabled(True)
-        self.generate_btn.setText("✨  Сгенерировать дизайн")
+    def _reset_ui(self, finished: Optional[QThread] = None):
+        """Сбросить UI после генерации (finished - только что завершённый поток)"""
+        self._update_generate_buttons(finished)
+        if self._design_running(finished):
+            return
         self.progress_bar.setVisible(False)
         self.progress_label.setVisible(False)
+        self._set_chat_enabled(True)
+
+    def _update_generate_buttons(self, finished: Optional[QThread] = None):
+        """Пока идёт любая генерация, новую запустить нельзя"""
+        single = self._worker_running(self.worker, finished)
+        batch = self._worker_running(self.batch_worker, finished)
+        self.generate_btn.setEnabled(not single and not batch)
+        if not single:
+            self.generate_btn.setText("✨  Сгенерировать дизайн")
+        if batch:
+            # Во время пакетной генерации кнопка останавливает её
+            self.generate_all_btn.setEnabled(not self.batch_worker.cancel_event.is_set())
+        else:
+            self.generate_all_btn.setEnabled(not single)
+            self.generate_all_btn.setText("🏢  Все комнаты проекта")
+
+    def _toggle_generate_all(self):
+        """Запустить (или отменить) генерацию для всех комнат"""
+        if self.batch_worker and self.batch_worker.isRunning():
+            self.batch_worker.cancel()
+            self.generate_all_btn.setEnabled(False)
+            self.generate_all_btn.setText("⏳ Отмена...")
+            return
+
+        if not self.project.rooms:
+            QMessageBox.warning(
+                self, "Нет комнат",
+                "Сначала добавьте комнату в проект."
+            )
+            return
+
+        style_key = self.style_combo.currentData()
+        style = self.STYLES.get(style_key, style_key)
+
+        self._cancel_chat()
+        self._set_chat_enabled(False)
+        self.generate_all_btn.setText("⏹  Остановить")
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, len(self.project.rooms))
+        self.progress_bar.setValue(0)
+        self.result_text.clear()
+
+        self.batch_worker = BatchAIWorker(
+            self.generator or self.local_generator, self.project.snapshot().rooms, style,
+            self.preferences_edit.text()
+        )
+        self.batch_worker.room_finished.connect(self._on_batch_room_finished)
+        self.batch_worker.room_failed.connect(self._on_batch_room_failed)
+        self.batch_worker.progress.connect(self._on_batch_progress)
+        self.batch_worker.finished.connect(self._on_batch_finished)
+        self.batch_worker.start()
+        self._update_generate_buttons()
+
+    def _on_batch_room_finished(self, room_name: str, text: str):
+        """Готов дизайн одной комнаты"""
+        self.result_text.append(f"\n\n🏠 **{room_name}**\n\n{text}")
+
+    def _on_batch_room_failed(self, room_name: str, error: str):
+        """Ошибка для одной комнаты"""
+        self.result_text.append(f"\n\n🏠 **{room_name}**: ❌ {error}")
+
+    def _on_batch_progress(self, done: int, total: int):
+        """Прогресс пакетной генерации"""
+        self.progress_bar.setValue(done)
+
+    def _on_batch_finished(self):
+        """Пакетная генерация завершена"""
+        self._reset_ui(self.batch_worker)
+
+    def _design_running(self, finished: Optional[QThread] = None) -> bool:
+        return any(self._worker_running(w, finished) for w in (self.worker, self.batch_worker))
+
+    @staticmethod
+    def _worker_running(worker: Optional[QThread], finished: Optional[QThread] = None) -> bool:
+        # Сигнал о завершении приходит, пока run() ещё не вернулся
+        return worker is not None and worker is not finished and worker.isRunning()
+
+    def _set_chat_enabled(self, enabled: bool):
+        """Чат недоступен, пока результат занят генерацией дизайна"""
+        self.chat_input.setEnabled(enabled)
+        self.send_btn.setEnabled(enabled)
+
+    def _cancel_chat(self):
+        """Прервать текущий ответ чата и перестать выводить его фрагменты"""
+        if self.chat_session and self.chat_session.is_busy():
+            self.chat_session.cancel_current()
+        if self._stream_owner == "chat":
+            self._end_stream()
 
     def _send_chat(self):
-        """Отправить сообщение в чат"""
+        """Отправить сообщение в чат (ответ приходит из цикла AsyncRuntime)"""
         message = self.chat_input.text().strip()
         if not message:
             return
@@ -299,7 +766,41 @@ class AIPanel(QWidget):
             return
 
         self.chat_input.clear()
+        if self._stream_owner == "chat":
+            # Предыдущий ответ прерывается новым сообщением
+            self._end_stream()
+            self._insert_text(" … (прервано)")
         self.result_text.append(f"\n\n👤 **Вы:** {message}")
+        self.chat_session.submit(message, self.project.snapshot(), self.room_combo.currentData())
 
-        response = self.generator.chat(message, self.project)
-        self.result_text.append(f"\n🤖 **AI:** {response}")
\ No newline at end of file
+    def _on_chat_reply_started(self, message: str):
+        """Начат ответ на сообщение"""
+        if self._design_running():
+            # Результат занят генерацией - ответ не выводим
+            self.chat_session.cancel_current()
+            return
+        self.result_text.append("\n🤖 **AI:** ")
+        self._begin_stream("chat")
+
+    def _on_chat_token(self, delta: str):
+        """Фрагмент ответа чата"""
+        if self._stream_owner == "chat":
+            self._append_token(delta)
+
+    def _on_chat_reply_finished(self, text: str):
+        """Ответ чата получен полностью"""
+        if self._stream_owner != "chat":
+            return
+        streamed = self._stream_started
+        self._end_stream()
+        if not streamed:
+            self._insert_text(text)
+
+    def _on_chat_memory_changed(self):
+        """Память диалога сохраняется вместе с проектом"""
+        self.project.ai_conversation = self.chat_session.memory.to_dict()
+
+    def _on_chat_reply_cancelled(self, partial: str):
+        """Ответ прерван новым сообщением"""
+        if self._stream_owner == "chat":
+            self._end_stream()
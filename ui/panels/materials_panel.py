@@ -18,9 +18,11 @@ from core.materials_calc import MaterialsCalculator
 class MaterialsPanel(QWidget):
     """Панель расчёта материалов"""
 
-    def __init__(self, project: Project, parent=None):
+    def __init__(self, project: Project, adjacency=None, parent=None):
         super().__init__(parent)
         self.project = project
+        # Анализ смежности комнат от Canvas2D (обновляется после каждой правки)
+        self.adjacency = adjacency
 
         self._setup_ui()
 
@@ -135,7 +137,7 @@ class MaterialsPanel(QWidget):
             )
             return
 
-        calc = MaterialsCalculator(self.project)
+        calc = MaterialsCalculator(self.project, self.adjacency)
 
         # Текстовый отчёт
         self.text_report.setText(calc.get_summary_text())
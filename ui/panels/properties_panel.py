@@ -9,9 +9,11 @@ from PyQt5.QtWidgets import (
     QFrame, QSizePolicy, QStackedWidget
 )
 from PyQt5.QtCore import Qt, pyqtSignal
+from typing import Optional
 
 from core.project import Project
 from core.room import Room
+from core.history import History, AddRoomCommand, RemoveRoomCommand, SetRoomAttributeCommand
 from ..icons import Icons
 from ..components import (
     Card, SectionHeader, PropertyRow, StatCard,
@@ -24,9 +26,10 @@ class PropertiesPanel(QWidget):
 
     project_changed = pyqtSignal()
 
-    def __init__(self, project: Project, parent=None):
+    def __init__(self, project: Project, parent=None, history: Optional[History] = None):
         super().__init__(parent)
         self.project = project
+        self.history = history or History()
         self.current_room = None
 
         self._setup_ui()
@@ -254,6 +257,39 @@ class PropertiesPanel(QWidget):
         self.project = project
         self._update_display()
 
+    def refresh_rooms(self, room_ids):
+        """
+        Обновить изменённые комнаты (после отмены и повтора)
+
+        Строки остальных комнат не пересоздаются, выбранная комната
+        остаётся выбранной, пока она есть в проекте.
+        """
+        self.area_stat.set_value(f"{self.project.total_area:.1f} м²")
+        self.rooms_stat.set_value(str(len(self.project.rooms)))
+
+        items = {}
+        for i in range(self.rooms_list.count()):
+            item = self.rooms_list.item(i)
+            items[item.data(Qt.UserRole)] = item
+
+        if any((self.project.get_room_by_id(room_id) is None) != (room_id not in items)
+               for room_id in room_ids):
+            # Комната добавлена или удалена - список строится заново
+            self._fill_rooms_list()
+        else:
+            for room_id in room_ids:
+                room = self.project.get_room_by_id(room_id)
+                if room is not None:
+                    items[room_id].setText(f"{room.name}  •  {room.floor_area:.1f} м²")
+
+        if self.current_room:
+            self.current_room = self.project.get_room_by_id(self.current_room.id)
+            if self.current_room is None:
+                self.room_section.setVisible(False)
+                self.walls_section.setVisible(False)
+            elif self.current_room.id in room_ids:
+                self._update_room_display()
+
     def select_room(self, room_id: str):
         """Выбрать комнату по ID"""
         for i in range(self.rooms_list.count()):
@@ -264,6 +300,10 @@ class PropertiesPanel(QWidget):
 
     def _update_display(self):
         """Обновить отображение"""
+        if self.current_room:
+            # Правка после снимка заменяет объект комнаты копией (Project.edit_room)
+            self.current_room = self.project.get_room_by_id(self.current_room.id)
+
         # Проект
         self.project_name_row.set_value(self.project.name)
 
@@ -271,12 +311,8 @@ class PropertiesPanel(QWidget):
         self.area_stat.set_value(f"{self.project.total_area:.1f} м²")
         self.rooms_stat.set_value(str(len(self.project.rooms)))
 
-        # Список комнат
-        self.rooms_list.clear()
-        for room in self.project.rooms:
-            item = QListWidgetItem(f"{room.name}  •  {room.floor_area:.1f} м²")
-            item.setData(Qt.UserRole, room.id)
-            self.rooms_list.addItem(item)
+        # Список комнат (без сигналов: очистка списка не должна сбрасывать выбор)
+        self._fill_rooms_list()
 
         # Свойства комнаты
         if self.current_room:
@@ -287,6 +323,18 @@ class PropertiesPanel(QWidget):
             self.room_section.setVisible(False)
             self.walls_section.setVisible(False)
 
+    def _fill_rooms_list(self):
+        """Строки комнат; выбранная комната остаётся выбранной"""
+        self.rooms_list.blockSignals(True)
+        self.rooms_list.clear()
+        for room in self.project.rooms:
+            item = QListWidgetItem(f"{room.name}  •  {room.floor_area:.1f} м²")
+            item.setData(Qt.UserRole, room.id)
+            self.rooms_list.addItem(item)
+            if self.current_room and room.id == self.current_room.id:
+                self.rooms_list.setCurrentItem(item)
+        self.rooms_list.blockSignals(False)
+
     def _update_room_display(self):
         """Обновить отображение свойств комнаты"""
         room = self.current_room
@@ -344,16 +392,20 @@ class PropertiesPanel(QWidget):
     def _on_room_name_changed(self, name):
         """Изменено название комнаты"""
         if self.current_room:
-            self.current_room.name = name
+            # Ввод по буквам сливается в один шаг отмены
+            self.history.execute(
+                SetRoomAttributeCommand.capture(self.current_room, "name", name), self.project
+            )
             self._update_display()
             self.project_changed.emit()
 
     def _on_room_height_changed(self, value):
         """Изменена высота комнаты"""
         if self.current_room:
-            self.current_room.ceiling_height = value
-            for wall in self.current_room.walls:
-                wall.height = value
+            self.history.execute(
+                SetRoomAttributeCommand.capture(self.current_room, "ceiling_height", value),
+                self.project
+            )
             self.project_changed.emit()
 
     def _add_room_clicked(self):
@@ -363,7 +415,7 @@ class PropertiesPanel(QWidget):
         if dialog.exec_():
             room = dialog.get_room()
             if room:
-                self.project.add_room(room)
+                self.history.execute(AddRoomCommand(room), self.project)
                 self._update_display()
                 self.project_changed.emit()
 
@@ -377,7 +429,7 @@ class PropertiesPanel(QWidget):
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                self.project.remove_room(self.current_room.id)
+                self.history.execute(RemoveRoomCommand(self.current_room.id), self.project)
                 self.current_room = None
                 self._update_display()
                 self.project_changed.emit()
\ No newline at end of file
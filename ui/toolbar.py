@@ -4,8 +4,9 @@
 
 from PyQt5.QtWidgets import (
     QToolBar, QWidget, QHBoxLayout, QVBoxLayout,
-    QButtonGroup, QLabel, QFrame, QSizePolicy
+    QButtonGroup, QLabel, QFrame, QSizePolicy, QComboBox
 )
+from typing import List, Tuple
 from PyQt5.QtCore import Qt, pyqtSignal, QSize
 
 from .icons import Icons, ToolButton
@@ -167,6 +168,8 @@ class DrawingToolbar(QToolBar):
 class StatusToolbar(QWidget):
     """Панель статуса внизу канваса"""
 
+    level_selected = pyqtSignal(str)  # id этажа
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -176,6 +179,17 @@ class StatusToolbar(QWidget):
         layout.setContentsMargins(12, 0, 12, 0)
         layout.setSpacing(16)
 
+        # Активный этаж
+        self.level_combo = QComboBox()
+        self.level_combo.setToolTip("Активный этаж")
+        self.level_combo.setStyleSheet("font-size: 12px;")
+        self.level_combo.activated.connect(
+            lambda index: self.level_selected.emit(self.level_combo.itemData(index))
+        )
+        layout.addWidget(self.level_combo)
+
+        layout.addWidget(Separator("vertical"))
+
         # Режим
         self.mode_label = QLabel("Режим: Выбор")
         self.mode_label.setStyleSheet("color: #94a3b8; font-size: 12px;")
@@ -214,6 +228,16 @@ class StatusToolbar(QWidget):
         }
         self.mode_label.setText(f"Режим: {mode_names.get(mode, mode)}")
 
+    def set_levels(self, levels: List[Tuple[str, str]], active_id: str):
+        """Список этажей: (id, подпись)"""
+        self.level_combo.blockSignals(True)
+        self.level_combo.clear()
+        for level_id, label in levels:
+            self.level_combo.addItem(label, level_id)
+            if level_id == active_id:
+                self.level_combo.setCurrentIndex(self.level_combo.count() - 1)
+        self.level_combo.blockSignals(False)
+
     def set_coords(self, x: float, y: float):
         self.coords_label.setText(f"X: {x:.0f}  Y: {y:.0f}")
 
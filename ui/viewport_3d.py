@@ -5,7 +5,9 @@
 
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QComboBox, QHBoxLayout
 from PyQt5.QtCore import Qt, QPointF
-from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPolygonF
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPolygonF, QPainterPath, QTransform
+
+from typing import Dict, Tuple
 
 from core.project import Project
 from core.room import Room
@@ -24,9 +26,12 @@ class Viewport3D(QWidget):
     COLOR_WINDOW = QColor(135, 206, 250, 180)
     COLOR_DOOR = QColor(139, 90, 43)
 
-    def __init__(self, project: Project, parent=None):
+    def __init__(self, project: Project, adjacency=None, parent=None):
         super().__init__(parent)
         self.project = project
+        # Общие стены соседних комнат (utils.adjacency.PlanAdjacency от Canvas2D):
+        # проёмы перегородки, внесённые в соседнюю комнату, видны и здесь
+        self.adjacency = adjacency
 
         # Параметры проекции
         self.angle_x = 30  # Угол наклона (изометрия)
@@ -37,6 +42,11 @@ class Viewport3D(QWidget):
 
         self.selected_room_index = 0
 
+        # Пол комнаты в координатах от её центра: id -> (комната,
+        # geometry_version, центр, заливка по треугольникам, контур).
+        # Пол и потолок - один путь в разных плоскостях (_plane_transform)
+        self._floor_paths: Dict[str, Tuple[Room, int, Tuple[float, float], QPainterPath, QPainterPath]] = {}
+
         self._setup_ui()
 
     def _setup_ui(self):
@@ -73,14 +83,32 @@ class Viewport3D(QWidget):
         self._update_room_combo()
         self.update()
 
+    def refresh_rooms(self, room_ids):
+        """Обновить изменённые комнаты (после отмены и повтора)"""
+        for room_id in room_ids:
+            room = self.project.get_room_by_id(room_id)
+            index = self.room_combo.findData(room_id)
+            if (room is None) != (index < 0):
+                # Комната добавлена или удалена - список строится заново
+                self._update_room_combo()
+                break
+            if room is not None:
+                self.room_combo.setItemText(index, room.name)
+        self.update()
+
     def _update_room_combo(self):
-        """Обновить список комнат"""
+        """Обновить список комнат (выбранная комната сохраняется)"""
+        current = self.room_combo.currentData()
+        self.room_combo.blockSignals(True)
         self.room_combo.clear()
         for room in self.project.rooms:
             self.room_combo.addItem(room.name, room.id)
+        self.room_combo.blockSignals(False)
 
+        index = max(self.room_combo.findData(current), 0)
         if self.project.rooms:
-            self.room_combo.setCurrentIndex(0)
+            self.room_combo.setCurrentIndex(index)
+        self._on_room_changed(index)
 
     def _on_room_changed(self, index):
         """Смена комнаты"""
@@ -112,6 +140,54 @@ class Viewport3D(QWidget):
 
         return QPointF(screen_x, screen_y)
 
+    def _plane_transform(self, z: float) -> QTransform:
+        """Та же проекция, что _project_3d_to_2d, для плоскости на высоте z"""
+        rad_z = math.radians(self.angle_z)
+        k = math.cos(math.radians(self.angle_x)) * self.scale
+        return QTransform(
+            math.cos(rad_z) * self.scale, math.sin(rad_z) * k,
+            -math.sin(rad_z) * self.scale, math.cos(rad_z) * k,
+            self.width() / 2 + self.offset_x,
+            self.height() / 2 + self.offset_y + 100 - z * self.scale
+        )
+
+    def _floor_paths_for(self, room: Room):
+        """Центр, заливка и контур пола (перестраиваются только при touch)"""
+        cached = self._floor_paths.get(room.id)
+        if cached is not None and cached[0] is room and cached[1] == room.geometry_version:
+            return cached[2:]
+
+        mesh = room.mesh
+        cx, cy = mesh.centroid
+        vertices = [QPointF(x - cx, y - cy) for x, y in mesh.vertices]
+
+        fill = QPainterPath()
+        fill.setFillRule(Qt.WindingFill)
+        for a, b, c in mesh.triangles:
+            fill.addPolygon(QPolygonF([vertices[a], vertices[b], vertices[c]]))
+            fill.closeSubpath()
+
+        outline = QPainterPath()
+        for ring in mesh.polygon.rings():
+            outline.addPolygon(QPolygonF([QPointF(x - cx, y - cy) for x, y in ring]))
+            outline.closeSubpath()
+
+        if len(self._floor_paths) > len(self.project.rooms):
+            ids = {r.id for r in self.project.rooms}
+            self._floor_paths = {k: v for k, v in self._floor_paths.items() if k in ids}
+        self._floor_paths[room.id] = (room, room.geometry_version, (cx, cy), fill, outline)
+        return (cx, cy), fill, outline
+
+    def _draw_plane(self, painter: QPainter, fill: QPainterPath, outline: QPainterPath,
+                    z: float, color: QColor, pen: QPen):
+        """Пол или потолок: заливка по сетке и контур в плоскости z"""
+        pen.setCosmetic(True)
+        painter.save()
+        painter.setTransform(self._plane_transform(z))
+        painter.fillPath(fill, QBrush(color))
+        painter.strokePath(outline, pen)
+        painter.restore()
+
     def paintEvent(self, event):
         """Отрисовка"""
         painter = QPainter(self)
@@ -142,25 +218,12 @@ class Viewport3D(QWidget):
 
         height = room.ceiling_height
 
-        # Собираем точки пола
-        floor_points = []
-        for wall in room.walls:
-            floor_points.append((wall.start.x, wall.start.y, 0))
-
-        # Центрируем комнату
-        if floor_points:
-            cx = sum(p[0] for p in floor_points) / len(floor_points)
-            cy = sum(p[1] for p in floor_points) / len(floor_points)
-            floor_points = [(x - cx, y - cy, z) for x, y, z in floor_points]
+        # Комната центрируется по центру масс пола
+        (cx, cy), floor_fill, floor_outline = self._floor_paths_for(room)
 
         # 1. Пол
-        floor_polygon = QPolygonF()
-        for x, y, z in floor_points:
-            floor_polygon.append(self._project_3d_to_2d(x, y, z))
-
-        painter.setPen(QPen(self.COLOR_FLOOR.darker(), 2))
-        painter.setBrush(QBrush(self.COLOR_FLOOR))
-        painter.drawPolygon(floor_polygon)
+        self._draw_plane(painter, floor_fill, floor_outline, 0,
+                         self.COLOR_FLOOR, QPen(self.COLOR_FLOOR.darker(), 2))
 
         # 2. Стены (сортируем по удалённости для правильного перекрытия)
         walls_to_draw = []
@@ -209,29 +272,30 @@ class Viewport3D(QWidget):
             # Рисуем окна на стене
             wall_len = wall.length
             if wall_len > 0:
-                for window in wall.windows:
+                windows, doors = wall.windows, wall.doors
+                if self.adjacency is not None:
+                    # Проём перегородки рисуется один раз, с какой бы стороны его ни внесли
+                    windows = windows + self.adjacency.foreign_openings(self.project, wall, "windows")
+                    doors = doors + self.adjacency.foreign_openings(self.project, wall, "doors")
+
+                for window in windows:
                     self._draw_window_3d(
                         painter, wall, window,
                         x1, y1, x2, y2, cx, cy
                     )
 
                 # Рисуем двери
-                for door in wall.doors:
+                for door in doors:
                     self._draw_door_3d(
                         painter, wall, door,
                         x1, y1, x2, y2, cx, cy
                     )
 
-        # 3. Потолок (опционально, полупрозрачный)
-        ceiling_polygon = QPolygonF()
-        for x, y, _ in floor_points:
-            ceiling_polygon.append(self._project_3d_to_2d(x, y, height))
-
-        painter.setPen(QPen(self.COLOR_CEILING.darker(), 1))
+        # 3. Потолок (опционально, полупрозрачный) - та же сетка на высоте потолка
         ceiling_color = QColor(self.COLOR_CEILING)
         ceiling_color.setAlpha(100)
-        painter.setBrush(QBrush(ceiling_color))
-        painter.drawPolygon(ceiling_polygon)
+        self._draw_plane(painter, floor_fill, floor_outline, height,
+                         ceiling_color, QPen(self.COLOR_CEILING.darker(), 1))
 
     def _draw_window_3d(self, painter, wall, window, x1, y1, x2, y2, cx, cy):
         """Отрисовка окна в 3D"""
@@ -1,3 +1,6 @@
 """Утилиты"""
 from .geometry import GeometryUtils
-from .export import ProjectExporter
\ No newline at end of file
+from .export import ProjectExporter
+from .validation import PlanValidator, PlanIssue, IssueKind
+from .collision import CollisionDetector, Collision, ObstacleKind
+from .adjacency import PlanAdjacency, SharedSegment
@@ -0,0 +1,321 @@
+"""
+Смежность комнат: общие участки стен соседних комнат
+
+Стены соседних комнат, лежащие на одной линии, - это одна перегородка,
+видимая с двух сторон. Анализ находит такие участки (в том числе частичные:
+длинная стена коридора и короткие стены нескольких комнат), строит граф
+комнат и даёт чистую площадь стен с учётом проёмов, внесённых в соседнюю
+комнату, - дверь в перегородке вырезает обе её стороны, но считается
+одной дверью.
+"""
+
+import math
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.project import Project
+from core.room import Room, Wall
+from core.ids import ObjectId
+from .geometry import SpatialHash
+
+# Координаты стены: (x1, y1, x2, y2)
+Segment = Tuple[float, float, float, float]
+
+
+@dataclass
+class SharedSegment:
+    """Общий участок стен двух соседних комнат"""
+    room_ids: Tuple[str, str]
+    wall_ids: Tuple[ObjectId, ObjectId]
+    start: Tuple[float, float]  # Концы участка (мм), на первой стене
+    end: Tuple[float, float]
+
+    @property
+    def length(self) -> float:
+        return math.hypot(self.end[0] - self.start[0], self.end[1] - self.start[1])
+
+    def involves(self, room_id: str) -> bool:
+        return room_id in self.room_ids
+
+
+def _coords(wall: Wall) -> Segment:
+    return (wall.start.x, wall.start.y, wall.end.x, wall.end.y)
+
+
+def _bbox(seg: Segment, pad: float) -> Tuple[float, float, float, float]:
+    x1, y1, x2, y2 = seg
+    return (min(x1, x2) - pad, min(y1, y2) - pad, max(x1, x2) + pad, max(y1, y2) + pad)
+
+
+def _along(seg: Segment, x: float, y: float) -> float:
+    """Координата проекции точки вдоль стены (мм от начала)"""
+    x1, y1, x2, y2 = seg
+    length = math.hypot(x2 - x1, y2 - y1)
+    return ((x - x1) * (x2 - x1) + (y - y1) * (y2 - y1)) / length
+
+
+def _collinear_overlap(a: Segment, line: Tuple[float, float, float], b: Segment,
+                       tol: float) -> Optional[Tuple[float, float]]:
+    """
+    Участок стены a, совпадающий со стеной b: (от, до) в мм от начала a
+
+    line - направление и длина a. None - стены не на одной линии
+    (с допуском tol) или перекрытие не длиннее tol.
+    """
+    ax1, ay1 = a[0], a[1]
+    ux, uy, length = line
+    bx1, by1, bx2, by2 = b[0] - ax1, b[1] - ay1, b[2] - ax1, b[3] - ay1
+
+    # Оба конца b - на линии a
+    if abs(bx1 * uy - by1 * ux) > tol or abs(bx2 * uy - by2 * ux) > tol:
+        return None
+
+    t1 = bx1 * ux + by1 * uy
+    t2 = bx2 * ux + by2 * uy
+    lo = max(0.0, min(t1, t2))
+    hi = min(length, max(t1, t2))
+    if hi - lo <= tol:
+        return None
+    return lo, hi
+
+
+class PlanAdjacency:
+    """
+    Граф смежности комнат по общим участкам стен
+
+    Стены хранятся в пространственном хеше (как в PlanValidator), поэтому
+    полный анализ близок к линейному по числу стен, а после правки комнаты
+    update_room() перепроверяет только её стены.
+
+    Пример:
+        adjacency = PlanAdjacency()
+        adjacency.analyze(project)          # при загрузке
+        adjacency.update_room(project, id)  # после каждой правки комнаты
+        adjacency.room_graph()
+    """
+
+    MIN_CELL_SIZE = 500  # мм
+
+    def __init__(self, cell_size: Optional[float] = None, tolerance: float = 1.0):
+        """
+        Args:
+            cell_size: Размер ячейки хеша в мм (по умолчанию - половина средней длины
+                стены: стены по линиям сетки плана не попадают в лишние ячейки)
+            tolerance: Допуск в мм - отклонение от общей линии и минимальная длина участка
+        """
+        self.cell_size = cell_size
+        self.tolerance = tolerance
+        self._reset(cell_size or self.MIN_CELL_SIZE)
+
+    def _reset(self, cell_size: float):
+        self._grid = SpatialHash(cell_size)
+        self._next_key = 0
+        # Ключ в хеше -> (id комнаты, id стены, координаты при добавлении)
+        self._walls: Dict[int, Tuple[str, ObjectId, Segment]] = {}
+        # Ключ -> (направление x, направление y, длина) для быстрого отсева
+        self._lines: Dict[int, Tuple[float, float, float]] = {}
+        self._room_keys: Dict[str, List[int]] = {}
+        self._wall_keys: Dict[ObjectId, int] = {}
+        # (ключ, ключ) -> участок; ключ -> пары с его участием
+        self._segments: Dict[Tuple[int, int], SharedSegment] = {}
+        self._key_pairs: Dict[int, Set[Tuple[int, int]]] = {}
+
+    # === Построение ===
+
+    def analyze(self, project: Project) -> List[SharedSegment]:
+        """Полный анализ (при загрузке проекта)"""
+        rooms = project.rooms
+        walls = [wall for room in rooms for wall in room.walls]
+        cell_size = self.cell_size
+        if not cell_size:
+            mean_length = sum(w.length for w in walls) / len(walls) if walls else 0
+            cell_size = max(self.MIN_CELL_SIZE, mean_length / 2)
+        self._reset(cell_size)
+
+        for room in rooms:
+            self._insert_room(room)
+        for room in rooms:
+            self._match_room(room.id, skip_lower=True)
+        return self.segments
+
+    def update_room(self, project: Project, room_id: str) -> List[SharedSegment]:
+        """Перепроверить одну комнату после правки (или удалить, если её больше нет)"""
+        self.remove_room(room_id)
+        room = project.get_room_by_id(room_id)
+        if room is not None:
+            self._insert_room(room)
+            self._match_room(room_id, skip_lower=False)
+        return self.segments_of_room(room_id)
+
+    def remove_room(self, room_id: str):
+        """Убрать комнату из анализа"""
+        for key in self._room_keys.pop(room_id, []):
+            _, wall_id, seg = self._walls.pop(key)
+            del self._lines[key]
+            self._grid.remove(key, _bbox(seg, self.tolerance))
+            if self._wall_keys.get(wall_id) == key:
+                del self._wall_keys[wall_id]
+            for pair in self._key_pairs.pop(key, set()):
+                self._segments.pop(pair, None)
+                other = pair[1] if pair[0] == key else pair[0]
+                pairs = self._key_pairs.get(other)
+                if pairs:
+                    pairs.discard(pair)
+
+    def _insert_room(self, room: Room):
+        keys = []
+        for wall in room.walls:
+            key = self._next_key
+            self._next_key += 1
+            seg = _coords(wall)
+            length = wall.length
+            self._walls[key] = (room.id, wall.id, seg)
+            self._lines[key] = ((seg[2] - seg[0]) / length, (seg[3] - seg[1]) / length, length) \
+                if length else (0.0, 0.0, 0.0)
+            self._wall_keys[wall.id] = key
+            self._grid.insert(key, _bbox(seg, self.tolerance))
+            keys.append(key)
+        self._room_keys[room.id] = keys
+
+    def _match_room(self, room_id: str, skip_lower: bool):
+        """Найти общие участки стен комнаты со стенами других комнат"""
+        tol = self.tolerance
+        lines = self._lines
+        for key in self._room_keys.get(room_id, []):
+            _, wall_id, seg = self._walls[key]
+            ux, uy, length = lines[key]
+            if length <= tol:
+                continue
+            for other in self._grid.query(_bbox(seg, tol)):
+                other_room, other_wall, other_seg = self._walls[other]
+                if other_room == room_id or (skip_lower and other < key):
+                    continue
+                # Не параллельные стены (концы не могут лечь на линию в пределах tol)
+                vx, vy, other_length = lines[other]
+                if other_length <= tol or abs(ux * vy - uy * vx) * other_length > 2 * tol:
+                    continue
+
+                overlap = _collinear_overlap(seg, lines[key], other_seg, tol)
+                if overlap is None:
+                    continue
+
+                x1, y1 = seg[0], seg[1]
+                lo, hi = overlap
+                pair = (key, other)
+                self._segments[pair] = SharedSegment(
+                    room_ids=(room_id, other_room),
+                    wall_ids=(wall_id, other_wall),
+                    start=(x1 + ux * lo, y1 + uy * lo),
+                    end=(x1 + ux * hi, y1 + uy * hi)
+                )
+                self._key_pairs.setdefault(key, set()).add(pair)
+                self._key_pairs.setdefault(other, set()).add(pair)
+
+    # === Запросы ===
+
+    @property
+    def segments(self) -> List[SharedSegment]:
+        """Все общие участки (каждый один раз)"""
+        return list(self._segments.values())
+
+    def segments_of_room(self, room_id: str) -> List[SharedSegment]:
+        pairs = set()
+        for key in self._room_keys.get(room_id, []):
+            pairs.update(self._key_pairs.get(key, ()))
+        return [self._segments[pair] for pair in pairs]
+
+    def segments_of_wall(self, wall_id: ObjectId) -> List[SharedSegment]:
+        key = self._wall_keys.get(wall_id)
+        if key is None:
+            return []
+        return [self._segments[pair] for pair in self._key_pairs.get(key, ())]
+
+    def room_graph(self) -> Dict[str, Set[str]]:
+        """Граф смежности: комната -> соседи с общими участками стен"""
+        graph: Dict[str, Set[str]] = {room_id: set() for room_id in self._room_keys}
+        for segment in self._segments.values():
+            a, b = segment.room_ids
+            graph[a].add(b)
+            graph[b].add(a)
+        return graph
+
+    def shared_length(self) -> float:
+        """Суммарная длина перегородок (мм)"""
+        return sum(segment.length for segment in self._segments.values())
+
+    # === Проёмы и площади ===
+
+    def _foreign(self, project: Project, wall: Wall, attr: str,
+                 segments: Optional[List[SharedSegment]] = None) -> List[Tuple[object, bool]]:
+        """
+        Проёмы соседних комнат на общих участках стены (по умолчанию - на всех)
+
+        Returns:
+            [(проём с позицией вдоль этой стены, совпадает ли со своим проёмом)]
+        """
+        result = []
+        length = wall.length
+        if length == 0:
+            return result
+        seg = _coords(wall)
+        own = [(o.position, o.position + o.width) for o in getattr(wall, attr)]
+
+        if segments is None:
+            segments = self.segments_of_wall(wall.id)
+        for segment in segments:
+            other_id = segment.wall_ids[1] if segment.wall_ids[0] == wall.id else segment.wall_ids[0]
+            other = project.get_wall_by_id(other_id)
+            if other is None or other.length == 0:
+                continue
+            lo = _along(seg, *segment.start)
+            hi = _along(seg, *segment.end)
+            lo, hi = min(lo, hi), max(lo, hi)
+
+            ox, oy = other.start.x, other.start.y
+            ux = (other.end.x - ox) / other.length
+            uy = (other.end.y - oy) / other.length
+            for opening in getattr(other, attr):
+                a = _along(seg, ox + ux * opening.position, oy + uy * opening.position)
+                b = _along(seg, ox + ux * (opening.position + opening.width),
+                           oy + uy * (opening.position + opening.width))
+                start, end = min(a, b), max(a, b)
+                # Проём должен лежать на общем участке
+                if start < lo - self.tolerance or end > hi + self.tolerance:
+                    continue
+                duplicate = any(start < own_end and own_start < end for own_start, own_end in own)
+                result.append((replace(opening, position=start), duplicate))
+        return result
+
+    def foreign_openings(self, project: Project, wall: Wall, attr: str) -> list:
+        """
+        Проёмы перегородки, внесённые только в соседнюю комнату
+
+        attr - "doors" или "windows". Позиция пересчитана вдоль этой стены -
+        проём можно рисовать и вычитать из площади как свой.
+        """
+        return [opening for opening, duplicate in self._foreign(project, wall, attr) if not duplicate]
+
+    def duplicate_openings(self, project: Project, attr: str) -> int:
+        """Сколько проёмов внесены в обе комнаты (при подсчёте штук - лишние)"""
+        count = 0
+        for segment in self._segments.values():
+            wall = project.get_wall_by_id(segment.wall_ids[0])
+            if wall is not None:
+                count += sum(1 for _, duplicate in self._foreign(project, wall, attr, [segment])
+                             if duplicate)
+        return count
+
+    def net_wall_area(self, project: Project, room: Room) -> float:
+        """
+        Чистая площадь стен комнаты в м² с учётом перегородок
+
+        Кроме своих проёмов вычитаются проёмы, внесённые в соседнюю комнату
+        на общей стене: это сквозное отверстие в обеих сторонах перегородки.
+        """
+        area = 0.0
+        for wall in room.walls:
+            area += wall.net_area
+            for attr in ("windows", "doors"):
+                for opening in self.foreign_openings(project, wall, attr):
+                    area -= (opening.width * opening.height) / 1_000_000
+        return max(area, 0.0)
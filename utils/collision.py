@@ -0,0 +1,282 @@
+"""
+Коллизии мебели с учётом поворота: мебель, стены, зоны открывания дверей
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.furniture import FurnitureItem
+from core.ids import ObjectId
+from core.room import Room, Wall, Door
+from .geometry import GeometryUtils, Rectangle, SpatialHash
+
+
+class ObstacleKind(Enum):
+    """Тип препятствия"""
+    FURNITURE = "furniture"
+    WALL = "wall"
+    DOOR_SWING = "door_swing"  # Зона открывания двери
+
+
+@dataclass
+class Collision:
+    """Найденное пересечение предмета мебели с препятствием"""
+    item_id: ObjectId
+    other_id: ObjectId
+    kind: ObstacleKind
+    depth: float  # Глубина перекрытия по SAT (мм)
+
+
+def furniture_rectangle(item: FurnitureItem) -> Rectangle:
+    """Контур мебели на плане: (x, y) - угол, поворот вокруг центра"""
+    return Rectangle(item.x, item.y, item.width, item.depth, item.rotation)
+
+
+def wall_polygon(wall: Wall) -> List[Tuple[float, float]]:
+    """Контур стены с учётом толщины (осевая линия посередине)"""
+    length = wall.length
+    if length == 0:
+        return []
+
+    ux = (wall.end.x - wall.start.x) / length
+    uy = (wall.end.y - wall.start.y) / length
+    nx, ny = -uy * wall.thickness / 2, ux * wall.thickness / 2
+
+    return [
+        (wall.start.x + nx, wall.start.y + ny),
+        (wall.start.x - nx, wall.start.y - ny),
+        (wall.end.x - nx, wall.end.y - ny),
+        (wall.end.x + nx, wall.end.y + ny)
+    ]
+
+
+def door_swing_polygon(wall: Wall, door: Door, inward_sign: float) -> List[Tuple[float, float]]:
+    """
+    Зона открывания двери - квадрат со стороной в ширину полотна
+
+    Args:
+        inward_sign: +1, если внутренность комнаты слева от направления стены, иначе -1
+    """
+    length = wall.length
+    if length == 0:
+        return []
+
+    ux = (wall.end.x - wall.start.x) / length
+    uy = (wall.end.y - wall.start.y) / length
+    side = inward_sign if door.opens_inside else -inward_sign
+    nx, ny = -uy * side * door.width, ux * side * door.width
+
+    x1 = wall.start.x + ux * door.position
+    y1 = wall.start.y + uy * door.position
+    x2 = wall.start.x + ux * (door.position + door.width)
+    y2 = wall.start.y + uy * (door.position + door.width)
+
+    return [(x1, y1), (x2, y2), (x2 + nx, y2 + ny), (x1 + nx, y1 + ny)]
+
+
+def _room_inward_sign(room: Room) -> float:
+    """Внутренность комнаты слева от стен (+1) при обходе против часовой, иначе справа (-1)"""
+    signed = 0.0
+    n = len(room.walls)
+    for i in range(n):
+        a = room.walls[i].start
+        b = room.walls[(i + 1) % n].start
+        signed += a.x * b.y - b.x * a.y
+    return 1.0 if signed >= 0 else -1.0
+
+
+def _bbox(polygon: List[Tuple[float, float]]) -> Tuple[float, float, float, float]:
+    xs = [p[0] for p in polygon]
+    ys = [p[1] for p in polygon]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class CollisionDetector:
+    """
+    Поиск коллизий мебели (broad phase - пространственный хеш, narrow phase - SAT)
+
+    Индекс строится один раз; при перетаскивании предмета достаточно вызвать
+    update_item() и collisions_for() - обе операции затрагивают только соседние
+    ячейки, поэтому проверка всего плана близка к линейной по числу предметов.
+    """
+
+    MIN_CELL_SIZE = 500  # мм
+
+    def __init__(
+        self,
+        items: Iterable[FurnitureItem] = (),
+        rooms: Iterable[Room] = (),
+        tolerance: float = 1.0,
+        cell_size: Optional[float] = None
+    ):
+        """
+        Args:
+            items: Расставленная мебель
+            rooms: Комнаты - их стены и двери становятся препятствиями
+            tolerance: Перекрытие меньше допуска (мм) считается касанием
+            cell_size: Размер ячейки хеша (по умолчанию - по размерам мебели)
+        """
+        self.tolerance = tolerance
+
+        self._items: Dict[str, FurnitureItem] = {}
+        # Ключ хеша -> (тип, id, контур, габарит)
+        self._shapes: List[Optional[tuple]] = []
+        self._item_keys: Dict[str, int] = {}
+
+        items = list(items)
+        if cell_size is None:
+            sizes = [max(i.width, i.depth) for i in items]
+            cell_size = max(self.MIN_CELL_SIZE, 2 * sum(sizes) / len(sizes)) if sizes else self.MIN_CELL_SIZE
+        self._grid = SpatialHash(cell_size)
+
+        for room in rooms:
+            self._add_room(room)
+        self._add_items(items)
+
+    # === Построение индекса ===
+
+    def _add_shape(self, kind: ObstacleKind, obj_id: ObjectId,
+                   polygon: List[Tuple[float, float]]) -> Optional[int]:
+        if len(polygon) < 3:
+            return None
+        key = len(self._shapes)
+        bbox = _bbox(polygon)
+        self._shapes.append((kind, obj_id, polygon, bbox))
+        self._grid.insert(key, bbox)
+        return key
+
+    def _add_room(self, room: Room):
+        inward = _room_inward_sign(room)
+        for wall in room.walls:
+            self._add_shape(ObstacleKind.WALL, wall.id, wall_polygon(wall))
+            for door in wall.doors:
+                self._add_shape(
+                    ObstacleKind.DOOR_SWING, door.id,
+                    door_swing_polygon(wall, door, inward)
+                )
+
+    def _add_items(self, items: List[FurnitureItem]):
+        if not items:
+            return
+
+        # Углы всех предметов одним векторным вызовом
+        corners = GeometryUtils.rectangles_corners(
+            [i.x for i in items], [i.y for i in items],
+            [i.width for i in items], [i.depth for i in items],
+            [i.rotation for i in items]
+        )
+        for item, item_corners in zip(items, corners.tolist()):
+            self._items[item.id] = item
+            key = self._add_shape(
+                ObstacleKind.FURNITURE, item.id,
+                [tuple(p) for p in item_corners]
+            )
+            self._item_keys[item.id] = key
+
+    def update_item(self, item: FurnitureItem):
+        """Переиндексировать предмет после перемещения/поворота (или добавить новый)"""
+        self._items[item.id] = item
+        polygon = furniture_rectangle(item).corners()
+        key = self._item_keys.get(item.id)
+        if key is None:
+            self._item_keys[item.id] = self._add_shape(ObstacleKind.FURNITURE, item.id, polygon)
+            return
+
+        # Ключ остаётся прежним: при перетаскивании _shapes не растёт
+        self._grid.remove(key, self._shapes[key][3])
+        bbox = _bbox(polygon)
+        self._shapes[key] = (ObstacleKind.FURNITURE, item.id, polygon, bbox)
+        self._grid.insert(key, bbox)
+
+    def remove_item(self, item_id: ObjectId):
+        """Убрать предмет из индекса"""
+        key = self._item_keys.pop(item_id, None)
+        self._items.pop(item_id, None)
+        if key is not None:
+            self._grid.remove(key, self._shapes[key][3])
+            self._shapes[key] = None
+
+    # === Запросы ===
+
+    def _collisions_for_key(self, key: int, skip_lower: bool) -> List[Collision]:
+        _, item_id, polygon, bbox = self._shapes[key]
+        result = []
+
+        for other_key in self._grid.query(bbox):
+            if other_key == key:
+                continue
+            shape = self._shapes[other_key]
+            if shape is None:
+                continue
+            kind, other_id, other_polygon, other_bbox = shape
+
+            # Пары мебель-мебель при полном обходе проверяем один раз
+            if skip_lower and kind == ObstacleKind.FURNITURE and other_key < key:
+                continue
+            if (bbox[2] < other_bbox[0] or other_bbox[2] < bbox[0] or
+                    bbox[3] < other_bbox[1] or other_bbox[3] < bbox[1]):
+                continue
+
+            depth = GeometryUtils.convex_overlap(polygon, other_polygon)
+            if depth > self.tolerance:
+                result.append(Collision(item_id, other_id, kind, depth))
+
+        return result
+
+    def collisions_for(self, item: FurnitureItem) -> List[Collision]:
+        """Коллизии одного предмета (например, во время перетаскивания); новый предмет индексируется"""
+        if item.id not in self._item_keys:
+            self.update_item(item)
+        key = self._item_keys[item.id]
+        if key is None:
+            return []
+        return self._collisions_for_key(key, skip_lower=False)
+
+    def find_all(self) -> List[Collision]:
+        """Все коллизии мебели (каждая пара мебель-мебель - один раз)"""
+        result = []
+        for key in self._item_keys.values():
+            if key is not None:
+                result.extend(self._collisions_for_key(key, skip_lower=True))
+        return result
+
+    def query_polygon(
+        self,
+        polygon: List[Tuple[float, float]],
+        kinds: Optional[Tuple[ObstacleKind, ...]] = None,
+        exclude_id: Optional[ObjectId] = None
+    ) -> List[Collision]:
+        """
+        Препятствия, перекрывающие произвольный выпуклый контур
+
+        Args:
+            polygon: Контур (например, зона прохода перед мебелью)
+            kinds: Учитываемые типы препятствий (по умолчанию - все)
+            exclude_id: Id объекта, который не учитывается (владелец контура)
+        """
+        if len(polygon) < 3:
+            return []
+
+        bbox = _bbox(polygon)
+        result = []
+        for key in self._grid.query(bbox):
+            shape = self._shapes[key]
+            if shape is None:
+                continue
+            kind, other_id, other_polygon, other_bbox = shape
+            if other_id == exclude_id or (kinds and kind not in kinds):
+                continue
+            if (bbox[2] < other_bbox[0] or other_bbox[2] < bbox[0] or
+                    bbox[3] < other_bbox[1] or other_bbox[3] < bbox[1]):
+                continue
+
+            depth = GeometryUtils.convex_overlap(polygon, other_polygon)
+            if depth > self.tolerance:
+                result.append(Collision(exclude_id or 0, other_id, kind, depth))
+
+        return result
+
+    def is_free(self, item: FurnitureItem) -> bool:
+        """Можно ли поставить предмет в текущую позицию"""
+        return not self.collisions_for(item)
@@ -3,9 +3,12 @@
 """
 
 import math
-from typing import List, Tuple, Optional
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, Optional, Sequence, Set, Union
 from dataclasses import dataclass
 
+import numpy as np
+
 
 @dataclass
 class Point:
@@ -32,17 +35,80 @@ class Rectangle:
     def area(self) -> float:
         return self.width * self.height
 
+    def corners(self) -> List[Tuple[float, float]]:
+        """Углы с учётом поворота вокруг центра (против часовой стрелки)"""
+        points = [
+            (self.x, self.y),
+            (self.x + self.width, self.y),
+            (self.x + self.width, self.y + self.height),
+            (self.x, self.y + self.height)
+        ]
+        if not self.rotation:
+            return points
+
+        c = self.center
+        return [GeometryUtils.rotate_point(p, (c.x, c.y), self.rotation) for p in points]
+
     def contains_point(self, p: Point) -> bool:
-        """Проверка попадания точки в прямоугольник (без учёта поворота)"""
-        return (self.x <= p.x <= self.x + self.width and
-                self.y <= p.y <= self.y + self.height)
+        """Проверка попадания точки в прямоугольник (с учётом поворота)"""
+        x, y = p.x, p.y
+        if self.rotation:
+            c = self.center
+            x, y = GeometryUtils.rotate_point((x, y), (c.x, c.y), -self.rotation)
+
+        return (self.x <= x <= self.x + self.width and
+                self.y <= y <= self.y + self.height)
 
     def intersects(self, other: 'Rectangle') -> bool:
-        """Проверка пересечения с другим прямоугольником"""
-        return not (self.x + self.width < other.x or
-                    other.x + other.width < self.x or
-                    self.y + self.height < other.y or
-                    other.y + other.height < self.y)
+        """Проверка пересечения с другим прямоугольником (касание считается пересечением)"""
+        if not self.rotation and not other.rotation:
+            return not (self.x + self.width < other.x or
+                        other.x + other.width < self.x or
+                        self.y + self.height < other.y or
+                        other.y + other.height < self.y)
+
+        return GeometryUtils.convex_overlap(self.corners(), other.corners()) >= 0
+
+
+class SpatialHash:
+    """
+    Равномерная сетка для быстрого поиска кандидатов (broad phase)
+
+    Объект регистрируется во всех ячейках, которые покрывает его
+    ограничивающий прямоугольник (min_x, min_y, max_x, max_y).
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def _cell_range(self, min_x: float, min_y: float,
+                    max_x: float, max_y: float) -> Iterable[Tuple[int, int]]:
+        size = self.cell_size
+        for cx in range(math.floor(min_x / size), math.floor(max_x / size) + 1):
+            for cy in range(math.floor(min_y / size), math.floor(max_y / size) + 1):
+                yield cx, cy
+
+    def insert(self, key: int, bbox: Tuple[float, float, float, float]):
+        for cell in self._cell_range(*bbox):
+            self.cells[cell].append(key)
+
+    def remove(self, key: int, bbox: Tuple[float, float, float, float]):
+        """Удалить объект (bbox - тот же, с которым он был добавлен)"""
+        for cell in self._cell_range(*bbox):
+            bucket = self.cells.get(cell)
+            if bucket and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query(self, bbox: Tuple[float, float, float, float]) -> Set[int]:
+        result = set()
+        for cell in self._cell_range(*bbox):
+            bucket = self.cells.get(cell)
+            if bucket:
+                result.update(bucket)
+        return result
 
 
 class GeometryUtils:
@@ -164,6 +230,217 @@ class GeometryUtils:
         """Привязка к сетке"""
         return round(value / grid_size) * grid_size
 
+    @staticmethod
+    def convex_overlap(poly_a: Sequence[Tuple[float, float]],
+                       poly_b: Sequence[Tuple[float, float]]) -> float:
+        """
+        Глубина перекрытия двух выпуклых многоугольников (теорема о разделяющей оси)
+
+        Returns:
+            Минимальное перекрытие проекций по осям-нормалям рёбер.
+            Отрицательное значение - многоугольники разделены, 0 - касание.
+        """
+        depth = float('inf')
+
+        for poly in (poly_a, poly_b):
+            n = len(poly)
+            for i in range(n):
+                x1, y1 = poly[i]
+                x2, y2 = poly[(i + 1) % n]
+                ax, ay = y1 - y2, x2 - x1
+                length = math.hypot(ax, ay)
+                if length < 1e-12:
+                    continue
+                ax /= length
+                ay /= length
+
+                proj_a = [px * ax + py * ay for px, py in poly_a]
+                proj_b = [px * ax + py * ay for px, py in poly_b]
+                overlap = min(max(proj_a), max(proj_b)) - max(min(proj_a), min(proj_b))
+
+                if overlap < depth:
+                    depth = overlap
+                    if depth < 0:
+                        return depth
+
+        return depth
+
+    # === Пакетные (векторизованные) версии ===
+
+    @staticmethod
+    def points_in_polygon(points, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """
+        Много точек против одного многоугольника (Ray casting)
+
+        Args:
+            points: Массив точек формы (N, 2)
+            polygon: Вершины многоугольника по порядку
+
+        Returns:
+            Булев массив формы (N,), совпадает с point_in_polygon
+        """
+        pts = np.asarray(points, dtype=float).reshape(-1, 2)
+        poly = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(pts), dtype=bool)
+
+        if len(poly) == 0:
+            return inside
+
+        x = pts[:, 0]
+        y = pts[:, 1]
+
+        # Цикл по рёбрам, вектор по точкам: O(E) операций numpy
+        j = len(poly) - 1
+        for i in range(len(poly)):
+            xi, yi = poly[i]
+            xj, yj = poly[j]
+
+            crosses = (yi > y) != (yj > y)
+            if yj != yi:
+                x_cross = (xj - xi) * (y - yi) / (yj - yi) + xi
+                inside ^= crosses & (x < x_cross)
+
+            j = i
+
+        return inside
+
+    @staticmethod
+    def point_in_polygons(point: Tuple[float, float],
+                          polygons: Sequence[Sequence[Tuple[float, float]]]) -> np.ndarray:
+        """
+        Одна точка против многих многоугольников
+
+        Returns:
+            Булев массив формы (M,) - по одному значению на многоугольник
+        """
+        count = len(polygons)
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+
+        sizes = np.array([len(p) for p in polygons], dtype=np.intp)
+        if sizes.sum() == 0:
+            return np.zeros(count, dtype=bool)
+
+        vertices = np.concatenate(
+            [np.asarray(p, dtype=float).reshape(-1, 2) for p in polygons]
+        )
+        owner = np.repeat(np.arange(count), sizes)
+
+        # Индекс предыдущей вершины внутри своего многоугольника (j = i - 1 с переносом)
+        starts = np.cumsum(sizes) - sizes
+        prev = np.arange(len(vertices)) - 1
+        prev[starts[sizes > 0]] += sizes[sizes > 0]
+
+        x, y = point
+        xi, yi = vertices[:, 0], vertices[:, 1]
+        xj, yj = vertices[prev, 0], vertices[prev, 1]
+
+        crosses = (yi > y) != (yj > y)
+        dy = np.where(crosses, yj - yi, 1.0)
+        x_cross = (xj - xi) * (y - yi) / dy + xi
+        hits = crosses & (x < x_cross)
+
+        counts = np.bincount(owner, weights=hits, minlength=count)
+        return (counts.astype(np.intp) % 2).astype(bool)
+
+    @staticmethod
+    def segments_intersections(
+        segments_a,
+        segments_b
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Пересечения всех пар отрезков (каждый из A с каждым из B)
+
+        Args:
+            segments_a: Массив формы (N, 2, 2) или (N, 4): x1, y1, x2, y2
+            segments_b: Массив формы (M, 2, 2) или (M, 4)
+
+        Returns:
+            (mask, points): mask формы (N, M) - есть ли пересечение,
+            points формы (N, M, 2) - точки пересечения (NaN где их нет).
+            Семантика совпадает с line_intersection
+        """
+        a = np.asarray(segments_a, dtype=float).reshape(-1, 4)
+        b = np.asarray(segments_b, dtype=float).reshape(-1, 4)
+
+        x1, y1, x2, y2 = (a[:, k, None] for k in range(4))
+        x3, y3, x4, y4 = (b[None, :, k] for k in range(4))
+
+        denom = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+        parallel = np.abs(denom) < 1e-10
+        safe = np.where(parallel, 1.0, denom)
+
+        t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / safe
+        u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / safe
+
+        mask = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+        points = np.full(mask.shape + (2,), np.nan)
+        points[..., 0] = np.where(mask, x1 + t * (x2 - x1), np.nan)
+        points[..., 1] = np.where(mask, y1 + t * (y2 - y1), np.nan)
+
+        return mask, points
+
+    @staticmethod
+    def rotate_points(
+        points,
+        center,
+        angle_degrees: Union[float, np.ndarray]
+    ) -> np.ndarray:
+        """
+        Повернуть массив точек вокруг центра(ов)
+
+        Args:
+            points: Массив формы (..., 2)
+            center: Один центр (2,) или массив центров, транслируемый к points
+            angle_degrees: Угол или массив углов, транслируемый к points[..., 0]
+        """
+        pts = np.asarray(points, dtype=float)
+        c = np.asarray(center, dtype=float)
+        angle_rad = np.radians(np.asarray(angle_degrees, dtype=float))
+        cos_a = np.cos(angle_rad)
+        sin_a = np.sin(angle_rad)
+
+        x = pts[..., 0] - c[..., 0]
+        y = pts[..., 1] - c[..., 1]
+
+        result = np.empty(np.broadcast(x, cos_a).shape + (2,))
+        result[..., 0] = x * cos_a - y * sin_a + c[..., 0]
+        result[..., 1] = x * sin_a + y * cos_a + c[..., 1]
+        return result
+
+    @staticmethod
+    def rectangles_corners(x, y, width, height, rotation=0) -> np.ndarray:
+        """
+        Углы повёрнутых прямоугольников (например, контуры мебели)
+
+        Прямоугольник задаётся как в Rectangle: левый нижний угол,
+        размеры и поворот в градусах вокруг центра.
+
+        Returns:
+            Массив формы (N, 4, 2), углы против часовой стрелки
+        """
+        x, y, w, h, rot = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(v, dtype=float))
+              for v in (x, y, width, height, rotation))
+        )
+
+        corners = np.empty(x.shape + (4, 2))
+        corners[..., 0, :] = np.stack([x, y], axis=-1)
+        corners[..., 1, :] = np.stack([x + w, y], axis=-1)
+        corners[..., 2, :] = np.stack([x + w, y + h], axis=-1)
+        corners[..., 3, :] = np.stack([x, y + h], axis=-1)
+
+        centers = np.stack([x + w / 2, y + h / 2], axis=-1)
+        return GeometryUtils.rotate_points(
+            corners, centers[..., None, :], rot[..., None]
+        )
+
+    @staticmethod
+    def snap_array_to_grid(values, grid_size: float) -> np.ndarray:
+        """Привязка массива значений к сетке (округление как у round())"""
+        return np.round(np.asarray(values, dtype=float) / grid_size) * grid_size
+
     @staticmethod
     def mm_to_m(mm: float) -> float:
         """Миллиметры в метры"""
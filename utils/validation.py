@@ -0,0 +1,319 @@
+"""
+Проверка корректности плана: пересечения стен и наложения комнат
+"""
+
+import math
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from core.project import Project
+from core.room import Room, Wall
+from core.ids import ObjectId
+from .geometry import GeometryUtils, SpatialHash
+
+
+class IssueKind(Enum):
+    """Тип проблемы плана"""
+    WALL_CROSSING = "wall_crossing"  # Стены разных комнат пересекаются
+    ROOM_OVERLAP = "room_overlap"  # Комнаты накладываются
+    SELF_INTERSECTION = "self_intersection"  # Контур комнаты самопересекается
+
+
+@dataclass
+class PlanIssue:
+    """Найденная проблема плана"""
+    kind: IssueKind
+    room_ids: Tuple[str, ...]
+    point: Tuple[float, float]  # Характерная точка (мм) для подсветки
+    wall_ids: Tuple[ObjectId, ...] = ()
+    message: str = ""
+
+    def involves(self, room_id: str) -> bool:
+        return room_id in self.room_ids
+
+
+def _segment_bbox(wall: Wall, pad: float) -> Tuple[float, float, float, float]:
+    return (
+        min(wall.start.x, wall.end.x) - pad,
+        min(wall.start.y, wall.end.y) - pad,
+        max(wall.start.x, wall.end.x) + pad,
+        max(wall.start.y, wall.end.y) + pad
+    )
+
+
+def _bboxes_overlap(a, b) -> bool:
+    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
+
+
+class PlanValidator:
+    """
+    Поиск пересечений стен, наложений комнат и самопересечений контуров
+
+    Broad phase - пространственный хеш отрезков стен и габаритов комнат,
+    narrow phase - точная проверка пар через GeometryUtils. На реальных
+    планах число кандидатов на стену ограничено, поэтому проверка близка
+    к линейной по числу стен и пересечений.
+
+    Хеши строятся полной проверкой (validate) и живут между вызовами:
+    validate_room переиндексирует только стены изменённой комнаты, как
+    PlanAdjacency.update_room, поэтому годится для каждого движения мыши.
+    """
+
+    MIN_CELL_SIZE = 500  # мм
+
+    def __init__(self, cell_size: Optional[float] = None, tolerance: float = 1.0):
+        """
+        Args:
+            cell_size: Размер ячейки хеша в мм (по умолчанию - средняя длина стены)
+            tolerance: Допуск в мм - касания в пределах допуска не считаются пересечением
+        """
+        self.cell_size = cell_size
+        self.tolerance = tolerance
+        self._grid: Optional[SpatialHash] = None  # Стены
+        self._room_grid: Optional[SpatialHash] = None  # Габариты комнат
+        self._walls: Dict[int, Tuple[Room, Wall, Tuple[float, float, float, float]]] = {}
+        self._room_keys: Dict[str, List[int]] = {}
+        # id комнаты -> (ключ, комната, контур, габарит или None)
+        self._rooms: Dict[str, Tuple[int, Room, List[Tuple[float, float]], Optional[tuple]]] = {}
+        self._room_by_key: Dict[int, str] = {}
+        self._next_key = 0
+
+    # === Публичный API ===
+
+    def validate(self, project: Project) -> List[PlanIssue]:
+        """Полная проверка проекта (заново строит хеши)"""
+        self._index(project.rooms)
+        return self._run(None)
+
+    def validate_room(self, project: Project, room_id: str) -> List[PlanIssue]:
+        """Проверка одной комнаты против остальных (для живого редактирования)"""
+        if self._grid is None:
+            self._index(project.rooms)
+        else:
+            self.remove_room(room_id)
+            room = project.get_room_by_id(room_id)
+            if room is not None:
+                self._insert_room(room)
+        if room_id not in self._rooms:
+            return []
+        return self._run(room_id)
+
+    def remove_room(self, room_id: str):
+        """Убрать комнату из хешей"""
+        for key in self._room_keys.pop(room_id, []):
+            _, _, bbox = self._walls.pop(key)
+            self._grid.remove(key, bbox)
+        record = self._rooms.pop(room_id, None)
+        if record is not None:
+            key, _, _, bbox = record
+            del self._room_by_key[key]
+            if bbox is not None:
+                self._room_grid.remove(key, bbox)
+
+    # === Реализация ===
+
+    def _choose_cell_size(self, walls: List[Wall]) -> float:
+        if self.cell_size:
+            return self.cell_size
+        if not walls:
+            return self.MIN_CELL_SIZE
+        mean_length = sum(w.length for w in walls) / len(walls)
+        return max(self.MIN_CELL_SIZE, mean_length)
+
+    def _index(self, rooms: List[Room]):
+        walls = [wall for room in rooms for wall in room.walls]
+        self._grid = SpatialHash(self._choose_cell_size(walls))
+        self._walls.clear()
+        self._room_keys.clear()
+        self._rooms.clear()
+        self._room_by_key.clear()
+        self._next_key = 0
+
+        sizes = []
+        for room in rooms:
+            if room.walls:
+                xs = [w.start.x for w in room.walls]
+                ys = [w.start.y for w in room.walls]
+                sizes += [max(xs) - min(xs), max(ys) - min(ys)]
+        self._room_grid = SpatialHash(
+            self.cell_size or max(self.MIN_CELL_SIZE, sum(sizes) / len(sizes) if sizes else 0))
+
+        for room in rooms:
+            self._insert_room(room)
+
+    def _insert_room(self, room: Room):
+        keys = []
+        for wall in room.walls:
+            key = self._next_key
+            self._next_key += 1
+            bbox = _segment_bbox(wall, self.tolerance)
+            self._walls[key] = (room, wall, bbox)
+            self._grid.insert(key, bbox)
+            keys.append(key)
+        self._room_keys[room.id] = keys
+
+        key = self._next_key
+        self._next_key += 1
+        polygon = [(w.start.x, w.start.y) for w in room.walls]
+        bbox = None
+        if len(polygon) >= 3:
+            xs = [p[0] for p in polygon]
+            ys = [p[1] for p in polygon]
+            bbox = (min(xs), min(ys), max(xs), max(ys))
+            self._room_grid.insert(key, bbox)
+        self._rooms[room.id] = (key, room, polygon, bbox)
+        self._room_by_key[key] = room.id
+
+    def _run(self, focus_id: Optional[str]) -> List[PlanIssue]:
+        tol = self.tolerance
+        issues: List[PlanIssue] = []
+        crossing_pairs: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+        keys = self._room_keys[focus_id] if focus_id is not None else list(self._walls)
+
+        # 1. Пересечения стен
+        for i in keys:
+            room_a, wall_a, bbox = self._walls[i]
+            for j in self._grid.query(bbox):
+                room_b, wall_b, _ = self._walls[j]
+                if j == i:
+                    continue
+                # Каждую пару проверяем один раз
+                if j < i and (focus_id is None or room_b.id == focus_id):
+                    continue
+
+                point = self._proper_crossing(wall_a, wall_b)
+                if point is None:
+                    continue
+
+                if room_a.id == room_b.id:
+                    issues.append(PlanIssue(
+                        kind=IssueKind.SELF_INTERSECTION,
+                        room_ids=(room_a.id,),
+                        wall_ids=(wall_a.id, wall_b.id),
+                        point=point,
+                        message=f"Контур комнаты «{room_a.name}» самопересекается"
+                    ))
+                else:
+                    issues.append(PlanIssue(
+                        kind=IssueKind.WALL_CROSSING,
+                        room_ids=(room_a.id, room_b.id),
+                        wall_ids=(wall_a.id, wall_b.id),
+                        point=point,
+                        message=f"Стены комнат «{room_a.name}» и «{room_b.name}» пересекаются"
+                    ))
+                    pair = tuple(sorted((room_a.id, room_b.id)))
+                    crossing_pairs.setdefault(pair, point)
+
+        # 2. Наложения комнат
+        issues.extend(self._room_overlaps(focus_id, crossing_pairs))
+
+        return issues
+
+    def _room_overlaps(
+        self,
+        focus_id: Optional[str],
+        crossing_pairs: Dict[Tuple[str, str], Tuple[float, float]]
+    ) -> List[PlanIssue]:
+        records = [self._rooms[focus_id]] if focus_id is not None else list(self._rooms.values())
+
+        issues = []
+        for i, room_a, polygon_a, bbox_a in records:
+            if bbox_a is None:
+                continue
+
+            for j in self._room_grid.query(bbox_a):
+                _, room_b, polygon_b, bbox_b = self._rooms[self._room_by_key[j]]
+                if j == i:
+                    continue
+                if j < i and (focus_id is None or room_b.id == focus_id):
+                    continue
+                if not _bboxes_overlap(bbox_a, bbox_b):
+                    continue
+
+                pair = tuple(sorted((room_a.id, room_b.id)))
+                point = crossing_pairs.get(pair)
+                if point is None:
+                    point = (self._inner_point(polygon_a, polygon_b) or
+                             self._inner_point(polygon_b, polygon_a))
+                if point is None:
+                    continue
+
+                issues.append(PlanIssue(
+                    kind=IssueKind.ROOM_OVERLAP,
+                    room_ids=(room_a.id, room_b.id),
+                    point=point,
+                    message=f"Комнаты «{room_a.name}» и «{room_b.name}» накладываются"
+                ))
+
+        return issues
+
+    def _proper_crossing(self, wall_a: Wall, wall_b: Wall) -> Optional[Tuple[float, float]]:
+        """Точка пересечения, если оно не сводится к касанию в концах стен"""
+        ends = (
+            (wall_a.start.x, wall_a.start.y), (wall_a.end.x, wall_a.end.y),
+            (wall_b.start.x, wall_b.start.y), (wall_b.end.x, wall_b.end.y)
+        )
+        point = GeometryUtils.line_intersection(*ends)
+        if point is None:
+            return None
+
+        for end in ends:
+            if GeometryUtils.distance(point, end) <= self.tolerance:
+                return None
+
+        return point
+
+    def _inner_point(self, polygon: List[Tuple[float, float]],
+                     other: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+        """Точка polygon, лежащая строго внутри other (не на его границе)"""
+        candidates = list(polygon)
+
+        # Центр масс ловит совпадающие и вложенные по границе комнаты
+        centroid = self._centroid(polygon)
+        if centroid and GeometryUtils.point_in_polygon(centroid, polygon):
+            candidates.append(centroid)
+
+        for point in candidates:
+            if (GeometryUtils.point_in_polygon(point, other) and
+                    self._distance_to_boundary(point, other) > self.tolerance):
+                return point
+
+        return None
+
+    @staticmethod
+    def _centroid(polygon: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+        area = 0.0
+        cx = cy = 0.0
+        n = len(polygon)
+        for i in range(n):
+            x1, y1 = polygon[i]
+            x2, y2 = polygon[(i + 1) % n]
+            cross = x1 * y2 - x2 * y1
+            area += cross
+            cx += (x1 + x2) * cross
+            cy += (y1 + y2) * cross
+
+        if abs(area) < 1e-9:
+            return None
+
+        return (cx / (3 * area), cy / (3 * area))
+
+    @staticmethod
+    def _distance_to_boundary(point: Tuple[float, float],
+                              polygon: List[Tuple[float, float]]) -> float:
+        px, py = point
+        best = float('inf')
+        n = len(polygon)
+        for i in range(n):
+            x1, y1 = polygon[i]
+            x2, y2 = polygon[(i + 1) % n]
+            dx, dy = x2 - x1, y2 - y1
+            length_sq = dx * dx + dy * dy
+            if length_sq == 0:
+                t = 0
+            else:
+                t = max(0, min(1, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+            best = min(best, math.hypot(px - (x1 + t * dx), py - (y1 + t * dy)))
+        return best